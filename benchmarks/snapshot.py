@@ -0,0 +1,83 @@
+"""
+Microbenchmark of saving and loading a snapshot of a game with many sprites,
+checkpoints and level retries save and load the whole game at once.
+
+Run from the repository root with: python -m benchmarks.snapshot
+"""
+
+import argparse
+import random
+import time
+import pygame
+
+from src.constants import *
+from src.game import Game
+from src.snapshot import decode_snapshot
+from src.sprites.asteroid import Asteroid
+from src.sprites.melting_asteroid import MeltingAsteroid
+from src.sprites.slime_blob import SlimeBlob
+from src.sprites.vortex_hole import VortexHole
+
+# Sprites of each kind in the game, bullets make up the rest.
+SPRITE_FACTORIES = (
+    lambda x, y: Asteroid(x, y, 25, "sprites/asteroid_A.png"),
+    lambda x, y: Asteroid(x, y, 12, "sprites/asteroid_B.png"),
+    lambda x, y: SlimeBlob(x, y),
+    lambda x, y: MeltingAsteroid(x, y),
+)
+VORTEX_HOLES = 4
+BULLETS = 100
+
+def build_game(count, seed):
+    game = Game(None, headless = True, seed = seed)
+    game.lives = 1
+
+    for i in range(VORTEX_HOLES):
+        game.add_sprite(VortexHole(random.randint(0, WINDOWWIDTH), random.randint(0, WINDOWHEIGHT)))
+
+    while len(game.sprite_group) < count - BULLETS:
+        sprite = random.choice(SPRITE_FACTORIES)(random.randint(0, WINDOWWIDTH), random.randint(0, WINDOWHEIGHT))
+        sprite.set_angle(random.randint(0, 359))
+        sprite.velocity = random.randint(50, 200) / 100
+        game.add_sprite(sprite)
+
+    while len(game.sprite_group) < count:
+        game.player.rotate_clockwise(True)
+        game.player.update()
+        game.fire_bullet()
+
+    return game
+
+def time_call(function, repeat):
+    start = time.perf_counter()
+
+    for i in range(repeat):
+        result = function()
+
+    return (time.perf_counter() - start) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--count", type = int, default = 1000)
+    parser.add_argument("--repeat", type = int, default = 200)
+    parser.add_argument("--seed", type = int, default = 1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    pygame.font.init()
+
+    game = build_game(args.count, args.seed)
+    game.tick()
+
+    save_time, snapshot = time_call(game.save_snapshot, args.repeat)
+    decode_time, state = time_call(lambda: decode_snapshot(snapshot, game.clock), args.repeat)
+    load_time, result = time_call(lambda: game.load_snapshot(snapshot), args.repeat)
+
+    print(f"{len(game.sprite_group)} sprites, {len(snapshot) / 1024:.1f} KiB per snapshot")
+    print(f"save:   {save_time * 1000:.3f} ms")
+    print(f"decode: {decode_time * 1000:.3f} ms, making the sprites from the cached images")
+    print(f"load:   {load_time * 1000:.3f} ms, decoding and adding the sprites to the game")
+    print(f"same snapshot after loading: {game.save_snapshot() == snapshot}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Microbenchmark of sprite construction time and memory per sprite, split
+cascades create many sprites in a single frame.
+
+Run from the repository root with: python -m benchmarks.sprite_alloc
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from src.sprites.asteroid import Asteroid
+from src.sprites.cluster_asteroid import ClusterAsteroid
+from src.sprites.slime_blob import SlimeBlob
+from src.sprites.bullet import Bullet
+from src.rng import random_streams
+
+SPRITE_FACTORIES = {
+    "Asteroid": lambda: Asteroid(100, 100, 25, "sprites/asteroid_A.png"),
+    "SlimeBlob": lambda: SlimeBlob(100, 100),
+    "Bullet": lambda: Bullet(),
+}
+
+def split_cascade():
+    """Destroys a cluster asteroid, an asteroid and every fragment they shatter into."""
+    sprites = [ClusterAsteroid(500, 400), Asteroid(500, 400, 50, "sprites/asteroid_A.png")]
+    created = 0
+
+    while sprites:
+        sprite = sprites.pop()
+        if not sprite.should_split:
+            continue
+
+        sprite.hp = 0
+        fragments = sprite.split()
+        created += len(fragments)
+        sprites.extend(fragments)
+
+    return created
+
+def time_construction(factory, count):
+    # Creates the shared images and rotations before timing.
+    factory()
+
+    gc.collect()
+    start = time.perf_counter()
+
+    for i in range(count):
+        factory()
+
+    return (time.perf_counter() - start) / count
+
+def measure_bytes(factory, count):
+    """Average memory held by each sprite, including its attributes."""
+    factory()
+    gc.collect()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sprites = [factory() for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # The list holding the sprites isn't part of them.
+    return (after - before - sprites.__sizeof__()) / count
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--count", type = int, default = 20000)
+    parser.add_argument("--cascades", type = int, default = 500)
+    parser.add_argument("--seed", type = int, default = 1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    random_streams.seed(args.seed)
+
+    for name, factory in SPRITE_FACTORIES.items():
+        construction = time_construction(factory, args.count)
+        size = measure_bytes(factory, args.count)
+        print(f"{name:10} {construction * 1000000:7.2f} us per sprite, {size:6.0f} bytes per sprite")
+
+    split_cascade()
+    start = time.perf_counter()
+    created = sum(split_cascade() for i in range(args.cascades))
+    elapsed = time.perf_counter() - start
+    print(f"Split cascade: {created / args.cascades:.1f} sprites in {elapsed / args.cascades * 1000:.3f} ms per cascade")
+
+if __name__ == '__main__':
+    main()
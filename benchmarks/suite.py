@@ -0,0 +1,338 @@
+"""
+Scenario benchmark suite running the real sprites through a headless Game.
+
+Each scenario is built from a fixed seed, so every run simulates the same
+ticks. The suite measures ticks per second, the cost of each phase of a tick
+and the peak memory, and with --sweep the cost at each sprite count as a
+scaling curve. --save writes the results as a JSON baseline and --baseline
+compares a run against one, failing if a scenario is slower or uses more
+memory than the thresholds allow.
+
+Run from the repository root with: python -m benchmarks.suite
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import pygame
+
+from src.constants import *
+from src.collision_layers import LAYER_HOSTILE
+from src.asset_cache import asset_cache
+from src.game import Game, PLAYER_DIAMETER
+from src.frame_profiler import get_percentile
+from src.sprites.asteroid import Asteroid, ASTEROID_RADIUS, ASTEROID_SHATTER_LEVEL, ASTEROID_SHATTER_FACTOR
+from src.sprites.slime_blob import SlimeBlob
+from src.sprites.vortex_hole import VortexHole
+from src.sprites.space_ship import SpaceShip, WEAPON_MODES
+from src.level.campaign_level import CampaignLevel, ASTEROID_SPRITE_IMAGES
+
+# The player keeps respawning however often the scenario kills it.
+BENCHMARK_LIVES = 1000000
+
+VORTEX_HOLE_COUNT = 4
+BULLET_STORM_TARGETS = 50
+
+# A slower or larger scenario than this share over the baseline is a regression.
+MAX_SLOWDOWN = 0.10
+MAX_MEMORY_GROWTH = 0.20
+
+def random_position():
+    return random.randint(0, WINDOWWIDTH), random.randint(0, WINDOWHEIGHT)
+
+def add_asteroids(game, count):
+    """Asteroids spread evenly over every shatter level."""
+    for i in range(count):
+        shatter_level = i % (ASTEROID_SHATTER_LEVEL + 1) + 1
+        radius = ASTEROID_RADIUS // ASTEROID_SHATTER_FACTOR ** (shatter_level - 1)
+
+        x, y = random_position()
+        asteroid = Asteroid(x, y, radius, random.choice(ASTEROID_SPRITE_IMAGES))
+        asteroid.shatter_level = shatter_level
+        asteroid.velocity = random.randint(50, 200) / 100
+        game.add_sprite(asteroid)
+
+def build_asteroids(game, count):
+    add_asteroids(game, count)
+
+def build_slimes(game, count):
+    for i in range(count):
+        x, y = random_position()
+        game.add_sprite(SlimeBlob(x, y))
+
+def build_vortex_holes(game, count):
+    """Asteroids pulled around by a few vortex holes."""
+    add_asteroids(game, count)
+
+    for i in range(VORTEX_HOLE_COUNT):
+        x, y = random_position()
+        game.add_sprite(VortexHole(x, y))
+
+def build_bullet_storm(game, count):
+    """Ships firing the widest weapon mode at a field of asteroids, count is the number of ships.
+        The ships are only used as guns and aren't added to the game, so nothing stops them
+        firing, and the field is topped up as it's shot down."""
+    hostile_group = game.layer_groups[LAYER_HOSTILE]
+    ships = []
+
+    for i in range(count):
+        x, y = random_position()
+        ship = SpaceShip(x, y, PLAYER_DIAMETER, game.clock)
+        ship.set_angle(random.randint(0, 359))
+        ship.weapon_mode_index = len(WEAPON_MODES) - 1
+        ship.set_trigger(True)
+        ships.append(ship)
+
+    def fire_bullets():
+        if len(hostile_group) < BULLET_STORM_TARGETS:
+            add_asteroids(game, BULLET_STORM_TARGETS - len(hostile_group))
+
+        for ship in ships:
+            if ship.should_fire():
+                for bullet in ship.fire_bullets(game.bullet_pool):
+                    game.add_sprite(bullet)
+
+    return fire_bullets
+
+def build_campaign(game, count):
+    """The campaign level numbered count, its sprites enter the game during the warmup."""
+    game.level_number = count
+    game.level_count = count
+    game.set_level(CampaignLevel(count, WINDOWWIDTH, WINDOWHEIGHT, game.clock))
+
+# Name, function building the scenario, the default count and if the count is swept.
+SCENARIOS = (
+    ("asteroids", build_asteroids, 100, True),
+    ("slimes", build_slimes, 50, True),
+    ("vortex_holes", build_vortex_holes, 100, True),
+    ("bullet_storm", build_bullet_storm, 8, True),
+    ("campaign", build_campaign, 100, False),
+)
+
+def create_game(physics_engine, seed):
+    game = Game(None, headless = True, physics_engine = physics_engine, seed = seed)
+
+    # No campaign level is generated, the scenario's sprites are all there is.
+    game.level_count = game.level_number
+    game.lives = BENCHMARK_LIVES
+
+    return game
+
+def run_ticks(game, ticks, per_tick = None):
+    profiler = game.profiler
+
+    for i in range(ticks):
+        profiler.start_frame()
+
+        # Work the scenario does every tick, such as firing.
+        if per_tick is not None:
+            per_tick()
+
+        profiler.mark("scenario")
+        game.tick()
+        profiler.end_frame(game.sprite_group)
+
+def get_phase_costs(frames):
+    """Average ms per tick of each phase, and of updating and colliding each sprite class."""
+    phases = {}
+    classes = {}
+
+    for frame in frames:
+        for phase, elapsed in frame["phases"].items():
+            phases[phase] = phases.get(phase, 0) + elapsed
+
+        for kind in ("update", "collision"):
+            for name, elapsed in frame[kind].items():
+                classes[name] = classes.get(name, 0) + elapsed
+
+    count = max(1, len(frames))
+    phases = {phase: round(elapsed * 1000 / count, 4) for phase, elapsed in phases.items()}
+    classes = {name: round(elapsed * 1000 / count, 4) for name, elapsed in classes.items()}
+
+    return phases, classes
+
+def run_scenario(build, count, args):
+    """Times the scenario without the profiler, then profiles the same number of ticks."""
+    random.seed(args.seed)
+    game = create_game(args.physics_engine, args.seed)
+    per_tick = build(game, count)
+
+    run_ticks(game, args.warmup, per_tick)
+
+    gc.collect()
+    start = time.perf_counter()
+    run_ticks(game, args.ticks, per_tick)
+    elapsed = time.perf_counter() - start
+    sprite_count = len(game.sprite_group)
+
+    game.profiler.enable(recording = True)
+    run_ticks(game, args.ticks, per_tick)
+    frames = game.profiler.frames
+
+    frame_times = sorted(frame["frame_time"] for frame in frames)
+    phases, classes = get_phase_costs(frames)
+
+    return {
+        "count": count,
+        "sprites": sprite_count,
+        "ticks_per_second": round(args.ticks / elapsed, 1),
+        "ms_per_tick": round(elapsed * 1000 / args.ticks, 4),
+        "p95_ms": round(get_percentile(frame_times, 95) * 1000, 4),
+        "candidate_pairs": round(sum(frame["candidate_pairs"] for frame in frames) / len(frames), 1),
+        "phases": phases,
+        "classes": classes,
+    }
+
+def measure_peak_memory(build, count, args):
+    """Peak KiB allocated while building and running the scenario.
+        The shared image caches are already warm from the timed run."""
+    random.seed(args.seed)
+    game = create_game(args.physics_engine, args.seed)
+    gc.collect()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    per_tick = build(game, count)
+    run_ticks(game, args.memory_ticks, per_tick)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return round((peak - before) / 1024, 1)
+
+def get_result_key(name, count, physics_engine):
+    key = f"{name}/{count}"
+
+    if physics_engine:
+        key += "/engine"
+
+    return key
+
+def print_result(name, result):
+    print(f"{name:24} {result['sprites']:7} {result['ticks_per_second']:9.0f} {result['ms_per_tick']:9.3f} {result['p95_ms']:8.3f} "
+          f"{result['candidate_pairs']:9.1f} {result['peak_memory_kb']:9.0f}")
+
+    phases = sorted(result["phases"].items(), key = lambda item: -item[1])
+    print("    " + ", ".join(f"{phase} {elapsed:.3f}" for phase, elapsed in phases))
+
+def print_scaling(scaling):
+    print("Scaling, ms per tick and us per sprite:")
+
+    for name, points in scaling.items():
+        curve = ", ".join(f"{count}: {ms:.3f} ms {ms * 1000 / max(1, sprites):.1f} us" for count, sprites, ms in points)
+        print(f"    {name:20} {curve}")
+
+def compare(results, baseline, ticks, max_slowdown, max_memory_growth):
+    """Prints each scenario against the baseline, returns the regressions."""
+    regressions = []
+    baseline_results = baseline["results"]
+
+    print(f"Compared with the baseline from {baseline['meta']['date']}:")
+
+    # Longer runs give the sprites time to spread out, the numbers are only comparable for the same ticks.
+    if baseline["meta"]["ticks"] != ticks:
+        print(f"    The baseline ran {baseline['meta']['ticks']} ticks per scenario, this run {ticks}")
+
+    for key, result in results.items():
+        base = baseline_results.get(key)
+
+        if base is None:
+            print(f"    {key:24} not in the baseline")
+            continue
+
+        slowdown = result["ms_per_tick"] / base["ms_per_tick"] - 1
+        memory_growth = result["peak_memory_kb"] / max(1, base["peak_memory_kb"]) - 1
+        print(f"    {key:24} {slowdown * 100:+7.1f}% time {memory_growth * 100:+7.1f}% memory")
+
+        if slowdown > max_slowdown:
+            regressions.append(f"{key} is {slowdown * 100:.1f}% slower")
+
+        if memory_growth > max_memory_growth:
+            regressions.append(f"{key} uses {memory_growth * 100:.1f}% more memory")
+
+    return regressions
+
+def main():
+    scenario_names = [scenario[0] for scenario in SCENARIOS]
+
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs = "+", choices = scenario_names, default = scenario_names)
+    parser.add_argument("--count", type = int, default = None,
+                        help = "sprites, ships or level number of every scenario instead of its default")
+    parser.add_argument("--sweep", type = lambda value: [int(count) for count in value.split(",")], default = None,
+                        help = "comma separated counts to run the swept scenarios at, e.g. 25,50,100,200,400")
+    parser.add_argument("--ticks", type = int, default = 300)
+    parser.add_argument("--warmup", type = int, default = 60)
+    parser.add_argument("--memory-ticks", type = int, default = 60)
+    parser.add_argument("--seed", type = int, default = 1)
+    parser.add_argument("--physics-engine", action = "store_true")
+    parser.add_argument("--save", metavar = "PATH", help = "write the results to a JSON baseline")
+    parser.add_argument("--baseline", metavar = "PATH", help = "compare the results with a saved baseline")
+    parser.add_argument("--max-slowdown", type = float, default = MAX_SLOWDOWN)
+    parser.add_argument("--max-memory-growth", type = float, default = MAX_MEMORY_GROWTH)
+    args = parser.parse_args()
+
+    pygame.font.init()
+    asset_cache.load_bundle()
+
+    results = {}
+    scaling = {}
+
+    print(f"{'scenario':24} {'sprites':>7} {'ticks/s':>9} {'ms/tick':>9} {'p95 ms':>8} {'cand/tick':>9} {'peak KiB':>9}")
+
+    for name, build, default_count, swept in SCENARIOS:
+        if name not in args.scenarios:
+            continue
+
+        counts = [default_count if args.count is None else args.count]
+        if args.sweep is not None and swept:
+            counts = args.sweep
+
+        for count in counts:
+            result = run_scenario(build, count, args)
+            result["peak_memory_kb"] = measure_peak_memory(build, count, args)
+
+            key = get_result_key(name, count, args.physics_engine)
+            results[key] = result
+            print_result(key, result)
+
+            if len(counts) > 1:
+                scaling.setdefault(name, []).append((count, result["sprites"], result["ms_per_tick"]))
+
+    if scaling:
+        print_scaling(scaling)
+
+    if args.save is not None:
+        meta = {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "ticks": args.ticks,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        }
+
+        with open(args.save, "w") as baseline_file:
+            json.dump({"meta": meta, "results": results, "scaling": scaling}, baseline_file, indent = 2)
+
+        print(f"Wrote {len(results)} results to {args.save}")
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compare(results, baseline, args.ticks, args.max_slowdown, args.max_memory_growth)
+
+        for regression in regressions:
+            print("Regression: " + regression)
+
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
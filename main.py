@@ -1,7 +1,69 @@
-import src.main_gui as main_gui
+import sys
+from src.startup_profile import startup_profile
+
+# The profile is started before the game is imported so the imports are timed too.
+if "--startup-profile" in sys.argv:
+    startup_profile.start()
+
+import argparse
+
+with startup_profile.phase("imports"):
+    import src.main_gui as main_gui
+
+def parse_seed(value):
+    """A seed that fits in the replays and snapshots."""
+    from src.rng import MIN_SEED, MAX_SEED
+
+    seed = int(value)
+    if not MIN_SEED <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f"the seed must be between {MIN_SEED} and {MAX_SEED}")
+
+    return seed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="NAsteroids")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the simulation without a window, sound or frame cap")
+    parser.add_argument("--ticks", type=int, default=None,
+                        help="number of ticks to simulate when running headless")
+    parser.add_argument("--render-every", type=int, default=0,
+                        help="render a frame every N ticks when running headless, 0 never renders")
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="redraw and update the whole screen every frame instead of only the dirty rects")
+    parser.add_argument("--physics-engine", action="store_true",
+                        help="move the sprites with the vectorized NumPy physics engine")
+    parser.add_argument("--mixer-buffer", type=int, default=main_gui.MIXER_BUFFER_SIZE,
+                        help="samples in the audio mixer buffer, lower values give less audio latency")
+    parser.add_argument("--asset-timings", action="store_true",
+                        help="print the time to the first frame and the loading time of every asset")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print the import time of every module and the time of each startup phase")
+    parser.add_argument("--frame-profile", metavar="PATH", default=None,
+                        help="time every frame and write the phases to PATH on exit, as CSV if it ends with .csv, otherwise JSON lines")
+    parser.add_argument("--seed", type=parse_seed, default=None,
+                        help="seed the random numbers of the game, a new seed is picked otherwise")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="record the seed and the key presses to a replay file at PATH")
+    parser.add_argument("--replay", metavar="PATH", default=None,
+                        help="play back the replay at PATH headless and check it against its keyframes")
+    parser.add_argument("--replay-from", metavar="TICK", type=int, default=None,
+                        help="start the replay at TICK, from the keyframe before it")
+    parser.add_argument("--checkpoint", metavar="PATH", default=None,
+                        help="write a snapshot of the game to PATH every minute of game time and on exit when running headless")
+    parser.add_argument("--restore", metavar="PATH", default=None,
+                        help="continue the game from the snapshot at PATH")
+    return parser.parse_args()
 
 if __name__ == '__main__':
+    args = parse_args()
+
     print("Let's get the show started!")
 
-    main = main_gui.MainGui()
+    # A replay is played back headless, it runs as fast as it can.
+    headless = args.headless or args.replay is not None
+
+    main = main_gui.MainGui(headless, args.ticks, args.render_every, not args.full_redraw,
+                            args.physics_engine, args.mixer_buffer, args.asset_timings,
+                            args.frame_profile, args.seed, args.record, args.replay, args.replay_from,
+                            args.checkpoint, args.restore)
     main.start()
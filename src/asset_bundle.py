@@ -0,0 +1,210 @@
+"""
+Prebuilt asset bundle with every sprite image the game scales, already scaled
+to each size the game uses and packed into one atlas. The file is memory mapped,
+so several games on the same host share its pages and starting the game doesn't
+decode or scale any PNG.
+
+The collision masks aren't bundled, pygame can only make a mask from a surface,
+so the rotation cache makes them from the rotated images as the sprites use them.
+
+Build it with `python -m src.asset_bundle` after changing any sprite image.
+"""
+
+import mmap
+import os
+import struct
+import pygame
+from .constants import *
+from .functions import IMAGE_BASE_PATH, load_image
+
+BUNDLE_PATH = IMAGE_BASE_PATH + "assets.bundle"
+BUNDLE_MAGIC = b"NAST"
+BUNDLE_VERSION = 2
+
+# magic, version, entry count, atlas width, atlas height, atlas offset
+BUNDLE_HEADER = struct.Struct("<4sHHHHI")
+
+# image name, diameter, x and y in the atlas
+BUNDLE_ENTRY = struct.Struct("<64sHHH")
+
+# The atlas starts on its own page so it can be mapped on its own.
+BUNDLE_PAGE_SIZE = 4096
+ATLAS_WIDTH = 2048
+
+# The pixels are stored in the byte order of the display format.
+ATLAS_PIXEL_FORMAT = "BGRA"
+
+def get_bundle_sizes():
+    """Every (image, diameter) the game scales an image to, taken from the sprites themselves."""
+    # Imported here since the sprites import the asset cache which imports this module.
+    from .sprites.asteroid import ASTEROID_RADIUS, ASTEROID_SHATTER_LEVEL, ASTEROID_SHATTER_FACTOR
+    from .sprites.cluster_asteroid import CLUSTER_ASTEROID_RADIUS, CLUSTER_ASTEROID_SHATTER_LEVEL
+    from .sprites.slime_blob import SLIME_RADIUS
+    from .sprites.melting_asteroid import MeltingAsteroid, MELTING_ASTEROID_RADIUS, MELTING_ASTEROID_HP
+    from .level.campaign_level import ASTEROID_SPRITE_IMAGES
+
+    sizes = set()
+
+    def add_fragments(image, radius, shatter_level, max_shatter_level, split_divisor):
+        # Follows the asteroid down every shatter level, the fragments keep the image.
+        sizes.add((image, radius * 2))
+
+        while shatter_level <= max_shatter_level:
+            radius //= split_divisor
+            shatter_level += 1
+            sizes.add((image, radius * 2))
+
+            # Only the first split of a cluster asteroid is smaller than the asteroids' own.
+            split_divisor = ASTEROID_SHATTER_FACTOR
+
+    for image in ASTEROID_SPRITE_IMAGES:
+        # The normal, small and large asteroids of a campaign level.
+        add_fragments(image, ASTEROID_RADIUS, 1, ASTEROID_SHATTER_LEVEL, ASTEROID_SHATTER_FACTOR)
+        add_fragments(image, ASTEROID_RADIUS//2, 2, ASTEROID_SHATTER_LEVEL, ASTEROID_SHATTER_FACTOR)
+        add_fragments(image, ASTEROID_RADIUS * 2, 1, ASTEROID_SHATTER_LEVEL + 1, ASTEROID_SHATTER_FACTOR)
+
+    add_fragments("sprites/asteroid_cluster.png", CLUSTER_ASTEROID_RADIUS, 1, CLUSTER_ASTEROID_SHATTER_LEVEL, 4)
+    sizes.add(("sprites/slime_blob_1.png", SLIME_RADIUS * 2))
+
+    for hit in range(MELTING_ASTEROID_HP):
+        sizes.add(("sprites/melting_asteroid_a.png", (MELTING_ASTEROID_RADIUS - hit * MeltingAsteroid.melt_factor) * 2))
+
+    return sorted(sizes)
+
+def align(offset):
+    return -(-offset // BUNDLE_PAGE_SIZE) * BUNDLE_PAGE_SIZE
+
+def pack_atlas(sizes, width = ATLAS_WIDTH):
+    """Places the squares in rows, largest first, returns their positions and the atlas height."""
+    positions = {}
+    x, y, row_height = 0, 0, 0
+
+    for key in sorted(sizes, key = lambda key: -key[1]):
+        diameter = key[1]
+
+        if x + diameter > width:
+            x, y, row_height = 0, y + row_height, 0
+
+        positions[key] = (x, y)
+        x += diameter
+        row_height = max(row_height, diameter)
+
+    return positions, y + row_height
+
+def build_bundle(path = BUNDLE_PATH, sizes = None):
+    """Scales the images the same way as the asset cache does and writes the bundle."""
+    if sizes is None:
+        sizes = get_bundle_sizes()
+
+    positions, atlas_height = pack_atlas(sizes)
+    atlas_pitch = ATLAS_WIDTH * 4
+    atlas = bytearray(atlas_pitch * atlas_height)
+    entries = []
+
+    for image_name, diameter in sizes:
+        image = pygame.transform.scale(load_image(image_name), (diameter, diameter))
+        image.set_colorkey(BACKGROUND_COLOR)
+
+        # Copies the scaled image into its place in the atlas row by row.
+        x, y = positions[(image_name, diameter)]
+        pixels = pygame.image.tobytes(image, ATLAS_PIXEL_FORMAT)
+        row_size = diameter * 4
+
+        for row in range(diameter):
+            start = (y + row) * atlas_pitch + x * 4
+            atlas[start:start + row_size] = pixels[row * row_size:(row + 1) * row_size]
+
+        entries.append(BUNDLE_ENTRY.pack(image_name.encode(), diameter, x, y))
+
+    atlas_offset = align(BUNDLE_HEADER.size + BUNDLE_ENTRY.size * len(entries))
+    header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(entries), ATLAS_WIDTH, atlas_height, atlas_offset)
+
+    # Written next to the old bundle first, so a running game never maps a half written file.
+    with open(path + ".tmp", "wb") as bundle_file:
+        bundle_file.write(header)
+        bundle_file.writelines(entries)
+        bundle_file.seek(atlas_offset)
+        bundle_file.write(atlas)
+
+    os.replace(path + ".tmp", path)
+
+    return len(entries), atlas_offset + len(atlas)
+
+
+class AssetBundle:
+    """Read-only view of a bundle file mapped into memory.
+
+        Without a display the surfaces point straight at the mapped atlas, with
+        one they are converted to the display format like any loaded image."""
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, "rb") as bundle_file:
+            self.data = mmap.mmap(bundle_file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        magic, version, count, width, height, atlas_offset = BUNDLE_HEADER.unpack_from(self.data)
+
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"{path} is not a version {BUNDLE_VERSION} asset bundle")
+
+        self.atlas = pygame.image.frombuffer(
+            memoryview(self.data)[atlas_offset:atlas_offset + width * height * 4], (width, height), ATLAS_PIXEL_FORMAT)
+
+        self.entries = {}
+
+        for index in range(count):
+            name, diameter, x, y = BUNDLE_ENTRY.unpack_from(self.data, BUNDLE_HEADER.size + index * BUNDLE_ENTRY.size)
+            self.entries[(name.rstrip(b"\0").decode(), diameter)] = (x, y)
+
+    def is_outdated(self):
+        """Checks if any of the bundled images has changed since the bundle was built."""
+        built = os.path.getmtime(self.path)
+
+        for image_name in set(image_name for image_name, diameter in self.entries):
+            image_path = IMAGE_BASE_PATH + image_name
+
+            if not os.path.exists(image_path) or os.path.getmtime(image_path) > built:
+                return True
+
+        return False
+
+    def get(self, image_name, diameter):
+        """Returns the scaled image, or None if it isn't in the bundle."""
+        entry = self.entries.get((image_name, diameter))
+
+        if entry is None:
+            return None
+
+        x, y = entry
+        image = self.atlas.subsurface((x, y, diameter, diameter))
+
+        if pygame.display.get_surface() is not None:
+            image = image.convert()
+
+        image.set_colorkey(BACKGROUND_COLOR)
+
+        return image
+
+
+def open_bundle(path = BUNDLE_PATH):
+    """Maps the bundle, returns None if it hasn't been built or is out of date."""
+    if not os.path.exists(path):
+        return None
+
+    try:
+        bundle = AssetBundle(path)
+    except (OSError, ValueError) as error:
+        print(f"Not using the asset bundle: {error}")
+        return None
+
+    if bundle.is_outdated():
+        print("The asset bundle is out of date, rebuild it with: python -m src.asset_bundle")
+        return None
+
+    return bundle
+
+
+if __name__ == "__main__":
+    entry_count, size = build_bundle()
+    print(f"Wrote {entry_count} scaled images, {size // 1024} KiB, to {os.path.relpath(BUNDLE_PATH)}")
@@ -0,0 +1,88 @@
+"""
+Shared cache of scaled sprite images.
+"""
+
+import threading
+import pygame
+from .constants import *
+from .functions import load_image
+
+class AssetCache:
+    """Hands out shared display format surfaces per (image, diameter).
+
+        Every asteroid fragment or slime blob of the same image and size shares
+        the same surface, so they must be treated as read-only. The masks are
+        made by the rotation cache, for the angle the sprite is drawn at. The
+        cache is locked as the level prefetcher scales images on its thread."""
+
+    def __init__(self):
+        self.assets = {}
+        self.lock = threading.Lock()
+        self.bundle = None
+        self.hits = 0
+        self.misses = 0
+        self.bundled = 0
+
+    def load_bundle(self, path = None):
+        """Uses the prebuilt asset bundle if it has been built, returns True if it's used."""
+        from .asset_bundle import BUNDLE_PATH, open_bundle
+
+        self.bundle = open_bundle(path or BUNDLE_PATH)
+
+        return self.bundle is not None
+
+    def get_scaled(self, image_name, diameter):
+        """Returns the image scaled to the diameter."""
+        key = (image_name, diameter)
+
+        with self.lock:
+            if key in self.assets:
+                self.hits += 1
+                return self.assets[key]
+
+            self.misses += 1
+
+            # The sizes the game uses are normally found already scaled in the bundle.
+            image = None
+            if self.bundle is not None:
+                image = self.bundle.get(image_name, diameter)
+
+            if image is not None:
+                self.bundled += 1
+            else:
+                # Scales from the original image every time, so repeated
+                # scaling never degrades the image.
+                image = pygame.transform.scale(load_image(image_name), (diameter, diameter))
+                image.set_colorkey(BACKGROUND_COLOR)
+
+            self.assets[key] = image
+
+        return image
+
+    def prewarm_sizes(self, image_name, diameters):
+        """Scales the image to all the diameters ahead of time, e.g. every size of a melting asteroid."""
+        for diameter in diameters:
+            self.get_scaled(image_name, diameter)
+
+    def get_memory_bytes(self):
+        """Approximate memory held by the cached surfaces."""
+        memory = 0
+
+        for image in self.assets.values():
+            width, height = image.get_size()
+            memory += image.get_bytesize() * width * height
+
+        return memory
+
+    def get_stats(self):
+        return {
+            "assets": len(self.assets),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bundled": self.bundled,
+            "memory_bytes": self.get_memory_bytes(),
+        }
+
+
+# The cache shared by all sprites.
+asset_cache = AssetCache()
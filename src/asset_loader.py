@@ -0,0 +1,159 @@
+"""
+Background loader that decodes the images and sounds on a thread pool, so the
+first frame only waits for the assets it draws and the rest stream in.
+"""
+
+import glob
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import pygame
+
+# Most worker threads used, one core is always left for the game itself.
+ASSET_LOADER_WORKERS = 4
+
+def get_worker_count():
+    return max(1, min(ASSET_LOADER_WORKERS, (os.cpu_count() or 1) - 1))
+
+class AssetTiming:
+    """When an asset was decoded and how long the game waited for it."""
+
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind
+        self.queued = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.thread_name = None
+        self.wait_time = 0
+
+    def get_decode_time(self):
+        if self.started is None or self.finished is None:
+            return None
+
+        return self.finished - self.started
+
+
+class AssetLoader:
+    """Decodes assets on worker threads.
+
+        Only the decoding is done in the background, converting a surface
+        to the display format is left to the main thread."""
+
+    def __init__(self, max_workers = None):
+        if max_workers is None:
+            max_workers = get_worker_count()
+
+        self.max_workers = max_workers
+        self.executor = None
+        self.futures = {}
+        self.timings = {}
+        self.start_time = time.perf_counter()
+
+    def submit(self, path, kind):
+        """Queues the asset for decoding unless it has been queued already,
+            the assets are decoded in the order they are queued."""
+        if path in self.futures:
+            return
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix = "asset_loader")
+
+        timing = AssetTiming(path, kind)
+        self.timings[path] = timing
+        self.futures[path] = self.executor.submit(self.decode, timing)
+
+    def submit_directory(self, directory, extension, kind):
+        """Queues every file with the extension in the directory, sounds can
+            only be decoded once the mixer has been initialized."""
+        paths = []
+
+        # The paths are built the same way as when the assets are requested.
+        for path in sorted(glob.glob(directory + "*" + extension)):
+            paths.append(directory + os.path.basename(path))
+
+        for path in paths:
+            self.submit(path, kind)
+
+        return paths
+
+    def decode(self, timing):
+        timing.started = time.perf_counter()
+        timing.thread_name = threading.current_thread().name
+
+        if timing.kind == "sound":
+            asset = pygame.mixer.Sound(timing.path)
+        else:
+            asset = pygame.image.load(timing.path)
+
+        timing.finished = time.perf_counter()
+
+        return asset
+
+    def is_ready(self, path):
+        return path in self.futures and self.futures[path].done()
+
+    def get(self, path, kind):
+        """Returns the decoded asset, waiting for it if it's being decoded. Assets that
+            were never queued, or are still waiting in the queue, are decoded right away
+            on this thread instead, so the game never waits behind other assets."""
+        future = self.futures.get(path)
+
+        if future is None or future.cancel():
+            timing = AssetTiming(path, kind)
+            self.timings[path] = timing
+
+            asset = self.decode(timing)
+            timing.wait_time = timing.get_decode_time()
+
+            future = Future()
+            future.set_result(asset)
+            self.futures[path] = future
+
+            return asset
+
+        if not future.done():
+            timing = self.timings[path]
+            wait_start = time.perf_counter()
+            future.result()
+            timing.wait_time = time.perf_counter() - wait_start
+
+        return future.result()
+
+    def get_image(self, path):
+        return self.get(path, "image")
+
+    def get_sound(self, path):
+        return self.get(path, "sound")
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait = False, cancel_futures = True)
+            self.executor = None
+
+    def print_timings(self):
+        """Prints when each asset was decoded relative to the loader start and how long the game waited for it."""
+        total_decode = 0
+        total_wait = 0
+
+        print(f"{'asset':45} {'start ms':>9} {'decode ms':>10} {'wait ms':>8}  thread")
+
+        for timing in sorted(self.timings.values(), key = lambda timing: timing.queued):
+            decode_time = timing.get_decode_time()
+            path = os.path.relpath(timing.path)
+
+            if decode_time is None:
+                print(f"{path:45} {'pending':>9}")
+                continue
+
+            total_decode += decode_time
+            total_wait += timing.wait_time
+            start_ms = (timing.started - self.start_time) * 1000
+            print(f"{path:45} {start_ms:9.1f} {decode_time * 1000:10.1f} {timing.wait_time * 1000:8.1f}  {timing.thread_name}")
+
+        print(f"{len(self.timings)} assets, {total_decode * 1000:.1f} ms decoding, {total_wait * 1000:.1f} ms waited for")
+
+
+# The loader shared by the image and sound loading functions.
+asset_loader = AssetLoader()
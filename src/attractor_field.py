@@ -0,0 +1,107 @@
+"""
+Batched attraction pass that sums the acceleration from every attractor, such as
+vortex holes, for every attractable sprite before the sprites are moved.
+"""
+
+import math
+from pygame.locals import Rect
+
+# The attraction never gets stronger than at this distance.
+ATTRACT_MIN_DISTANCE = 10
+
+class AttractorField:
+    """Computes the summed attraction from all attractors and hands
+        each sprite a single acceleration vector."""
+
+    def __init__(self, query_margin = 0):
+        # Extra space around the attract radius when querying the broadphase,
+        # since the grid holds the positions from the previous collision pass.
+        self.query_margin = query_margin
+
+    def get_attraction(self, attractor, dx, dy, distance):
+        """Returns the x/y acceleration at the distance from the attractor."""
+        g_acc = attractor.attract_acc / ((max(distance, ATTRACT_MIN_DISTANCE) / ATTRACT_MIN_DISTANCE)**2)
+
+        if distance == 0:
+            return (g_acc, 0)
+
+        return (g_acc * dx / distance, g_acc * dy / distance)
+
+    def apply_to_sprites(self, attractors, grid):
+        """Applies the attraction to the sprites near each attractor, the radius
+            cutoff is done by querying the broadphase grid."""
+        for attractor in attractors:
+            center_x, center_y = attractor.rect.center
+            radius = attractor.attract_radius
+
+            query_size = (radius + self.query_margin) * 2
+            query_rect = Rect(0, 0, query_size, query_size)
+            query_rect.center = (center_x, center_y)
+
+            for sprite in grid.query_rect(query_rect):
+                # Transparent objects can not be attracted
+                if sprite is attractor or sprite.transparent or not sprite.attractable:
+                    continue
+
+                dx = sprite.x - center_x
+                dy = sprite.y - center_y
+                distance = math.hypot(dx, dy)
+
+                if distance > radius:
+                    continue
+
+                sprite.add_acc_xy(*self.get_attraction(attractor, dx, dy, distance))
+
+    def apply_to_engine(self, engine, attractors):
+        """Applies the attraction of all attractors to all the sprites in the
+            physics engine in one vectorized pass."""
+        # Only this pass needs NumPy, which the engine has imported already.
+        import numpy
+
+        n = engine.count
+        arrays = engine.arrays
+
+        if n == 0 or len(attractors) == 0:
+            return
+
+        # Attractors along the rows and sprites along the columns.
+        center_x = numpy.array([attractor.rect.centerx for attractor in attractors], "float64")[:, None]
+        center_y = numpy.array([attractor.rect.centery for attractor in attractors], "float64")[:, None]
+        radius = numpy.array([attractor.attract_radius for attractor in attractors], "float64")[:, None]
+        attract_acc = numpy.array([attractor.attract_acc for attractor in attractors], "float64")[:, None]
+
+        dx = arrays["x"][:n][None, :] - center_x
+        dy = arrays["y"][:n][None, :] - center_y
+        distance = numpy.hypot(dx, dy)
+
+        inside = (distance <= radius) & arrays["attractable"][:n][None, :]
+
+        # An attractor never attracts itself.
+        for row, attractor in enumerate(attractors):
+            if attractor.physics is engine:
+                inside[row, attractor.physics_slot] = False
+
+        clamped = numpy.maximum(distance, ATTRACT_MIN_DISTANCE)
+        g_acc = numpy.where(inside, attract_acc / ((clamped / ATTRACT_MIN_DISTANCE)**2), 0)
+
+        # Unit vectors pointing away from the attractor, straight right when on top of it.
+        has_distance = distance > 0
+        safe_distance = numpy.where(has_distance, distance, 1)
+        unit_x = numpy.where(has_distance, dx / safe_distance, 1)
+        unit_y = numpy.where(has_distance, dy / safe_distance, 0)
+
+        total_ax = (g_acc * unit_x).sum(axis = 0)
+        total_ay = (g_acc * unit_y).sum(axis = 0)
+
+        arrays["ax"][:n] += total_ax
+        arrays["ay"][:n] += total_ay
+
+        # Sprites with their own logic apply the acceleration themselves
+        # and may have turned transparent since they were added.
+        for sprite in engine.get_controlled_sprites():
+            if sprite.transparent or not sprite.attractable:
+                continue
+
+            slot = sprite.physics_slot
+            sprite.a_ax += float(total_ax[slot])
+            sprite.a_ay += float(total_ay[slot])
@@ -0,0 +1,305 @@
+"""
+Batch simulator for balancing the campaign levels, runs many headless games
+across a process pool, each from a seed and a starting level with a scripted
+or bot policy at the controls, and aggregates how the levels played out.
+
+Run from the repository root with: python -m src.batch_simulator --levels 1-100 --games 20
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pygame
+from pygame.locals import *
+
+from .constants import *
+from .collision_layers import LAYER_HOSTILE
+from .frame_profiler import get_percentile
+from .asset_cache import asset_cache
+
+# A game that hasn't cleared its level by then is given up on.
+BATCH_MAX_TICKS = 3 * 60 * FPS
+BATCH_LIVES = 3
+
+# The aim bot fires once the ship points this close to its target, and brakes above the speed.
+AIM_TOLERANCE = 6
+AIM_MAX_SPEED = 2
+
+# The sweep rotates all the time and fires every few ticks.
+SWEEP_FIRE_INTERVAL = 8
+
+# Policies return the keys held down in the tick, the key events are
+# made from the difference to the keys held in the tick before.
+def idle_policy(game, tick):
+    return set()
+
+def sweep_policy(game, tick):
+    keys = {K_RIGHT}
+
+    if tick % SWEEP_FIRE_INTERVAL == 0:
+        keys.add(K_SPACE)
+
+    return keys
+
+def aim_policy(game, tick):
+    """Turns towards the closest hostile sprite and fires when facing it, braking if the ship drifts too fast."""
+    player = game.player
+    keys = set()
+
+    if math.hypot(player.vx, player.vy) > AIM_MAX_SPEED:
+        keys.add(K_DOWN)
+
+    target = None
+    target_distance = None
+    for sprite in game.layer_groups[LAYER_HOSTILE]:
+        distance = (sprite.x - player.x) ** 2 + (sprite.y - player.y) ** 2
+
+        if target is None or distance < target_distance:
+            target = sprite
+            target_distance = distance
+
+    if target is None:
+        return keys
+
+    # The angles grow clockwise as the y axis points down.
+    target_angle = math.degrees(math.atan2(target.y - player.y, target.x - player.x))
+    turn = (target_angle - player.angle + 540) % 360 - 180
+
+    if turn > AIM_TOLERANCE:
+        keys.add(K_RIGHT)
+    elif turn < -AIM_TOLERANCE:
+        keys.add(K_LEFT)
+    elif tick % 2 == 0:
+        # Space is tapped as the single shot only fires when it's pressed.
+        keys.add(K_SPACE)
+
+    return keys
+
+POLICIES = {
+    "idle": idle_policy,
+    "sweep": sweep_policy,
+    "aim": aim_policy,
+}
+
+def get_key_events(held_keys, keys):
+    """The key events going from the held keys to the keys, releases first
+        so releasing one rotation key doesn't stop the rotation just started."""
+    events = [pygame.event.Event(KEYUP, key = key) for key in sorted(held_keys - keys)]
+    events += [pygame.event.Event(KEYDOWN, key = key) for key in sorted(keys - held_keys)]
+
+    return events
+
+def init_worker():
+    pygame.font.init()
+    asset_cache.load_bundle()
+
+def run_game(seed, level_number, policy_name, max_ticks = BATCH_MAX_TICKS, lives = BATCH_LIVES):
+    """Plays the level from the seed until it's cleared, the player is out of lives or max_ticks have passed."""
+    from .game import Game
+
+    game = Game(None, headless = True, seed = seed)
+    policy = POLICIES[policy_name]
+
+    # The level is generated in the first tick.
+    game.level_number = level_number - 1
+    game.lives = lives
+
+    held_keys = set()
+    was_alive = True
+    deaths = 0
+    peak_sprites = 0
+    tick_times = []
+
+    while game.tick_count < max_ticks:
+        # The keys are let go with the ship, a respawned ship starts with none held.
+        if game.player.alive():
+            keys = policy(game, game.tick_count)
+            game.handle_events(get_key_events(held_keys, keys))
+            held_keys = keys
+        else:
+            held_keys = set()
+
+        start = time.perf_counter()
+        game.tick()
+        tick_times.append(time.perf_counter() - start)
+
+        alive = game.player.alive()
+        if was_alive and not alive:
+            deaths += 1
+        was_alive = alive
+
+        if len(game.sprite_group) > peak_sprites:
+            peak_sprites = len(game.sprite_group)
+
+        if game.level_number > level_number or game.is_game_over():
+            break
+
+    cleared = game.level_number > level_number or (game.is_level_cleared() and not game.has_next_level())
+    tick_times.sort()
+
+    return {
+        "seed": seed,
+        "level": level_number,
+        "policy": policy_name,
+        "cleared": cleared,
+        "ticks": game.tick_count,
+        "clear_seconds": game.tick_count / FPS if cleared else None,
+        "deaths": deaths,
+        "score": game.score,
+        "peak_sprites": peak_sprites,
+        "ms_per_tick": sum(tick_times) * 1000 / len(tick_times),
+        "p95_ms": get_percentile(tick_times, 95) * 1000,
+    }
+
+def get_jobs(levels, games, policies, seed):
+    """Every policy plays each level with the same seeds, so the policies are compared on the same games."""
+    jobs = []
+
+    for level_number in levels:
+        for game_index in range(games):
+            game_seed = seed + level_number * games + game_index
+
+            for policy_name in policies:
+                jobs.append((game_seed, level_number, policy_name))
+
+    return jobs
+
+def get_failure(job, error):
+    """The row of a game that raised, in place of its result."""
+    seed, level_number, policy_name = job
+
+    return {
+        "seed": seed,
+        "level": level_number,
+        "policy": policy_name,
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+def aggregate(results):
+    """Sums up the results of each level and policy, and of each policy over every level.
+        The games that failed are only counted, the rest of a row covers the games that finished."""
+    groups = {}
+
+    for result in results:
+        groups.setdefault((result["level"], result["policy"]), []).append(result)
+        groups.setdefault(("all", result["policy"]), []).append(result)
+
+    report = []
+    for (level_number, policy_name), group in groups.items():
+        finished = [result for result in group if "error" not in result]
+        clear_seconds = sorted(result["clear_seconds"] for result in finished if result["cleared"])
+        tick_costs = sorted(result["p95_ms"] for result in finished)
+        count = max(len(finished), 1)
+
+        report.append({
+            "level": level_number,
+            "policy": policy_name,
+            "games": len(finished),
+            "failed": len(group) - len(finished),
+            "clear_rate": len(clear_seconds) / count,
+            "median_clear_seconds": get_percentile(clear_seconds, 50) if clear_seconds else None,
+            "p90_clear_seconds": get_percentile(clear_seconds, 90) if clear_seconds else None,
+            "mean_deaths": sum(result["deaths"] for result in finished) / count,
+            "peak_sprites": max((result["peak_sprites"] for result in finished), default = 0),
+            "ms_per_tick": sum(result["ms_per_tick"] for result in finished) / count,
+            "p95_ms": get_percentile(tick_costs, 95),
+        })
+
+    # The levels in order, the totals last.
+    report.sort(key = lambda row: (row["level"] == "all", row["level"] if row["level"] != "all" else 0, row["policy"]))
+
+    return report
+
+def format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds:.1f}"
+
+def print_report(report):
+    print(f"{'level':>5} {'policy':8} {'games':>5} {'failed':>6} {'cleared':>7} {'median s':>8} {'p90 s':>7} {'deaths':>6} {'peak spr':>8} {'ms/tick':>8} {'p95 ms':>7}")
+
+    for row in report:
+        print(f"{row['level']:>5} {row['policy']:8} {row['games']:>5} {row['failed']:>6} {row['clear_rate']:>7.0%} "
+              f"{format_seconds(row['median_clear_seconds']):>8} {format_seconds(row['p90_clear_seconds']):>7} "
+              f"{row['mean_deaths']:>6.2f} {row['peak_sprites']:>8} {row['ms_per_tick']:>8.3f} {row['p95_ms']:>7.3f}")
+
+def parse_levels(value):
+    """Level numbers from a comma separated list of numbers and ranges, e.g. 1-10,20,50-60."""
+    levels = []
+
+    for part in value.split(","):
+        first, separator, last = part.partition("-")
+        levels.extend(range(int(first), int(last if separator else first) + 1))
+
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type = parse_levels, default = parse_levels("1-100"),
+                        help = "comma separated levels and ranges to play, e.g. 1-10,50")
+    parser.add_argument("--games", type = int, default = 10, help = "games per level and policy")
+    parser.add_argument("--policies", nargs = "+", choices = list(POLICIES), default = ["aim"])
+    parser.add_argument("--seed", type = int, default = 1)
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--max-ticks", type = int, default = BATCH_MAX_TICKS)
+    parser.add_argument("--lives", type = int, default = BATCH_LIVES)
+    parser.add_argument("--output", metavar = "PATH", help = "write the result of every game to a JSON lines file as it comes in")
+    parser.add_argument("--report", metavar = "PATH", help = "write the aggregated report to a JSON file")
+    args = parser.parse_args()
+
+    jobs = get_jobs(args.levels, args.games, args.policies, args.seed)
+    print(f"Playing {len(jobs)} games on {args.workers} workers")
+
+    output_file = open(args.output, "w") if args.output is not None else None
+    results = []
+    start_time = time.perf_counter()
+
+    failures = 0
+
+    # The results are taken as each game finishes, so the output is
+    # complete up to the latest game if the run is stopped. A game that
+    # raises is written down as failed and the others keep going.
+    with ProcessPoolExecutor(args.workers, initializer = init_worker) as executor:
+        futures = {executor.submit(run_game, *job, args.max_ticks, args.lives): job for job in jobs}
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                result = get_failure(futures[future], error)
+                failures += 1
+
+            results.append(result)
+
+            if output_file is not None:
+                output_file.write(json.dumps(result) + "\n")
+                output_file.flush()
+
+            if "error" in result:
+                outcome = f"failed, {result['error']}"
+            else:
+                cleared = f"cleared in {result['clear_seconds']:.1f} s" if result["cleared"] else "not cleared"
+                outcome = f"{cleared}, {result['deaths']} deaths, peak {result['peak_sprites']} sprites"
+
+            print(f"[{len(results)}/{len(jobs)}] level {result['level']} {result['policy']} seed {result['seed']}: {outcome}", flush = True)
+
+    if output_file is not None:
+        output_file.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Played {len(results)} games in {elapsed:.1f} s, {failures} failed")
+
+    report = aggregate(results)
+    print_report(report)
+
+    if args.report is not None:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent = 2)
+
+    if failures > 0:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Pool of bullets reused between shots, so that firing doesn't create a new
+sprite, surface and mask for every bullet.
+"""
+
+from .sprites.bullet import Bullet
+
+# Bullets created up front and the most bullets that can be in flight at once.
+BULLET_POOL_SIZE = 64
+BULLET_POOL_CAPACITY = 1024
+
+class BulletPool:
+    """Bounded pool of bullets, a bullet returns to the pool when it's killed.
+
+        Once every bullet up to the capacity is in flight no more bullets
+        can be fired until one of them is killed."""
+
+    def __init__(self, clock = None, size = BULLET_POOL_SIZE, capacity = BULLET_POOL_CAPACITY):
+        self.clock = clock
+        self.capacity = capacity
+        self.free_bullets = []
+        self.allocated = 0
+
+        # Occupancy stats.
+        self.active = 0
+        self.peak_active = 0
+        self.acquired = 0
+        self.dropped = 0
+
+        for i in range(min(size, capacity)):
+            self.free_bullets.append(self.create_bullet())
+
+    def create_bullet(self):
+        bullet = Bullet(clock = self.clock)
+        bullet.pool = self
+        self.allocated += 1
+
+        return bullet
+
+    def acquire(self):
+        """Returns a bullet ready to be reset and fired, or None if the pool is exhausted."""
+        if self.free_bullets:
+            bullet = self.free_bullets.pop()
+        elif self.allocated < self.capacity:
+            bullet = self.create_bullet()
+        else:
+            self.dropped += 1
+            return None
+
+        self.acquired += 1
+        self.active += 1
+        if self.active > self.peak_active:
+            self.peak_active = self.active
+
+        return bullet
+
+    def release(self, bullet):
+        self.active -= 1
+        self.free_bullets.append(bullet)
+
+    def get_state(self):
+        return (self.allocated, self.active, self.peak_active, self.acquired, self.dropped)
+
+    def set_state(self, state):
+        """Refills the pool to the same number of free bullets for a restored
+            game, the bullets in flight are restored with the other sprites."""
+        allocated, active, self.peak_active, self.acquired, self.dropped = state
+
+        self.allocated = 0
+        self.free_bullets = [self.create_bullet() for i in range(allocated - active)]
+        self.allocated = allocated
+        self.active = active
+
+    def get_stats(self):
+        return {
+            "active": self.active,
+            "free": len(self.free_bullets),
+            "allocated": self.allocated,
+            "capacity": self.capacity,
+            "peak_active": self.peak_active,
+            "acquired": self.acquired,
+            "dropped": self.dropped,
+            "occupancy": self.active / self.capacity,
+        }
@@ -0,0 +1,31 @@
+"""
+Collision layers, every sprite belongs to one layer and only the layers
+marked in the collision matrix are tested against each other.
+"""
+
+from .functions import collision_detect
+
+LAYER_PLAYER = "player"
+LAYER_PLAYER_PROJECTILE = "player_projectile"
+LAYER_HOSTILE = "hostile"
+LAYER_TOXIC = "toxic"   # Kills the player upon touching it but other objects can pass it
+
+COLLISION_LAYERS = (LAYER_PLAYER, LAYER_PLAYER_PROJECTILE, LAYER_HOSTILE, LAYER_TOXIC)
+
+# Each layer and the layers its sprites can hit, in the order they are checked.
+# Bullets can't hit the ship firing them since the player layer is never a target of them.
+COLLISION_MATRIX = (
+    (LAYER_PLAYER, (LAYER_HOSTILE, LAYER_TOXIC)),
+    (LAYER_PLAYER_PROJECTILE, (LAYER_HOSTILE,)),
+)
+
+# The layers hit by a nuke.
+NUKE_LAYERS = (LAYER_HOSTILE, LAYER_TOXIC)
+
+def collide_layer_sprites(sprite, target):
+    """Narrowphase for sprites in interacting layers, transparent targets
+        are skipped before any shape is tested unless they are toxic."""
+    if target.transparent and not target.toxic:
+        return False
+
+    return collision_detect(sprite, target)
@@ -0,0 +1,198 @@
+"""
+Frame profiler recording the time of each phase of a frame, the update and
+collision time per sprite class, the sprite counts and the candidate pairs.
+"""
+
+import csv
+import json
+import time
+from collections import deque
+
+# Frames the percentiles are computed over and how often the overlay is refreshed.
+FRAME_PROFILE_WINDOW = 300
+FRAME_PROFILE_REFRESH = 30
+
+FRAME_PROFILE_PERCENTILES = (50, 95, 99)
+
+def get_percentile(sorted_values, percentile):
+    """Nearest rank percentile of values sorted in ascending order."""
+    if not sorted_values:
+        return 0
+
+    rank = max(1, -(-percentile * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+
+class FrameProfiler:
+    """Times the frames while enabled, every call returns at once otherwise.
+
+        A frame is started with start_frame, each phase ends with a mark naming
+        it and the frame is ended with end_frame. The frames are only kept for
+        the dump when recording, the percentiles cover the latest frames."""
+
+    def __init__(self, count_candidate_pairs = None, window = FRAME_PROFILE_WINDOW):
+        # Returns the candidate pairs tested so far, the difference is taken over the frame.
+        self.count_candidate_pairs = count_candidate_pairs
+        self.enabled = False
+        self.recording = False
+        self.overlay = False
+        self.frames = []
+        self.frame_times = deque(maxlen = window)
+        self.percentiles = {}
+        self.frame_count = 0
+
+        self.frame = None
+        self.frame_start = 0
+        self.last_mark = 0
+        self.start_candidate_pairs = 0
+
+    def enable(self, recording = False):
+        self.enabled = True
+        self.recording = self.recording or recording
+
+    def toggle_overlay(self):
+        """Shows or hides the overlay, the profiler is enabled the first time it's shown."""
+        self.overlay = not self.overlay
+
+        if self.overlay:
+            self.enabled = True
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        self.frame_start = now
+        self.last_mark = now
+        self.frame = {"phases": {}, "update": {}, "collision": {}}
+
+        if self.count_candidate_pairs is not None:
+            self.start_candidate_pairs = self.count_candidate_pairs()
+
+    def mark(self, phase):
+        """Ends the phase, the time since the previous mark is added to it."""
+        if self.frame is None:
+            return
+
+        now = time.perf_counter()
+        phases = self.frame["phases"]
+        phases[phase] = phases.get(phase, 0) + now - self.last_mark
+        self.last_mark = now
+
+    def time_sprites(self, kind, sprites, function, *args):
+        """Calls the function for every sprite and adds up the time per sprite class."""
+        if self.frame is None:
+            for sprite in sprites:
+                function(sprite, *args)
+            return
+
+        class_times = self.frame[kind]
+        perf_counter = time.perf_counter
+
+        for sprite in sprites:
+            start = perf_counter()
+            function(sprite, *args)
+            name = type(sprite).__name__
+            class_times[name] = class_times.get(name, 0) + perf_counter() - start
+
+    def end_frame(self, sprites, wait_phase = None):
+        """Ends the frame, the time since the last mark is added to the wait phase if given.
+            The wait, such as the frame cap, isn't counted as frame time."""
+        frame = self.frame
+
+        if frame is None:
+            return
+
+        frame_time = self.last_mark - self.frame_start
+        if wait_phase is not None:
+            self.mark(wait_phase)
+
+        sprite_counts = {}
+        for sprite in sprites:
+            name = type(sprite).__name__
+            sprite_counts[name] = sprite_counts.get(name, 0) + 1
+
+        frame["frame"] = self.frame_count
+        frame["frame_time"] = frame_time
+        frame["sprites"] = sprite_counts
+        frame["candidate_pairs"] = 0
+
+        if self.count_candidate_pairs is not None:
+            frame["candidate_pairs"] = self.count_candidate_pairs() - self.start_candidate_pairs
+
+        self.frame_count += 1
+        self.frame_times.append(frame_time)
+        self.frame = None
+
+        if self.recording:
+            self.frames.append(frame)
+
+        if self.frame_count % FRAME_PROFILE_REFRESH == 0 or not self.percentiles:
+            self.update_percentiles()
+
+        # Stops timing once the overlay is hidden unless the frames are being recorded.
+        if not self.overlay and not self.recording:
+            self.enabled = False
+
+    def update_percentiles(self):
+        frame_times = sorted(self.frame_times)
+
+        for percentile in FRAME_PROFILE_PERCENTILES:
+            self.percentiles[percentile] = get_percentile(frame_times, percentile)
+
+    def get_overlay_lines(self):
+        """The overlay text, which only changes when the percentiles are refreshed."""
+        percentiles = " ".join(f"p{percentile} {self.percentiles.get(percentile, 0) * 1000:.1f}" for percentile in FRAME_PROFILE_PERCENTILES)
+
+        return [f"Frame ms: {percentiles}"]
+
+    def get_rows(self):
+        """The recorded frames as flat rows, with a column per phase and per sprite class."""
+        rows = []
+
+        for frame in self.frames:
+            row = {
+                "frame": frame["frame"],
+                "frame_ms": round(frame["frame_time"] * 1000, 4),
+                "candidate_pairs": frame["candidate_pairs"],
+                "sprites": sum(frame["sprites"].values()),
+            }
+
+            for phase, elapsed in frame["phases"].items():
+                row[phase + "_ms"] = round(elapsed * 1000, 4)
+
+            for kind in ("update", "collision"):
+                for name, elapsed in frame[kind].items():
+                    row[f"{kind}_{name}_ms"] = round(elapsed * 1000, 4)
+
+            for name, count in frame["sprites"].items():
+                row["count_" + name] = count
+
+            rows.append(row)
+
+        return rows
+
+    def dump(self, path):
+        """Writes the recorded frames as JSON lines, or as CSV if the path ends with .csv."""
+        rows = self.get_rows()
+
+        with open(path, "w", newline = "") as dump_file:
+            if path.endswith(".csv"):
+                fieldnames = []
+                for row in rows:
+                    for field in row:
+                        if field not in fieldnames:
+                            fieldnames.append(field)
+
+                writer = csv.DictWriter(dump_file, fieldnames, restval = 0)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    dump_file.write(json.dumps(row) + "\n")
+
+        return len(rows)
+
+    def print_summary(self):
+        self.update_percentiles()
+        print(self.get_overlay_lines()[0] + f" over the last {len(self.frame_times)} frames")
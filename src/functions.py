@@ -1,19 +1,21 @@
 import sys
 import time
-import random
 import math
 import pygame
 import pygame.sprite
 from pygame.locals import *
 import os
 from .constants import *
+from .asset_loader import asset_loader
+from .rng import sprite_random
 
-# For now this is placed in the folder below this
-IMAGE_BASE_PATH = "src/data/"
+# The data folder next to this file, so the game can be started from any directory.
+IMAGE_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "")
 
 # Function definitions.
 def terminate():
     print(f"Thanks so much for playing {GAME_NAME} and have a nice day!")
+    asset_loader.shutdown()
     pygame.quit()
     sys.exit()
     
@@ -29,18 +31,18 @@ def collision_detect(sprite_a, sprite_b):
         return False
 
     # Finally does pixel perfect collision with masks.
-    return pygame.sprite.collide_mask(sprite_a, sprite_b)    
+    return pygame.sprite.collide_mask(sprite_a, sprite_b)
 
 def get_millis():
         return time.time_ns() // 1000000
 
-def generate_angle(occupied_angles = []):
+def generate_angle(occupied_angles = [], rng = sprite_random):
     """Generates a random angle and also avoids duplicate
         angles based on the occupied angles supplied, albeit
         this won't work flawlessly if more than 2 angles are to be
-        generated."""
+        generated. The angle is drawn from the random stream given."""
 
-    angle = random.randint(0, 360)
+    angle = rng.randint(0, 360)
 
     for o_a in occupied_angles:
         if angle == o_a:
@@ -52,7 +54,7 @@ def generate_angle(occupied_angles = []):
     # at the top of the screen drifting perfectly horizontally
     # and thus never being shown.
     if angle % 90 == 0:
-        angle += random.choice([-1, 1])
+        angle += rng.choice([-1, 1])
 
     return angle
 
@@ -65,40 +67,39 @@ def load_image(image, loaded_images = {}):
     if image_path in loaded_images:
         return loaded_images[image_path]
 
-    # Loads the image
-    loaded_image = pygame.image.load(image_path).convert()
+    # Loads the image, or waits for the asset loader if it's being decoded in the background,
+    # and converts it to the display format unless running headless without a display.
+    loaded_image = asset_loader.get_image(image_path)
+
+    if pygame.display.get_surface() is not None:
+        loaded_image = loaded_image.convert()
 
     # Caches the image and then returns it.
     loaded_images[image_path] = loaded_image
     
     return loaded_image
 
-def add_vectors(v1, a1, v2, a2):
-    """Adds 2 vectors returning a new vector and angle"""
-    r1 = math.radians(a1)
-    xv1 = v1 * math.cos(r1)
-    yv1 = v1 * math.sin(r1)
+def load_font(size, loaded_fonts = {}):
+    """Loads the font file bundled with pygame, cached by size.
+        This avoids the slow system font lookup done by SysFont."""
 
-    r2 = math.radians(a2)
-    xv2 = v2 * math.cos(r2)
-    yv2 = v2 * math.sin(r2)
+    if size not in loaded_fonts:
+        loaded_fonts[size] = pygame.font.Font(None, size)
 
-    new_xv = xv1 + xv2
-    new_yv = yv1 + yv2
-    newv = ((new_xv**2)+(new_yv**2))**0.5
+    return loaded_fonts[size]
 
-    new_angle = 0
+# Sine and cosine of every whole degree since most angles, such as facing angles, are whole degrees.
+SIN_TABLE = [math.sin(math.radians(degree)) for degree in range(360)]
+COS_TABLE = [math.cos(math.radians(degree)) for degree in range(360)]
 
-    if newv != 0:
-        # We know the x_speed, y_speed, velocity, now setting the new angle.
-        new_radians = math.asin(new_yv / newv)
-        #new_radians = math.atan(new_yv / new_xv)
-        new_angle = math.degrees(new_radians)
-        
-        # Flips the angle in case the x_speed is negative.
-        if new_xv < 0:
-            new_angle = 180 - new_angle
+def sin_cos(angle):
+    """Returns the sine and cosine of an angle in degrees,
+        using the lookup tables for whole degrees."""
+    degree = int(angle)
 
-    return (newv, new_angle)
+    if degree == angle:
+        degree %= 360
+        return SIN_TABLE[degree], COS_TABLE[degree]
 
-    
+    radians = math.radians(angle)
+    return math.sin(radians), math.cos(radians)
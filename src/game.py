@@ -6,39 +6,33 @@ TODO Possibly split this up into several classes
 """
 
 # Imports
-import sys
 import time
-import random
-import math
 import pygame
 import pygame.sprite
-import pygame.mixer
-import os
-import glob
-from pygame.locals import *
-from .constants import *
-
-from .sprites.asteroid import Asteroid
-from .sprites.slime_blob import SlimeBlob
-from .sprites.space_ship import SpaceShip
-from .sprites.bullet import Bullet
-from .sprites.vortex_hole import VortexHole
-
-
-#from .sprites import asteroid.Asteroid as Asteroid
-#from .sprites import slime_blob.SlimeBlob as SlimeBlob
-#from .sprites import space_ship.SpaceShip as SpaceShip
-#from .sprites import bullet.Bullet as Bullet
-
-#from .sprites import * #asteroid.Asteroid as Asteroid, slime_blob.SlimeBlob as SlimeBlob, space_ship.SpaceShip as SpaceShip, bullet.Bullet as Bullet
-from .functions import *
+from pygame.locals import (QUIT, KEYDOWN, KEYUP, VIDEOEXPOSE, WINDOWEXPOSED, K_UP, K_DOWN, K_LEFT, K_RIGHT,
+                           K_SPACE, K_b, K_n, K_p, K_q, K_r, K_w)
+from .constants import WINDOWWIDTH, WINDOWHEIGHT, WINDOW_SCREEN, FPS, STARTING_LEVEL, BACKGROUND_COLOR, TEXT_COLOR
 
-from .level.level import Level
-from .level.campaign_level import CampaignLevel
-
-from .level import *
-from .text_message import *
-from .sound_box import *
+# Only the ship is needed at start, the other sprites, the levels, the physics
+# engine, the attraction pass, the replays and the snapshots are imported where
+# they are first used.
+from .sprites.space_ship import SpaceShip
+from .functions import terminate, load_font
+from .text_message import TextMessage
+from .sound_box import SoundBox, SilentSoundBox
+from .spatial_hash import SpatialHash, COLLISION_CELL_SIZE
+from .collision_layers import (LAYER_PLAYER, LAYER_PLAYER_PROJECTILE, COLLISION_LAYERS, COLLISION_MATRIX, NUKE_LAYERS,
+                               collide_layer_sprites)
+from .sim_clock import SimulationClock
+from .renderer import DirtyRectRenderer
+from .text_cache import TextCache, Hud
+from .rotation_cache import rotation_cache
+from .asset_cache import asset_cache
+from .asset_loader import asset_loader
+from .startup_profile import startup_profile
+from .work_scheduler import WorkScheduler, IDLE_FRAME_SHARE
+from .frame_profiler import FrameProfiler
+from .rng import random_streams, spawn_random
 
 # constants
 PLAYER_START_X = WINDOWWIDTH//2
@@ -54,22 +48,93 @@ GAME_INFO_MARGINS = 20
 GAME_INFO_BASE_X = GAME_INFO_MARGINS
 GAME_INFO_BASE_Y = GAME_INFO_MARGINS
 
+# Ticks between the checkpoints of a headless game, a checkpoint waits for a tick without deferred work.
+CHECKPOINT_INTERVAL = 60 * FPS
+
 class Game:
     """Main class representing the Game"""
     
-    def __init__(self, surface):
+    def __init__(self, surface, headless = False, max_ticks = None, render_every = 0, dirty_rects = True, prewarm_rotations = False, physics_engine = False,
+                 asset_timings = False, prefetch_levels = None, frame_profile = None, seed = None, record = None, replay = None,
+                 replay_from = None, checkpoint = None, restore = None):
         
+        # Every random number in the game is drawn from the streams seeded here,
+        # a new seed is picked unless the game is replayed or given one.
+        if replay is not None:
+            seed = replay.seed
+            physics_engine = replay.physics_engine
+
+        random_streams.seed(seed)
+        self.seed = random_streams.master_seed
+
         # Inits attributes.
+        self.headless = headless
+        self.max_ticks = max_ticks
+        self.render_every = render_every
+        self.tick_count = 0
+        self.prewarm_rotations = prewarm_rotations
+        self.ticks_per_second = 0
+        self.asset_timings = asset_timings
+
+        # Headless games draw into an offscreen surface, and only
+        # when a frame is requested.
+        if surface is None:
+            surface = pygame.Surface((WINDOWWIDTH, WINDOWHEIGHT))
+
         self.windowSurface = surface
-        self.font = pygame.font.SysFont(None, GAME_INFO_FONT_SIZE)
-        self.big_font = pygame.font.SysFont(None, GAME_INFO_BIG_FONT_SIZE)
+
+        # Without the renderer every frame fills and updates the whole screen.
+        self.renderer = None
+        if dirty_rects:
+            self.renderer = DirtyRectRenderer(surface)
+
+        # Every timer in the game reads this clock, which advances one fixed step per tick.
+        self.clock = SimulationClock()
+        with startup_profile.phase("font load"):
+            self.font = load_font(GAME_INFO_FONT_SIZE)
+            self.big_font = load_font(GAME_INFO_BIG_FONT_SIZE)
+        self.text_cache = TextCache()
+        self.hud = Hud(self.font, self.text_cache, GAME_INFO_BASE_X, GAME_INFO_BASE_Y, GAME_INFO_MARGINS)
         self.mainClock = pygame.time.Clock()
         
         self.sprite_group = pygame.sprite.Group()
-        self.ship_group = pygame.sprite.Group()
-        self.bullet_group = pygame.sprite.Group()
         self.gas_wall_group = pygame.sprite.Group()
-        self.sound_box = SoundBox()
+        self.attractor_group = pygame.sprite.Group()
+
+        # Every sprite is also in the group of its collision layer, and
+        # each layer has its own broadphase grid.
+        self.layer_groups = {}
+        self.layer_grids = {}
+        for layer in COLLISION_LAYERS:
+            self.layer_groups[layer] = pygame.sprite.Group()
+            self.layer_grids[layer] = SpatialHash(WINDOWWIDTH, WINDOWHEIGHT, COLLISION_CELL_SIZE)
+
+        self.ship_group = self.layer_groups[LAYER_PLAYER]
+        self.bullet_group = self.layer_groups[LAYER_PLAYER_PROJECTILE]
+        from .bullet_pool import BulletPool
+        self.bullet_pool = BulletPool(self.clock)
+        self.scheduler = WorkScheduler()
+
+        # The frames are only timed while the overlay is shown, or for the whole
+        # game when they are written to the frame profile on exit.
+        self.profiler = FrameProfiler(self.count_candidate_pairs)
+        self.frame_profile = frame_profile
+        if frame_profile is not None:
+            self.profiler.enable(recording = True)
+        self.attractor_field = None
+
+        # The optional NumPy engine moves all the sprites in one vectorized step.
+        self.physics = None
+        if physics_engine:
+            from .physics_engine import PhysicsEngine
+            self.physics = PhysicsEngine(WINDOWWIDTH, WINDOWHEIGHT)
+
+        self.has_gas_walls = False
+        with startup_profile.phase("sound load"):
+            if headless:
+                self.sound_box = SilentSoundBox()
+            else:
+                self.sound_box = SoundBox()
         self.text_message = None
         self.level = None
         self.level_number = 0
@@ -80,18 +145,65 @@ class Game:
             self.level_number = STARTING_LEVEL
         
         self.level_count = 100
+
+        # The next level is built in the background while the current one is played. A level
+        # draws only from its own random stream, so it's the same whichever thread builds it.
+        # Headless games build their levels on the spot, they run the ticks back to back with
+        # no frame to keep smooth, and a worker thread would only compete with them for the GIL.
+        if prefetch_levels is None:
+            prefetch_levels = not headless
+
+        self.level_prefetcher = None
+        if prefetch_levels:
+            from .level.level_prefetcher import LevelPrefetcher
+            self.level_prefetcher = LevelPrefetcher(self.build_level)
+
         self.respawn_player(False)
         self.lives = 0
         self.score = 0
-        self.has_gas_walls = False
+
+        # Records the seed and the input of every tick to the replay file.
+        self.recorder = None
+        if record is not None:
+            from .replay import ReplayRecorder
+            self.recorder = ReplayRecorder(record, self.seed, self.physics is not None)
+
+        self.replay = replay
+        self.replay_from = replay_from
+
+        # The ticks since the game started, unlike tick_count it keeps counting when
+        # a level is retried, so the replays are kept by this tick.
+        self.replay_tick = 0
+
+        # Each level is saved as it starts so it can be retried, and headless games
+        # write a checkpoint now and then to continue a long simulation from.
+        self.level_snapshot = None
+        self.level_snapshot_pending = False
+        self.checkpoint = checkpoint
+        self.restore = restore
+        self.last_checkpoint = 0
+        self.checkpoint_count = 0
+        self.checkpoint_size = 0
+        self.checkpoint_time = 0
     
     def is_level_cleared(self):
         """Evaluates if the level is cleared and the next level should be set."""
         if self.level is None:
             return False
 
+        # Fragments or level sprites still waiting to enter the game.
+        if self.scheduler.has_work():
+            return False
+
         return self.level.is_cleared(self.sprite_group)
 
+    def is_game_over(self):
+        """The game is over once the player is out of lives or every level is cleared."""
+        if self.lives <= 0 and not self.player.alive():
+            return True
+
+        return not self.has_next_level() and self.is_level_cleared()
+
     def has_next_level(self):
         return self.level_number < self.level_count
 
@@ -103,82 +215,161 @@ class Game:
     
     def generate_next_level(self):
         self.level_number += 1
-        level = CampaignLevel(self.level_number, WINDOWWIDTH, WINDOWHEIGHT)
-        self.set_level(level)
+
+        with startup_profile.phase(f"level {self.level_number} generation"):
+            if self.level_prefetcher is not None:
+                level = self.level_prefetcher.get_level(self.level_number)
+            else:
+                level = self.build_level(self.level_number)
+
+            self.set_level(level)
+
+        # Starts building the level after this one right away.
+        if self.level_prefetcher is not None and self.has_next_level():
+            self.level_prefetcher.prefetch(self.level_number + 1)
+
+    def build_level(self, number):
+        """Builds the level, this runs on the prefetcher's thread when the levels are prefetched."""
+        # The levels are only imported once the first one is generated.
+        from .level.campaign_level import CampaignLevel
+
+        level = CampaignLevel(number, WINDOWWIDTH, WINDOWHEIGHT, self.clock)
+
+        if self.prewarm_rotations:
+            self.prewarm_rotation_cache(level)
+
+        return level
         
     def set_level(self, level):
         self.level = level
+        self.level.start()
         self.set_message( level.name )
         self.toggle_gas_walls(self.level.has_letal_walls())
+        self.level_snapshot_pending = True
+
+        # The cache warming only runs in the time left over in a frame, which headless games don't have.
+        if not self.headless:
+            self.scheduler.submit_idle(self.warm_fragment_rotations(level))
+
+    def prewarm_rotation_cache(self, level):
+        """Fills the rotation cache before the level starts so the ship never rotates an image during play."""
+        ship_angles = range(0, 360, self.player.rotate_speed)
+        rotation_cache.prewarm(self.player.org_image, ship_angles)
+
+        # Level sprites sharing the same scaled image are only prewarmed once.
+        level_images = {}
+        for sprite in level.sprites:
+            level_images[sprite.org_image] = None
+
+        for image in level_images:
+            rotation_cache.prewarm(image)
+
+    def warm_fragment_rotations(self, level):
+        """Rotates the images of the fragments the level's sprites split into to every angle, one angle per step."""
+        fragment_images = {}
+        for sprite in level.sprites:
+            if sprite.should_split:
+                diameter = sprite.get_split_asteroid_radius() * 2
+                fragment_images[asset_cache.get_scaled(sprite.sprite_image, diameter)] = None
+
+        for image in fragment_images:
+            for angle in range(0, 360, rotation_cache.step):
+                rotation_cache.get(image, angle)
+                yield
 
     def set_message(self, message):
         x = (WINDOWWIDTH // 2) - 100
         y = WINDOWHEIGHT // 2
         
-        self.text_message = TextMessage(message, x, y)        
+        self.text_message = TextMessage(message, x, y, self.clock)        
         
     def hit_sprite(self, sprite):      
+        # The physics engine only writes the position back for the sprites being drawn.
+        if sprite.physics is not None:
+            sprite.physics.sync_sprite(sprite)
+
         score = sprite.hit()
 
+        # Hitting a sprite may change its size, such as a melting asteroid.
+        if sprite.physics is not None:
+            sprite.physics.refresh(sprite)
+
         if score is not None:
             self.score += score
         
-        if isinstance(sprite, Asteroid):
-            self.sound_box.play("asteroid_split")
-        elif isinstance(sprite, SlimeBlob):
-            self.sound_box.play("slime_kill")
-        elif isinstance(sprite, SpaceShip):
-            self.sound_box.play("ship_kill")
+        if sprite.hit_sound is not None:
+            self.sound_box.play(sprite.hit_sound)
         
         # TODO What if we want to enable a sprite to "split" or spawn other sprites after a certain time automatically?
-        if sprite.should_split:
-            split_sprites = sprite.split()
-                                                    
-            for split_sprite in split_sprites:
-                self.add_sprite(split_sprite)
+        # The fragments of a destroyed sprite are created within the tick's work budget,
+        # or in a later tick if a chain reaction has used it up.
+        if sprite.should_split and not sprite.alive():
+            self.scheduler.submit(self.split_sprite, sprite)
+
+    def split_sprite(self, sprite):
+        split_sprites = sprite.split()
+                                                
+        for split_sprite in split_sprites:
+            self.add_sprite(split_sprite)
+
+        return len(split_sprites)
     
     def respawn_player(self, decrease_lives = True):
         if decrease_lives:
             self.lives -= 1
             
-        self.player = SpaceShip(PLAYER_START_X, PLAYER_START_Y, PLAYER_DIAMETER)
+        self.player = SpaceShip(PLAYER_START_X, PLAYER_START_Y, PLAYER_DIAMETER, self.clock)
+
+        # If gas walls are enabled the players ship is killed when it's outside the screen
+        self.player.remove_off_scren = self.has_gas_walls
         self.add_sprite(self.player)
-        self.ship_group.add(self.player)
         
         self.sound_box.play("ship_respawn")
 
     def spawn_asteroid(self):
+        from .sprites.asteroid import Asteroid
+
         ast_x, ast_y = 500, 500
-        asteroid = Asteroid(ast_x, ast_y)
-        asteroid.set_angle(random.randint(0, 360))
-        asteroid.velocity = random.randint(50, 200) / 100
+        asteroid = Asteroid(ast_x, ast_y, angle = spawn_random.randint(0, 360))
+        asteroid.velocity = spawn_random.randint(50, 200) / 100
 
         self.add_sprite(asteroid)
 
 
     def fire_bullet(self):
+        bullets = self.player.fire_bullets(self.bullet_pool)
+
+        if not bullets:
+            return
+
         self.sound_box.play("laser_shoot")
-        
-        bullet = self.player.fire_bullet()
-        self.sprite_group.add(bullet)
-        self.bullet_group.add(bullet)
+
+        for bullet in bullets:
+            self.add_sprite(bullet)
+
+    def cycle_weapon_mode(self):
+        weapon_mode = self.player.cycle_weapon_mode()
+        self.set_message(weapon_mode.name)
 
     def spawn_vortex_hole(self):
         """Spawns a new vortex hole"""
+        from .sprites.vortex_hole import VortexHole
 
-        vx = random.randint(200, WINDOWWIDTH-200)
-        vy = random.randint(100, WINDOWHEIGHT-100)
+        vx = spawn_random.randint(200, WINDOWWIDTH-200)
+        vy = spawn_random.randint(100, WINDOWHEIGHT-100)
         
         vortex_hole = VortexHole(vx, vy)
         self.add_sprite(vortex_hole)
 
     def spawn_melting_asteroid(self):
+        from .sprites.melting_asteroid import MeltingAsteroid, MELTING_ASTEROID_RADIUS
+
         print("Now spawning a melting asteroid")
         
         ast_x, ast_y = 500, 500
-        masteroid = MeltingAsteroid(ast_x, ast_y, 70, "sprites/melting_asteroid_a.png")
-        masteroid.set_angle(random.randint(0, 360))
-        masteroid.velocity = random.randint(50,70) / 100
+        masteroid = MeltingAsteroid(ast_x, ast_y, MELTING_ASTEROID_RADIUS, "sprites/melting_asteroid_a.png")
+        masteroid.set_angle(spawn_random.randint(0, 360))
+        masteroid.velocity = spawn_random.randint(50,70) / 100
 
         self.add_sprite(masteroid)
 
@@ -189,18 +380,26 @@ class Game:
         
         hit_count = 0
 
-        for sprite in self.sprite_group:
-
-            if isinstance(sprite, Bullet) or isinstance(sprite, SpaceShip):
-                continue
-            
-            self.hit_sprite(sprite)
-            hit_count += 1
+        for layer in NUKE_LAYERS:
+            for sprite in self.layer_groups[layer].sprites():
+                self.hit_sprite(sprite)
+                hit_count += 1
         
         print("activate_nuke hit_count = "+str(hit_count))
     
     def add_sprite(self, sprite):
         self.sprite_group.add(sprite)
+        self.layer_groups[sprite.collision_layer].add(sprite)
+
+        if sprite.canAttractSprites():
+            self.attractor_group.add(sprite)
+
+        if self.physics is not None:
+            self.physics.add(sprite)
+
+        # Sprites added during the collision checks, such as asteroid
+        # fragments, can be hit by the remaining bullets this frame.
+        self.layer_grids[sprite.collision_layer].insert(sprite)
 
     def toggle_gas_walls(self, use_gas_walls):
         if use_gas_walls == self.has_gas_walls:
@@ -228,6 +427,187 @@ class Game:
             
         self.has_gas_walls = use_gas_walls
 
+        # If gas walls are enabled the players ship is killed when it's outside the screen
+        self.player.remove_off_scren = use_gas_walls
+        if self.player.physics is not None:
+            self.player.physics.refresh(self.player)
+
+    def get_state(self, include_level_snapshot = True):
+        """The state of the game between two ticks, the sprites are listed as they are and in the order they are
+            updated, so the state is saved with encode_snapshot before the next tick. It's only complete when the
+            scheduler has no deferred work, which isn't saved."""
+        # The engine only writes the positions back for the sprites being drawn.
+        if self.physics is not None:
+            self.physics.sync_all()
+
+        level_state = None
+        if self.level is not None:
+            level_state = (self.level.spawn_time_ms, self.level.has_sprites_spawned)
+
+        message_state = None
+        if self.text_message is not None:
+            message = self.text_message
+            message_state = (message.message, message.x, message.y, message.spawn_time)
+
+        sprites = [sprite for sprite in self.sprite_group if sprite is not self.player]
+
+        # The player is saved on its own since it's kept while it's dead.
+        player_index = -1
+        if self.player.alive():
+            player_index = self.sprite_group.sprites().index(self.player)
+
+        return {
+            "tick_count": self.tick_count,
+            "clock": (self.clock.time_ms, self.clock.tick_count),
+            "score": self.score,
+            "lives": self.lives,
+            "level_number": self.level_number,
+            "level": level_state,
+            "message": message_state,
+            "random": random_streams.get_state(),
+            "bullet_pool": self.bullet_pool.get_state(),
+            "player": self.player,
+            "player_index": player_index,
+            "sprites": sprites,
+            "level_snapshot": (self.level_snapshot_pending, self.level_snapshot) if include_level_snapshot else None,
+        }
+
+    def set_state(self, state):
+        """Restores a state from decode_snapshot, with the sprites it made."""
+        from .snapshot import get_sprite_classes
+        sprite_classes = get_sprite_classes()
+
+        self.tick_count = state["tick_count"]
+        self.clock.time_ms, self.clock.tick_count = state["clock"]
+        self.clock.now_ms = int(self.clock.time_ms)
+        self.score = state["score"]
+        self.lives = state["lives"]
+        random_streams.set_state(state["random"])
+        self.seed = random_streams.master_seed
+
+        # A keyframe or checkpoint brings the level's retry snapshot along, retrying
+        # loads the level snapshot itself, which leaves the one to retry from as it is.
+        if state["level_snapshot"] is not None:
+            self.level_snapshot_pending, self.level_snapshot = state["level_snapshot"]
+        else:
+            self.level_snapshot_pending = False
+        self.bullet_pool.set_state(state["bullet_pool"])
+
+        # The level is built again, its sprites are the same since they only depend on the seed.
+        self.level_number = state["level_number"]
+        self.level = None
+        if state["level"] is not None:
+            self.level = self.build_level(self.level_number)
+            self.level.spawn_time_ms, self.level.has_sprites_spawned = state["level"]
+
+            if self.level.has_sprites_spawned:
+                self.level.sprites.empty()
+
+            if self.level_prefetcher is not None and self.has_next_level():
+                self.level_prefetcher.prefetch(self.level_number + 1)
+
+        self.text_message = None
+        if state["message"] is not None:
+            message, x, y, spawn_time = state["message"]
+            self.text_message = TextMessage(message, x, y, self.clock)
+            self.text_message.spawn_time = spawn_time
+
+        for group in [self.sprite_group, self.attractor_group] + list(self.layer_groups.values()):
+            group.empty()
+
+        if self.physics is not None:
+            self.physics = type(self.physics)(WINDOWWIDTH, WINDOWHEIGHT)
+
+        self.player = state["player"]
+        sprites = list(state["sprites"])
+
+        if state["player_index"] >= 0:
+            sprites.insert(state["player_index"], self.player)
+
+        self.sprite_group.add(sprites)
+        bullet_class = sprite_classes["Bullet"]
+
+        # The sprites are added to each group in one call.
+        layer_sprites = {layer: [] for layer in self.layer_groups}
+        attractors = []
+
+        for sprite in sprites:
+            layer_sprites[sprite.collision_layer].append(sprite)
+
+            if sprite.canAttractSprites():
+                attractors.append(sprite)
+
+            if self.physics is not None:
+                self.physics.add(sprite)
+
+            # Every bullet in the game is the player's and comes from the pool.
+            if type(sprite) is bullet_class:
+                sprite.pool = self.bullet_pool
+                sprite.parent = self.player
+
+        for layer, group in self.layer_groups.items():
+            group.add(layer_sprites[layer])
+
+        self.attractor_group.add(attractors)
+
+        # The attraction reads the grids before they are rebuilt in the next tick,
+        # the physics engine's attraction and a game without attractors don't.
+        if self.physics is None and attractors:
+            for layer, grid in self.layer_grids.items():
+                grid.rebuild(self.layer_groups[layer])
+
+        self.player.remove_off_scren = self.has_gas_walls
+        if self.player.physics is not None:
+            self.player.physics.refresh(self.player)
+
+        # Every sprite is replaced, the next frame is drawn from scratch.
+        self.redraw_screen()
+
+    def save_snapshot(self, include_level_snapshot = True):
+        """The game as a snapshot, which carries the snapshot the level is retried from
+            unless it's that snapshot being saved."""
+        from .snapshot import encode_snapshot
+        return encode_snapshot(self.get_state(include_level_snapshot))
+
+    def load_snapshot(self, data):
+        from .snapshot import decode_snapshot
+        self.set_state(decode_snapshot(data, self.clock))
+
+    def retry_level(self):
+        """Starts the level over from when it began, with the score and lives the player had then."""
+        if self.level_snapshot is None:
+            return
+
+        self.load_snapshot(self.level_snapshot)
+        self.set_message(f"Retrying {self.level.name}")
+
+    def write_checkpoint(self):
+        start_time = time.perf_counter()
+        snapshot = self.save_snapshot()
+
+        with open(self.checkpoint, "wb") as checkpoint_file:
+            checkpoint_file.write(snapshot)
+
+        self.last_checkpoint = self.tick_count
+        self.checkpoint_count += 1
+        self.checkpoint_size = len(snapshot)
+        self.checkpoint_time += time.perf_counter() - start_time
+
+    def restore_checkpoint(self):
+        """Continues the game from the checkpoint to restore, if there is one."""
+        if self.restore is None:
+            return
+
+        start_time = time.perf_counter()
+        with open(self.restore, "rb") as checkpoint_file:
+            self.load_snapshot(checkpoint_file.read())
+
+        self.last_checkpoint = self.tick_count
+        if self.recorder is not None:
+            self.recorder.write_keyframe(self)
+
+        print(f"Restored tick {self.tick_count} of seed {self.seed} from {self.restore} in {(time.perf_counter() - start_time) * 1000:.2f} ms")
+
     # TODO Move function to MainGui class possibly?
     def draw_text(self, text, x, y, big_font = False):
         if big_font:
@@ -235,41 +615,72 @@ class Game:
         else:
             font = self.font
         
-        textobj = font.render(text, 1, TEXT_COLOR)
+        textobj = self.text_cache.render(font, text, TEXT_COLOR)
         textrect = textobj.get_rect()
         textrect.topleft = (x, y)
-        self.windowSurface.blit(textobj, textrect)
+        self.blit(textobj, textrect)
+
+    def blit(self, image, rect):
+        """Draws the image, or queues it when the dirty rect renderer is used."""
+        if self.renderer is not None:
+            self.renderer.add(image, rect)
+        else:
+            self.windowSurface.blit(image, rect)
 
     def draw_info(self):
-        info_x = GAME_INFO_BASE_X
-        info_y = GAME_INFO_BASE_Y
-        info_margin = GAME_INFO_MARGINS
-        
-        # Draws level number
-        level_nr = ""
-        if self.level_number > 0:
-            level_nr = self.level_number
-        self.draw_text(f"Level: {level_nr}", info_x, info_y)
-         
-        # Draws number of lives. self.lives
-        info_y += info_margin
-        self.draw_text(f"Lives: {self.lives}", info_x, info_y)
-
-        # Draws player score
-        info_y += info_margin
-        self.draw_text(f"Score: {self.score}", info_x, info_y)
+        # Draws the level number, lives and score, the HUD is only rebuilt when they change.
+        self.blit(*self.hud.get_blit(self.level_number, self.lives, self.score))
 
         if self.text_message is not None and self.text_message.is_active():
             message = self.text_message.message
             x, y = self.text_message.x, self.text_message.y
             self.draw_text(message, x, y, True)
 
+    def draw_profile_overlay(self):
+        """Draws the frame time percentiles in the top right corner."""
+        y = GAME_INFO_BASE_Y
+
+        for line in self.profiler.get_overlay_lines():
+            textobj = self.text_cache.render(self.font, line, TEXT_COLOR)
+            textrect = textobj.get_rect()
+            textrect.topright = (WINDOWWIDTH - GAME_INFO_MARGINS, y)
+            self.blit(textobj, textrect)
+            y += textrect.height
+
+    def count_candidate_pairs(self):
+        return sum(grid.total_candidate_pairs for grid in self.layer_grids.values())
+
+    def finish_frame_profile(self):
+        """Writes the recorded frames to the frame profile, if one was asked for."""
+        if self.frame_profile is None:
+            return
+
+        self.profiler.print_summary()
+        frame_count = self.profiler.dump(self.frame_profile)
+        print(f"Wrote {frame_count} frames to {self.frame_profile}")
+
+    def redraw_screen(self):
+        """Makes the next frame redraw the whole screen instead of the dirty rects."""
+        if self.renderer is not None:
+            self.renderer.invalidate()
+
     def draw_background(self):
-        self.windowSurface.fill(BACKGROUND_COLOR)
+        # The renderer clears the previous frame by itself.
+        if self.renderer is None:
+            self.windowSurface.fill(BACKGROUND_COLOR)
 
     def draw_sprites(self):
-        for sprite in self.sprite_group:
-            sprite.draw(self.windowSurface)
+        if self.renderer is not None:
+            renderer = self.renderer
+
+            for sprite in self.sprite_group:
+                blit = sprite.get_blit()
+
+                if blit is not None:
+                    renderer.add(*blit)
+        else:
+            for sprite in self.sprite_group:
+                sprite.draw(self.windowSurface)
 
         # This ensures the gas walls are drawn last
         if self.has_gas_walls:
@@ -278,108 +689,358 @@ class Game:
             
     def draw_gas_walls(self):
         for wall in self.gas_wall_group:
-            wall.draw(self.windowSurface)
+            blit = wall.get_blit()
+
+            if blit is not None:
+                self.blit(*blit)
             
         
     def start(self):
         print("start_campaign() called")
-        
-        self.start_game_loop()
+        print(f"Seed: {self.seed}")
+
+        if self.headless:
+            self.run_headless()
+        else:
+            self.start_game_loop()
     
     def should_respawn_player(self):
         if self.lives <= 0:
             return False
         
-        player_time_dead_ms = get_millis() - self.player.kill_time_ms
+        player_time_dead_ms = self.clock.now_ms - self.player.kill_time_ms
         return player_time_dead_ms > PLAYER_RESPAWN_TIME_MS
+
+    def tick(self):
+        """Advances the simulation by one frame without drawing or playing anything."""
+        self.clock.tick()
+
+        profiler = self.profiler
+
+        # Runs the work deferred from the previous ticks first.
+        self.scheduler.start_tick()
+        profiler.mark("scheduler")
+
+        # Manages if the player should respawn.
+        if not self.player.alive():
+            if self.should_respawn_player():
+                self.respawn_player()
+
+        # Keeps firing while the trigger is held for the automatic weapon modes.
+        if self.player.alive() and self.player.should_fire():
+            self.fire_bullet()
+
+        profiler.mark("respawn")
+
+        # Moves sprites
+        self.move_sprites()
+        profiler.mark("move")
+
+        # Manages collision detection, the grids are rebuilt now that every sprite has moved.
+        for layer, grid in self.layer_grids.items():
+            grid.rebuild(self.layer_groups[layer])
+
+        profiler.mark("grids")
+
+        self.check_collisions()
+        profiler.mark("collisions")
+
+        # Adds sprites if the level has any that should be added.
+        if self.level is not None and self.level.has_sprites():
+            for lvl_spr in self.level.get_sprites():
+                self.scheduler.submit(self.add_sprite, lvl_spr)
+
+        profiler.mark("spawns")
+
+        # Manages level logic
+        if self.should_generate_next_level():
+            self.generate_next_level()
+
+        profiler.mark("level")
+
+        self.tick_count += 1
+        self.replay_tick += 1
+
+        # The level is saved for a retry once its first tick has no deferred work left.
+        if self.level_snapshot_pending and not self.scheduler.has_work():
+            self.level_snapshot = self.save_snapshot(False)
+            self.level_snapshot_pending = False
+
+        if self.recorder is not None:
+            self.recorder.record_keyframe(self)
+
+    def render(self):
+        """Draws the current frame onto the window surface.
+            Returns the rects that changed, or None if the whole screen should be updated."""
+        profiler = self.profiler
+
+        # Draws text and background color.
+        self.draw_background()
+
+        self.draw_info()
+
+        if profiler.overlay:
+            self.draw_profile_overlay()
+
+        profiler.mark("hud")
+
+        # Draws sprites
+        self.draw_sprites()
+        profiler.mark("draw")
+
+        if self.renderer is None:
+            return None
+
+        dirty_rects = self.renderer.flush()
+        profiler.mark("flush")
+
+        return dirty_rects
     
     def start_game_loop(self):
         self.game_running = True
         self.lives = PLAYER_STARTING_LIVES        
+        self.restore_checkpoint()
 
         #starts game loop.
         while self.game_running:
-            # Manages if the player should respawn.
-            if not self.player.alive():
-                if self.should_respawn_player():
-                    self.respawn_player()
-                    
+            frame_start = time.perf_counter()
+            profiler = self.profiler
+            profiler.start_frame()
+
             # Handles events
-            for event in pygame.event.get():
-                self.manage_event(event)
-            
-            # Moves sprites
-            for mov_sprite in self.sprite_group:
-                self.move_sprite(mov_sprite)
+            self.handle_events(pygame.event.get())
 
-                                     
-            # Draws text and background color.
-            self.draw_background()
-            
-            self.draw_info()
+            profiler.mark("events")
+
+            self.tick()
 
-            # Draws sprites
-            self.draw_sprites()
+            dirty_rects = self.render()
 
             # Manages sounds and sound effects.
             self.manage_sounds()
+            profiler.mark("sounds")
+            
+            # Updates the display, only where something changed if possible.
+            if dirty_rects is None:
+                pygame.display.update()
+            else:
+                pygame.display.update(dirty_rects)
 
-            # Manages collision detection
-            for sprite in self.sprite_group:
-                self.check_collision(sprite)
+            profiler.mark("display")
 
+            if self.tick_count == 1:
+                startup_profile.finish()
 
-            # Adds sprites if the level has any that should be added.
-            if self.level is not None and self.level.has_sprites():
-                for lvl_spr in self.level.get_sprites():
-                    self.add_sprite(lvl_spr)
+                if self.asset_timings:
+                    self.print_asset_timings()
+
+            # Warms the caches with the time left in the frame.
+            self.scheduler.run_idle(frame_start + IDLE_FRAME_SHARE / FPS)
 
-            # Manages level logic
-            if self.should_generate_next_level():
-                self.generate_next_level()                            
-            
-            # Updates the display        
-            pygame.display.update()
             self.mainClock.tick(FPS)
 
+            # The idle work and the frame cap are left out of the frame time.
+            profiler.end_frame(self.sprite_group, "wait")
+
+    def run_headless(self):
+        """
+            Runs the simulation as fast as possible without a window, sound or frame cap.
+            A frame is only rendered every render_every ticks, or never if it's 0.
+        """
+        self.game_running = True
+        self.lives = PLAYER_STARTING_LIVES
+        self.restore_checkpoint()
+
+        # A replay may start later on, from the keyframe before that tick.
+        if self.replay is not None:
+            self.start_replay()
+
+            if self.max_ticks is None:
+                self.max_ticks = self.replay.length - self.replay_tick
+
+        start_time = time.perf_counter()
+        start_tick = self.tick_count
+
+        while self.game_running:
+            if self.max_ticks is not None and self.tick_count - start_tick >= self.max_ticks:
+                break
+
+            self.profiler.start_frame()
+
+            if self.replay is not None:
+                self.handle_events(self.replay.get_events(self.replay_tick))
+
+            self.tick()
+
+            if self.replay is not None:
+                self.check_keyframe()
+
+            if (self.checkpoint is not None and self.tick_count - self.last_checkpoint >= CHECKPOINT_INTERVAL
+                    and not self.scheduler.has_work()):
+                self.write_checkpoint()
+
+            if self.tick_count == 1:
+                startup_profile.finish()
+
+            if self.render_every > 0 and self.tick_count % self.render_every == 0:
+                self.render()
+
+            self.profiler.end_frame(self.sprite_group)
+
+            if self.is_game_over():
+                self.game_running = False
+
+        elapsed = time.perf_counter() - start_time
+        ticks = self.tick_count - start_tick
+
+        # The last checkpoint is where the game ended, unless work was still deferred.
+        if self.checkpoint is not None and not self.scheduler.has_work():
+            self.write_checkpoint()
+
+        if elapsed > 0:
+            self.ticks_per_second = ticks / elapsed
+
+        print(f"Simulated {ticks} ticks in {elapsed:.2f} s ({self.ticks_per_second:.0f} ticks/s)")
+
+        stats = asset_cache.get_stats()
+        print(f"Asset cache: {stats['assets']} assets, {stats['hits']} hits, {stats['misses']} misses ({stats['bundled']} from the bundle), {stats['memory_bytes'] // 1024} KB")
+
+        candidate_pairs = sum(grid.total_candidate_pairs for grid in self.layer_grids.values())
+        rejected_pairs = sum(grid.total_rejected_pairs for grid in self.layer_grids.values())
+        print(f"Collision candidate pairs: {candidate_pairs}, rejected pairs: {rejected_pairs}")
+
+        stats = self.bullet_pool.get_stats()
+        print(f"Bullet pool: {stats['allocated']}/{stats['capacity']} allocated, peak {stats['peak_active']} active, {stats['acquired']} fired, {stats['dropped']} dropped")
+
+        stats = self.scheduler.get_stats()
+        print(f"Work scheduler: {stats['completed']} items, {stats['deferred']} deferred to a later tick, peak {stats['peak_queued']} queued")
+
+        if self.checkpoint_count > 0:
+            print(f"Checkpoints: {self.checkpoint_count} written to {self.checkpoint}, {self.checkpoint_size / 1024:.1f} KiB each, "
+                  f"{self.checkpoint_time * 1000 / self.checkpoint_count:.2f} ms per checkpoint")
+
+        if self.replay is not None:
+            if self.replay_diverged is None:
+                print(f"Replay matched the recording at {self.keyframes_matched} keyframes")
+            else:
+                print(f"Replay diverged from the recording at tick {self.replay_diverged}, after {self.keyframes_matched} matching keyframes")
+
+        self.finish_frame_profile()
+        self.finish_recording()
+
+        return self.ticks_per_second
+
+    def start_replay(self):
+        """Restores the keyframe before the tick the replay starts at and plays the replay up to the tick."""
+        self.keyframes_matched = 0
+        self.replay_diverged = None
+
+        # A game continued from a checkpoint is recorded with a keyframe at the first tick.
+        keyframe_tick = self.replay.get_keyframe_tick(self.replay_from or 0)
+        if self.replay_from is None and keyframe_tick is None:
+            return
+
+        start_time = time.perf_counter()
+
+        if keyframe_tick is not None:
+            self.load_snapshot(self.replay.get_keyframe(keyframe_tick))
+            self.replay_tick = keyframe_tick
+
+        if self.replay_from is None:
+            return
+
+        while self.replay_tick < self.replay_from:
+            self.handle_events(self.replay.get_events(self.replay_tick))
+            self.tick()
+
+        print(f"Started the replay at tick {self.replay_tick} from the keyframe at tick {keyframe_tick} in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+    def check_keyframe(self):
+        """Compares the game with the recorded keyframe for the tick, if there is one."""
+        if self.replay_diverged is not None or not self.replay.has_keyframe(self.replay_tick):
+            return
+
+        if self.replay.matches_keyframe(self.replay_tick, self.save_snapshot()):
+            self.keyframes_matched += 1
+        else:
+            self.replay_diverged = self.replay_tick
+
+    def finish_recording(self):
+        if self.recorder is not None:
+            self.recorder.close(self.replay_tick)
+
+    def print_asset_timings(self):
+        """Prints the time to the first frame and how each asset was loaded until then."""
+        first_frame_ms = (time.perf_counter() - asset_loader.start_time) * 1000
+        print(f"First frame rendered {first_frame_ms:.0f} ms after the asset loader started")
+        asset_loader.print_timings()
+
     def manage_sounds(self):
         """Manages sounds"""
 
-        # TODO Refactor this, seems as if there should be a better way to do this
-        if self.player.alive() and self.player.thrust_on:
-            self.sound_box.play("ship_thrust")
+        # The thrust sound loops for as long as the thrust is on.
+        self.sound_box.set_loop("ship_thrust", self.player.alive() and self.player.thrust_on)
+
+        # Plays the sounds of this frame, the same sound is only played once.
+        self.sound_box.flush()
             
-    def move_sprite(self, mov_sprite):
+    def move_sprites(self):
+        """Moves all the sprites, with the physics engine if it's enabled."""
+        attractors = self.attractor_group.sprites()
+
+        if self.physics is None:
+            # Sums up the attraction of the attractors for every sprite before they move.
+            if attractors:
+                attractor_field = self.get_attractor_field()
+
+                for grid in self.layer_grids.values():
+                    attractor_field.apply_to_sprites(attractors, grid)
+
+            if self.profiler.enabled:
+                self.profiler.time_sprites("update", self.sprite_group, self.move_sprite)
+            else:
+                for mov_sprite in self.sprite_group:
+                    self.move_sprite(mov_sprite)
+            return
 
+        # Only the sprites with their own logic are handled one by one,
+        # the engine attracts, moves, wraps and culls everything else.
+        for mov_sprite in self.physics.get_controlled_sprites():
+            self.steer_sprite(mov_sprite)
+
+        if attractors:
+            self.get_attractor_field().apply_to_engine(self.physics, attractors)
+
+        self.physics.step()
+
+    def get_attractor_field(self):
+        """The attraction pass, made once the first attractor, such as a vortex hole, is in the game."""
+        if self.attractor_field is None:
+            from .attractor_field import AttractorField
+            self.attractor_field = AttractorField(COLLISION_CELL_SIZE)
+
+        return self.attractor_field
+
+    def steer_sprite(self, mov_sprite):
         # Checks if the target should be set.
-        # TODO replace by adding a property "targets_player" insetad of checking the type
-        if isinstance(mov_sprite, SlimeBlob) and self.player.alive and not self.player.transparent:
+        if mov_sprite.targets_player and self.player.alive and not self.player.transparent:
             mov_sprite.set_target(self.player.rect.centerx, self.player.rect.centery)
 
-        # Manages sprites that can attract/repel other sprites
-        if mov_sprite.canAttractSprites():
-            for sprite in self.sprite_group:
-                
-                attractVector = mov_sprite.attractSprite(sprite)
-
-                if attractVector is not None:
-                    attract_acc = attractVector[0]
-                    attract_angle = attractVector[1]
-                    
-                    sprite.add_acc(attract_acc, attract_angle)
-                
+    def move_sprite(self, mov_sprite):
+        self.steer_sprite(mov_sprite)
                 
-        # This moves and rotates the MovableSprite.
-        # TODO Shouldn't the sprite move before attracting/repelling other obejcts?
+        # This moves and rotates the MovableSprite, the attraction
+        # from other sprites has allready been added.
         mov_sprite.update()
 
+        self.wrap_sprite(mov_sprite)
+
+    def wrap_sprite(self, mov_sprite):
+        """Moves a sprite that left the screen to the opposite side, or removes it."""
+
         # No need to do anything else if the sprite is inside the screen.
         if WINDOW_SCREEN.colliderect(mov_sprite):
             return
-
-        # If gas walls are enabled we kill the players ship if they are outside the screen
-        if self.has_gas_walls and isinstance(mov_sprite, SpaceShip):
-            mov_sprite.kill()
             
         # Removes sprites sprites that are
         # supposed to dissapear when off screen.
@@ -408,50 +1069,70 @@ class Game:
         # so that floating point values can be saved nicely.
         mov_sprite.set_pos(new_x, new_y)
 
-    def check_collision(self, sprite):
-        if isinstance(sprite, SpaceShip):
-            self.check_ship_collision(sprite)
-        elif isinstance(sprite, Bullet):
-            self.check_bullet_collision(sprite)
-                    
-    def check_ship_collision(self, ship):        
-        if ship.transparent:
+    def check_collisions(self):
+        """Tests the sprites of each layer against the layers they can hit according to the collision matrix."""
+        for layer, target_layers in COLLISION_MATRIX:
+            if self.profiler.enabled:
+                self.profiler.time_sprites("collision", self.layer_groups[layer].sprites(), self.collide_sprite, target_layers)
+                continue
+
+            for sprite in self.layer_groups[layer].sprites():
+                self.collide_sprite(sprite, target_layers)
+
+    def collide_sprite(self, sprite, target_layers):
+        # Transparent sprites, such as a respawning ship, can't hit anything.
+        if sprite.transparent or not sprite.alive():
             return
-                
-        colliding_sprites = self.get_colliding_sprites(ship)
 
-        for col_sprite in colliding_sprites:
-            # Ignores bullets fired by the ship and transparent sprites unless they are toxic
-            if col_sprite in self.bullet_group or (col_sprite.transparent and not col_sprite.toxic):
-                continue
+        target = self.get_first_colliding_sprite(sprite, target_layers)
+
+        # A sprite may only hit one object per frame even if it simultaneoulsly crashes into several objects.
+        if target is not None:
+            sprite.hit()
+            self.hit_sprite(target)
+
+    def get_first_colliding_sprite(self, sprite, target_layers):
+        # Only the sprites in the nearby grid cells of the target layers are tested.
+        for target_layer in target_layers:
+            target = self.layer_grids[target_layer].get_first_colliding(sprite, collide_layer_sprites)
+
+            if target is not None:
+                return target
 
-            # A ship may only be hit by one object per frame even if it simultaneoulsly crashes into several objects.
-            ship.hit()
+        return None
                     
-            self.hit_sprite(col_sprite)
-            break
+    def handle_events(self, events):
+        """Handles the events before a tick, the keys are recorded if the game is recorded."""
+        recorder = self.recorder
 
+        for event in events:
+            if recorder is not None:
+                recorder.record_event(event)
 
-    def check_bullet_collision(self, bullet):
-        colliding_sprites = self.get_colliding_sprites(bullet)
+            self.manage_event(event)
 
-        for sprite in colliding_sprites:
-            # A bullet can't hit the object that shot it.
-            if sprite.transparent or bullet.parent is sprite or isinstance(sprite, Bullet) or isinstance(sprite, SpaceShip):
-                continue
-            
-            bullet.kill()
+        if recorder is not None:
+            recorder.record_input(self.replay_tick)
 
-            self.hit_sprite(sprite)
-            break
-    
-    def get_colliding_sprites(self, sprite):
-        # This is too long.
-        return pygame.sprite.spritecollide(sprite, self.sprite_group, False, collision_detect)
-                    
     def manage_event(self, event):
         if event.type == QUIT:
+            if self.level_prefetcher is not None:
+                self.level_prefetcher.shutdown()
+
+            self.finish_frame_profile()
+            self.finish_recording()
             terminate()
+
+        # The overlay can be shown and the level retried while the ship is dead too.
+        if event.type == KEYDOWN and event.key == K_p:
+            self.profiler.toggle_overlay()
+
+        if event.type == KEYDOWN and event.key == K_r:
+            self.retry_level()
+
+        # The dirty rects don't cover what another window drew over the game.
+        if event.type in (WINDOWEXPOSED, VIDEOEXPOSE):
+            self.redraw_screen()
                 
         if not self.player.alive():
             return
@@ -467,7 +1148,10 @@ class Game:
             if event.key == K_LEFT:
                 self.player.rotate_counter_clockwise(True)
             if event.key == K_SPACE:
+                self.player.set_trigger(True)
                 self.fire_bullet()
+            if event.key == K_w:
+                self.cycle_weapon_mode()
             if event.key == K_n:
                 self.activate_nuke()
             if event.key == K_b:
@@ -480,6 +1164,8 @@ class Game:
                 self.player.set_thrust_on(False)
             if event.key == K_DOWN:
                 self.player.set_break(False)
+            if event.key == K_SPACE:
+                self.player.set_trigger(False)
             if event.key == K_RIGHT:
                 self.player.rotate_clockwise(False)
             if event.key == K_LEFT:
@@ -4,31 +4,33 @@
 """
 
 # Imports
-import sys
-import time
-import random
-import math
 import pygame
 import pygame.sprite
-import pygame.mixer
-import os
-import glob
-from pygame.locals import *
 
 from .level import Level
 
-from ..functions import *
-from ..constants import *
+from ..functions import generate_angle
+from ..constants import WINDOWWIDTH, WINDOWHEIGHT, BASE_LEVEL_SPRITE_COUNT
+from ..rng import random_streams
 
 from ..sprites.slime_blob import SlimeBlob, SLIME_RADIUS
 from ..sprites.asteroid import Asteroid, ASTEROID_RADIUS
 from ..sprites.cluster_asteroid import ClusterAsteroid, CLUSTER_ASTEROID_RADIUS
 
+# The asteroid images, each level uses the next one.
+ASTEROID_SPRITE_IMAGES = ["sprites/asteroid_" + suffix + ".png" for suffix in ("A", "B", "C", "D", "E", "F")]
+
 class CampaignLevel(Level):
     """Class representing a campaign level."""
     
-    def __init__(self, number, screen_width, screen_height):
+    def __init__(self, number, screen_width, screen_height, clock = None, rng = None):
         self.level_number = number
+
+        # The level draws from its own stream, so it's the same level whichever thread builds it.
+        if rng is None:
+            rng = random_streams.create_level_random(number)
+
+        self.rng = rng
         self.screen_width = screen_width
         self.screen_height = screen_height
         self.sprites = pygame.sprite.Group()
@@ -38,17 +40,13 @@ class CampaignLevel(Level):
         
         self.has_gas_walls = False
 
-        Level.__init__(self, number, screen_width, screen_height)
+        Level.__init__(self, number, screen_width, screen_height, clock)
         
         self.sprite_count = (number-1) + BASE_LEVEL_SPRITE_COUNT
         self.generate_sprites()
 
     def get_asteroid_sprite_image(self):
-        # TODO Refactor this
-        suffixes = ["A", "B", "C", "D", "E", "F"]
-        suff_index = (self.level_number-1) % len(suffixes)
-        suff_char = suffixes[suff_index]
-        return "sprites/asteroid_"+suff_char+".png"
+        return ASTEROID_SPRITE_IMAGES[(self.level_number-1) % len(ASTEROID_SPRITE_IMAGES)]
 
     def generate_sprites(self):
         """Generates the objects or sprites used in the level."""
@@ -56,13 +54,13 @@ class CampaignLevel(Level):
             self.genereate_gas_walls()
         
         for i in range(self.sprite_count):
-            rand_val = random.randint(0, 10)
+            rand_val = self.rng.randint(0, 10)
             
             if rand_val == 1:
                 slimeblobs = 1
 
-                if random.randint(1, 5) == 1:
-                    slimeblobs = random.randint(2, 8)
+                if self.rng.randint(1, 5) == 1:
+                    slimeblobs = self.rng.randint(2, 8)
                 
                 for i in range(slimeblobs):
                     self.sprites.add(self.generate_slime())
@@ -84,26 +82,24 @@ class CampaignLevel(Level):
         diameter = ASTEROID_RADIUS * 2
         ast_x, ast_y = self.generate_sprite_pos(diameter, diameter)
         
-        asteroid = Asteroid(ast_x, ast_y, ASTEROID_RADIUS, self.get_asteroid_sprite_image())
-        asteroid.set_angle(generate_angle())
+        asteroid = Asteroid(ast_x, ast_y, ASTEROID_RADIUS, self.get_asteroid_sprite_image(), generate_angle(rng = self.rng))
         
         
         # Adds extra velocity after first level
         max_velocity = 150 + ((self.level_number-1) * 5)   
-        asteroid.velocity = random.randint(50, max_velocity) / 100
+        asteroid.velocity = self.rng.randint(50, max_velocity) / 100
         return asteroid
 
     def generate_small_asteroid(self):
         small_radius = ASTEROID_RADIUS//2
         diameter = small_radius * 2
         ast_x, ast_y = self.generate_sprite_pos(diameter, diameter)
-        asteroid = Asteroid(ast_x, ast_y, small_radius, self.get_asteroid_sprite_image())
-        asteroid.set_angle(generate_angle())
+        asteroid = Asteroid(ast_x, ast_y, small_radius, self.get_asteroid_sprite_image(), generate_angle(rng = self.rng))
         
 
         # Adds extra velocity after first level
         max_velocity = 150 + ((self.level_number-1) * 5)   
-        asteroid.velocity = random.randint(50, max_velocity) / 100
+        asteroid.velocity = self.rng.randint(50, max_velocity) / 100
         asteroid.velocity *= 1.25
         asteroid.shatter_level = asteroid.shatter_level + 1
         return asteroid
@@ -113,11 +109,10 @@ class CampaignLevel(Level):
         diameter = large_radius * 2
         ast_x, ast_y = self.generate_sprite_pos(diameter, diameter)
                 
-        asteroid = Asteroid(ast_x, ast_y, large_radius, self.get_asteroid_sprite_image())
+        asteroid = Asteroid(ast_x, ast_y, large_radius, self.get_asteroid_sprite_image(), generate_angle(rng = self.rng))
 
-        asteroid.set_angle(generate_angle())
         max_velocity = 150 + ((self.level_number-1) * 5)   
-        asteroid.velocity = (random.randint(50, max_velocity) / 100) * 0.75
+        asteroid.velocity = (self.rng.randint(50, max_velocity) / 100) * 0.75
         asteroid.max_shatter_level = asteroid.max_shatter_level +  1
         
         return asteroid
@@ -125,13 +120,12 @@ class CampaignLevel(Level):
     def generate_cluster_asteroid(self):
         diameter = CLUSTER_ASTEROID_RADIUS * 2
         ast_x, ast_y = self.generate_sprite_pos(diameter, diameter)
-        asteroid = ClusterAsteroid(ast_x, ast_y)
-        asteroid.set_angle(generate_angle())
+        asteroid = ClusterAsteroid(ast_x, ast_y, angle = generate_angle(rng = self.rng))
         
 
         # Adds extra velocity after first level
         max_velocity = 150 + ((self.level_number-1) * 5)   
-        asteroid.velocity = random.randint(50, max_velocity) / 100
+        asteroid.velocity = self.rng.randint(50, max_velocity) / 100
         return asteroid
 
         
@@ -144,29 +138,29 @@ class CampaignLevel(Level):
     def generate_sprite_pos(self, width = 0, height = 0):
         x, y = -width//2, -height//2
 
-        rand_val = random.randint(1, 4)
+        rand_val = self.rng.randint(1, 4)
 
         if rand_val == 1:
             # Places the sprite on the left side.
             x = -width//2
-            y = random.randint(0, WINDOWHEIGHT) - (-height//2)
+            y = self.rng.randint(0, WINDOWHEIGHT) - (-height//2)
         elif rand_val == 2:
             # Places the sprite on the top side.
-            x = random.randint(0, WINDOWWIDTH) - (width//2)
+            x = self.rng.randint(0, WINDOWWIDTH) - (width//2)
             y = -height//2
         elif rand_val == 3:
             # Places the sprite on the right side.
             x = WINDOWWIDTH + (width//2)
-            y = random.randint(0, WINDOWHEIGHT) - (-height//2)
+            y = self.rng.randint(0, WINDOWHEIGHT) - (-height//2)
         else:
             # Places the sprite on the bottom side.
-            x = random.randint(0, WINDOWWIDTH) - (width//2)
+            x = self.rng.randint(0, WINDOWWIDTH) - (width//2)
             y = WINDOWHEIGHT + (height//2)
         
         return x, y
     
     def has_spawn_delay_elapsed(self):
-        return self.spawn_time_ms < (get_millis() - self.spawn_delay_ms)
+        return self.spawn_time_ms < (self.clock.now_ms - self.spawn_delay_ms)
         
     
     def get_sprites(self):
@@ -3,18 +3,10 @@
 """
 
 # Imports
-import sys
-import time
-import math
 import pygame
 import pygame.sprite
-import pygame.mixer
-import os
-import glob
-from pygame.locals import *
 
-from ..functions import *
-from ..constants import *
+from ..sim_clock import WALL_CLOCK
 
 SPAWN_DELAY_MS = 3000
 
@@ -22,7 +14,7 @@ SPAWN_DELAY_MS = 3000
 class Level:
     """An "abstract" Class representing a level."""
     
-    def __init__(self, number, screen_width, screen_height):
+    def __init__(self, number, screen_width, screen_height, clock = None):
         self.level_number = number
         self.name = "Level: " + str(number);
         self.screen_width = screen_width
@@ -32,7 +24,11 @@ class Level:
         # TODO Possible change this to be a function instead of a property
         self.has_gas_walls = False
 
-        self.spawn_time_ms = get_millis()
+        if clock is None:
+            clock = WALL_CLOCK
+
+        self.clock = clock
+        self.spawn_time_ms = clock.now_ms
         self.spawn_delay_ms = SPAWN_DELAY_MS
 
     def is_cleared(self, sprite_group):
@@ -61,8 +57,13 @@ class Level:
         # The level is cleared
         return True
 
+    def start(self):
+        """Starts the spawn delay once the level is played, since
+            the level may have been built ahead of time."""
+        self.spawn_time_ms = self.clock.now_ms
+
     def has_spawn_delay_elapsed(self):
-        return self.spawn_time_ms < (get_millis() - self.spawn_delay_ms)
+        return self.spawn_time_ms < (self.clock.now_ms - self.spawn_delay_ms)
     
     def get_sprites(self):
         return []
@@ -0,0 +1,60 @@
+"""
+Builds the next level on a worker thread while the current level is played,
+so the level transition doesn't have to create and rotate every sprite.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class LevelPrefetcher:
+    """Builds one level ahead of time with the build function given.
+
+        The level built on the worker also scales and rotates its sprite
+        images through the shared caches, so they are ready when it starts."""
+
+    def __init__(self, build_level):
+        self.build_level = build_level
+        self.executor = None
+        self.number = None
+        self.future = None
+
+        # How the levels were handed over.
+        self.prefetched = 0
+        self.built = 0
+        self.wait_time = 0
+
+    def prefetch(self, number):
+        """Starts building the level in the background, replacing any other level being built."""
+        if self.future is not None:
+            self.future.cancel()
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(1, thread_name_prefix = "level_prefetcher")
+
+        self.number = number
+        self.future = self.executor.submit(self.build_level, number)
+
+    def get_level(self, number):
+        """Returns the level, waiting for it if it's still being built. A level that
+            wasn't prefetched, or hasn't been started yet, is built right away instead."""
+        future = self.future
+        self.future = None
+
+        if future is None or self.number != number or future.cancel():
+            if future is not None:
+                future.cancel()
+
+            self.built += 1
+            return self.build_level(number)
+
+        wait_start = time.perf_counter()
+        level = future.result()
+        self.wait_time += time.perf_counter() - wait_start
+        self.prefetched += 1
+
+        return level
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait = False, cancel_futures = True)
+            self.executor = None
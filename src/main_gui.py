@@ -6,27 +6,79 @@ import pygame.sprite
 import pygame.mixer
 import os
 import glob
-from .game import *
-from .constants import *
+from .game import Game
+from .constants import WINDOWWIDTH, WINDOWHEIGHT, CAPTION
+from .functions import IMAGE_BASE_PATH
+from .sound_box import SOUND_BASE_PATH
+from .asset_cache import asset_cache
+from .asset_loader import asset_loader
+from .startup_profile import startup_profile
+
+# Samples in the mixer buffer, smaller buffers play the sound effects sooner
+# but may crackle on slow machines. 512 samples at 44.1 kHz is about 12 ms.
+MIXER_FREQUENCY = 44100
+MIXER_BUFFER_SIZE = 512
 
 class MainGui:
 
-    def __init__(self):
+    def __init__(self, headless = False, max_ticks = None, render_every = 0, dirty_rects = True, physics_engine = False,
+                 mixer_buffer = MIXER_BUFFER_SIZE, asset_timings = False, frame_profile = None, seed = None, record = None,
+                 replay = None, replay_from = None, checkpoint = None, restore = None):
         # Inits settings        
-        self.init_gui()        
+        self.headless = headless
+        self.seed = seed
+        self.record = record
+        self.replay = replay
+        self.replay_from = replay_from
+        self.checkpoint = checkpoint
+        self.restore = restore
+        self.asset_timings = asset_timings
+        self.frame_profile = frame_profile
+        self.mixer_buffer = mixer_buffer
+        self.max_ticks = max_ticks
+        self.render_every = render_every
+        self.dirty_rects = dirty_rects
+        self.physics_engine = physics_engine
+
+        if headless:
+            self.init_headless()
+        else:
+            self.init_gui()        
+
+    def init_headless(self):
+        """Inits pygame without opening a window or an audio device."""
+        pygame.font.init()
+
+        self.load_images()
+
+        # The game draws into an offscreen surface when a frame is requested.
+        self.windowSurface = None
 
     def init_gui(self):
         # The extra pygame.mixer code is added in order to
         # make the sound effects play instantly.
-        pygame.mixer.pre_init(44100, -16, 2, 2048)
-        pygame.mixer.init()
+        with startup_profile.phase("mixer init"):
+            pygame.mixer.pre_init(MIXER_FREQUENCY, -16, 2, self.mixer_buffer)
+            pygame.mixer.init()
+
+        # Decodes the images and sounds in the background while the window opens,
+        # the first frame only waits for the images it draws.
+        self.load_images()
+        asset_loader.submit_directory(SOUND_BASE_PATH, ".wav", "sound")
 
         # Inits pygame.
-        pygame.init()
-        
-        self.windowSurface = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
-        pygame.display.set_caption(CAPTION)
-        pygame.mouse.set_visible(False)
+        with startup_profile.phase("display init"):
+            pygame.init()
+            
+            self.windowSurface = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+            pygame.display.set_caption(CAPTION)
+            pygame.mouse.set_visible(False)
+
+    def load_images(self):
+        """Maps the prebuilt asset bundle, or decodes the images in the background if it hasn't been built."""
+        with startup_profile.phase("image load"):
+            if not asset_cache.load_bundle():
+                asset_loader.submit_directory(IMAGE_BASE_PATH + "sprites/", ".png", "image")
 
     def start(self):
         """
@@ -34,7 +86,16 @@ class MainGui:
             just go ahead and get things started
         """
 
-        game_mode = Game(self.windowSurface) 
+        replay = None
+        if self.replay is not None:
+            from .replay import Replay
+            replay = Replay(self.replay)
+
+        game_mode = Game(self.windowSurface, self.headless, self.max_ticks, self.render_every, self.dirty_rects,
+                         physics_engine = self.physics_engine, asset_timings = self.asset_timings,
+                         frame_profile = self.frame_profile, seed = self.seed, record = self.record,
+                         replay = replay, replay_from = self.replay_from, checkpoint = self.checkpoint,
+                         restore = self.restore)
 
         self.start_game(game_mode)
 
@@ -0,0 +1,275 @@
+"""
+Optional physics engine that moves every sprite in one vectorized NumPy step.
+
+The engine keeps position, velocity, acceleration and flags of the sprites in
+contiguous arrays (structure of arrays). Passive sprites such as asteroids are
+integrated entirely in the arrays, while sprites with their own logic (ships,
+bullets, slime blobs) still run their update and only hand their position to
+the engine for the screen wrapping.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .constants import *
+from .functions import sin_cos
+
+PHYSICS_ENGINE_CAPACITY = 256
+
+# name: dtype of every array in the engine.
+PHYSICS_FIELDS = {
+    "x": "float64",
+    "y": "float64",
+    "vx": "float64",
+    "vy": "float64",
+    "acc": "float64",
+    "cos_angle": "float64",
+    "sin_angle": "float64",
+    "ax": "float64",
+    "ay": "float64",
+    "max_velocity": "float64",
+    "width": "int64",
+    "height": "int64",
+    "remove_off_screen": "bool",
+    "attractable": "bool",
+    "controlled": "bool",
+}
+
+def has_numpy():
+    return numpy is not None
+
+class PhysicsEngine:
+    """Structure of arrays physics engine for MovableSprites.
+
+        Each attached sprite owns a slot in the arrays, removing a sprite moves
+        the last slot into the freed one so that kill() stays O(1)."""
+
+    def __init__(self, width = WINDOWWIDTH, height = WINDOWHEIGHT, capacity = PHYSICS_ENGINE_CAPACITY):
+        if numpy is None:
+            raise RuntimeError("The physics engine requires NumPy to be installed")
+
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.count = 0
+        self.sprites = []
+        self.controlled_sprites = {}
+        self.arrays = {}
+
+        for name, dtype in PHYSICS_FIELDS.items():
+            self.arrays[name] = numpy.zeros(capacity, dtype)
+
+    def grow(self):
+        """Doubles the capacity of every array."""
+        self.capacity *= 2
+
+        for name, array in self.arrays.items():
+            grown = numpy.zeros(self.capacity, array.dtype)
+            grown[:self.count] = array[:self.count]
+            self.arrays[name] = grown
+
+    def add(self, sprite):
+        if sprite.physics is self:
+            return
+
+        if self.count == self.capacity:
+            self.grow()
+
+        slot = self.count
+        self.count += 1
+        self.sprites.append(sprite)
+
+        sprite.physics = self
+        sprite.physics_slot = slot
+
+        if sprite.physics_controlled:
+            self.controlled_sprites[sprite] = None
+
+        self.refresh(sprite)
+
+    def remove(self, sprite):
+        """Removes the sprite by moving the last slot into its place."""
+        if sprite.physics is not self:
+            return
+
+        slot = sprite.physics_slot
+        last = self.count - 1
+
+        if slot != last:
+            for array in self.arrays.values():
+                array[slot] = array[last]
+
+            moved_sprite = self.sprites[last]
+            self.sprites[slot] = moved_sprite
+            moved_sprite.physics_slot = slot
+
+        self.sprites.pop()
+        self.count -= 1
+        self.controlled_sprites.pop(sprite, None)
+
+        sprite.physics = None
+        sprite.physics_slot = -1
+
+    def refresh(self, sprite):
+        """Copies the state of the sprite into its slot, e.g. after it was hit or resized."""
+        slot = sprite.physics_slot
+        arrays = self.arrays
+
+        sin_a, cos_a = sin_cos(sprite.angle)
+
+        arrays["x"][slot] = sprite.x
+        arrays["y"][slot] = sprite.y
+        arrays["vx"][slot] = sprite.vx
+        arrays["vy"][slot] = sprite.vy
+        arrays["acc"][slot] = sprite.acc
+        arrays["cos_angle"][slot] = cos_a
+        arrays["sin_angle"][slot] = sin_a
+        arrays["max_velocity"][slot] = sprite.max_velocity
+        arrays["width"][slot] = sprite.rect.width
+        arrays["height"][slot] = sprite.rect.height
+        arrays["remove_off_screen"][slot] = sprite.remove_off_scren
+        # Sprites with their own logic check their transparency when the attraction is applied.
+        arrays["attractable"][slot] = sprite.attractable and (sprite.physics_controlled or not sprite.transparent)
+        arrays["controlled"][slot] = sprite.physics_controlled
+
+    def sync_sprite(self, sprite):
+        """Copies the position and velocity from the arrays back to the sprite."""
+        if sprite.physics_controlled:
+            return
+
+        slot = sprite.physics_slot
+        arrays = self.arrays
+
+        sprite.vx = float(arrays["vx"][slot])
+        sprite.vy = float(arrays["vy"][slot])
+        sprite.set_pos(float(arrays["x"][slot]), float(arrays["y"][slot]))
+
+    def sync_all(self):
+        for sprite in self.sprites:
+            self.sync_sprite(sprite)
+
+    def add_acc(self, sprite, a_acc, a_angle):
+        """Adds an external acceleration, such as an attraction, for the next step."""
+        slot = sprite.physics_slot
+        sin_a, cos_a = sin_cos(a_angle)
+
+        self.arrays["ax"][slot] += a_acc * cos_a
+        self.arrays["ay"][slot] += a_acc * sin_a
+
+    def add_acc_xy(self, sprite, a_ax, a_ay):
+        slot = sprite.physics_slot
+
+        self.arrays["ax"][slot] += a_ax
+        self.arrays["ay"][slot] += a_ay
+
+    def get_controlled_sprites(self):
+        return list(self.controlled_sprites)
+
+    def step(self):
+        """Moves every sprite one tick, wraps them around the screen and culls
+            the ones that should be removed off screen."""
+        self.integrate()
+
+        # Sprites with their own logic move themselves and hand over their new position.
+        arrays = self.arrays
+        for sprite in self.get_controlled_sprites():
+            sprite.update()
+
+            if sprite.physics is self:
+                slot = sprite.physics_slot
+                arrays["x"][slot] = sprite.x
+                arrays["y"][slot] = sprite.y
+                arrays["width"][slot] = sprite.rect.width
+                arrays["height"][slot] = sprite.rect.height
+
+        self.wrap_and_cull()
+
+    def integrate(self):
+        n = self.count
+        arrays = self.arrays
+
+        x = arrays["x"][:n]
+        y = arrays["y"][:n]
+        vx = arrays["vx"][:n]
+        vy = arrays["vy"][:n]
+        acc = arrays["acc"][:n]
+        ax = arrays["ax"][:n]
+        ay = arrays["ay"][:n]
+        max_velocity = arrays["max_velocity"][:n]
+
+        # Slowing down only reduces the velocity and never changes the movement angle.
+        deacc = acc < 0
+        speed = numpy.hypot(vx, vy)
+        slowed = numpy.maximum(speed - numpy.abs(acc), 0)
+        deacc_factor = numpy.divide(slowed, speed, out = numpy.zeros(n), where = speed > 0)
+
+        # Otherwise the acceleration along the facing angle and the external acceleration are added.
+        new_vx = vx + acc * arrays["cos_angle"][:n] + ax
+        new_vy = vy + acc * arrays["sin_angle"][:n] + ay
+        new_speed = numpy.hypot(new_vx, new_vy)
+
+        capped = (max_velocity > 0) & (new_speed > max_velocity)
+        cap_factor = numpy.divide(max_velocity, new_speed, out = numpy.ones(n), where = capped)
+        new_vx *= cap_factor
+        new_vy *= cap_factor
+
+        vx[:] = numpy.where(deacc, vx * deacc_factor, new_vx)
+        vy[:] = numpy.where(deacc, vy * deacc_factor, new_vy)
+
+        x += vx
+        y += vy
+
+        ax[:] = 0
+        ay[:] = 0
+
+    def wrap_and_cull(self):
+        n = self.count
+        arrays = self.arrays
+
+        x = arrays["x"][:n]
+        y = arrays["y"][:n]
+        width = arrays["width"][:n]
+        height = arrays["height"][:n]
+
+        # The same rects as set_pos gives the sprites.
+        center_x = numpy.round(x)
+        center_y = numpy.round(y)
+        left = center_x - (width // 2)
+        top = center_y - (height // 2)
+        right = left + width
+        bottom = top + height
+
+        on_screen = (left < self.width) & (right > 0) & (top < self.height) & (bottom > 0)
+        off_screen = ~on_screen
+
+        # Removes the sprites that are supposed to dissapear when off screen.
+        remove_off_screen = arrays["remove_off_screen"][:n]
+        culled = numpy.flatnonzero(off_screen & remove_off_screen)
+        culled_sprites = [self.sprites[i] for i in culled.tolist()]
+
+        # Moves the remaining sprites from one side of the screen to the opposite.
+        wrapping = off_screen & ~remove_off_screen
+        past_left = wrapping & (right < 0)
+        past_right = wrapping & (left > self.width)
+        past_top = wrapping & (bottom < 0)
+        past_bottom = wrapping & (top > self.height)
+
+        x[:] = numpy.where(past_left, self.width + (height // 2), x)
+        x[:] = numpy.where(past_right, -(width // 2), x)
+        y[:] = numpy.where(past_top, self.height + (height // 2), y)
+        y[:] = numpy.where(past_bottom, -(height // 2), y)
+
+        wrapped = past_left | past_right | past_top | past_bottom
+
+        # Only the sprites that get drawn, or just got wrapped, need their rects updated.
+        write_back = (on_screen & ~arrays["controlled"][:n]) | wrapped
+        indices = numpy.flatnonzero(write_back)
+        sprites = self.sprites
+
+        for i, new_x, new_y in zip(indices.tolist(), x[indices].tolist(), y[indices].tolist()):
+            sprites[i].set_pos(new_x, new_y)
+
+        for sprite in culled_sprites:
+            sprite.kill()
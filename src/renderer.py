@@ -0,0 +1,75 @@
+"""
+Renderer that only clears and redraws the parts of the screen that changed since the last frame.
+"""
+
+import pygame
+from .constants import *
+
+# If more than this share of the screen is dirty it's cheaper to update all of it.
+FULL_UPDATE_AREA_FACTOR = 0.6
+
+class DirtyRectRenderer:
+    """Collects the blits of a frame and submits them in one batch.
+
+        The rects drawn in the previous frame are cleared with the background,
+        the new blits are drawn and only the union of old and new rects is
+        returned so that the display update can be limited to them."""
+
+    def __init__(self, surface, background_color = BACKGROUND_COLOR):
+        self.surface = surface
+        self.screen_rect = surface.get_rect()
+        self.background = pygame.Surface(self.screen_rect.size)
+        self.background.fill(background_color)
+
+        # Matches the display format so the clearing blits are fast.
+        if pygame.display.get_surface() is not None:
+            self.background = self.background.convert()
+
+        self.blit_list = []
+        self.previous_rects = []
+        self.full_redraw = True
+
+    def invalidate(self):
+        """Makes the next frame redraw the whole screen."""
+        self.full_redraw = True
+
+    def add(self, image, rect):
+        """Queues an image to be drawn this frame."""
+        self.blit_list.append((image, rect))
+
+    def flush(self):
+        """Draws the queued blits and returns the list of rects that must be updated on the display."""
+        surface = self.surface
+        background = self.background
+        screen_rect = self.screen_rect
+
+        # The rects drawn this frame, clipped to the screen.
+        current_rects = []
+        for image, rect in self.blit_list:
+            clipped = rect.clip(screen_rect)
+
+            if clipped.width > 0 and clipped.height > 0:
+                current_rects.append(clipped)
+
+        if self.full_redraw:
+            surface.blit(background, (0, 0))
+            surface.blits(self.blit_list, False)
+            dirty_rects = [screen_rect.copy()]
+            self.full_redraw = False
+        else:
+            # Clears what was drawn last frame and draws the new frame in one batched call.
+            clear_blits = [(background, rect, rect) for rect in self.previous_rects]
+            surface.blits(clear_blits + self.blit_list, False)
+            dirty_rects = self.previous_rects + current_rects
+
+            dirty_area = 0
+            for rect in dirty_rects:
+                dirty_area += rect.width * rect.height
+
+            if dirty_area > screen_rect.width * screen_rect.height * FULL_UPDATE_AREA_FACTOR:
+                dirty_rects = [screen_rect.copy()]
+
+        self.previous_rects = current_rects
+        self.blit_list = []
+
+        return dirty_rects
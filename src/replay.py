@@ -0,0 +1,165 @@
+"""
+Replays recorded with --record and played back with --replay.
+
+A replay holds the seed of the game and the keys pressed and released in
+each tick, which is all it takes to run the game again exactly. Snapshots
+of the whole game are written as keyframes every few seconds, so a replay can be
+started from any tick without simulating the ticks before the keyframe,
+and a replay is checked against them as it's played back.
+"""
+
+import struct
+import pygame
+from pygame.locals import *
+from .constants import FPS
+
+REPLAY_MAGIC = b"NRPL"
+REPLAY_VERSION = 4
+
+# magic, version, seed, physics engine, the seed is signed like in the snapshots
+REPLAY_HEADER = struct.Struct("<4sHq?")
+
+# record type, tick, payload size
+REPLAY_RECORD = struct.Struct("<BII")
+
+RECORD_INPUT = 1
+RECORD_KEYFRAME = 2
+RECORD_END = 3
+
+# The keys the game reacts to. Each key event is one byte, the index
+# of the key with the highest bit set when the key is pressed.
+REPLAY_KEYS = (K_UP, K_DOWN, K_RIGHT, K_LEFT, K_SPACE, K_w, K_n, K_b, K_q, K_r)
+REPLAY_KEY_INDEX = {key: index for index, key in enumerate(REPLAY_KEYS)}
+KEY_DOWN_BIT = 0x80
+
+# Ticks between the keyframes, a keyframe waits for a tick without deferred work.
+KEYFRAME_INTERVAL = 10 * FPS
+
+class ReplayRecorder:
+    """Writes the replay as the game is played, so it's complete up to the last tick if the game crashes."""
+
+    def __init__(self, path, seed, physics_engine, keyframe_interval = KEYFRAME_INTERVAL):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.replay_file = open(path, "wb")
+        self.replay_file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed, physics_engine))
+
+        self.key_events = bytearray()
+        self.last_keyframe = 0
+
+        self.input_count = 0
+        self.keyframe_count = 0
+
+    def record_event(self, event):
+        """Keeps the key events the game reacts to until the tick is recorded."""
+        if event.type not in (KEYDOWN, KEYUP) or event.key not in REPLAY_KEY_INDEX:
+            return
+
+        key_event = REPLAY_KEY_INDEX[event.key]
+        if event.type == KEYDOWN:
+            key_event |= KEY_DOWN_BIT
+
+        self.key_events.append(key_event)
+
+    def record_input(self, tick):
+        """Writes the key events handled before the tick, ticks without any aren't written."""
+        if not self.key_events:
+            return
+
+        self.write_record(RECORD_INPUT, tick, self.key_events)
+        self.input_count += len(self.key_events)
+        self.key_events = bytearray()
+
+    def record_keyframe(self, game):
+        """Writes the game state once the keyframe interval has passed and there is no deferred work."""
+        if game.replay_tick - self.last_keyframe < self.keyframe_interval or game.scheduler.has_work():
+            return
+
+        self.write_keyframe(game)
+
+    def write_keyframe(self, game):
+        self.write_record(RECORD_KEYFRAME, game.replay_tick, game.save_snapshot())
+        self.last_keyframe = game.replay_tick
+        self.keyframe_count += 1
+
+    def write_record(self, record_type, tick, payload):
+        self.replay_file.write(REPLAY_RECORD.pack(record_type, tick, len(payload)))
+        self.replay_file.write(payload)
+
+    def close(self, tick):
+        """Ends the replay at the tick the game ended."""
+        if self.replay_file.closed:
+            return
+
+        self.write_record(RECORD_END, tick, b"")
+        size = self.replay_file.tell()
+        self.replay_file.close()
+        print(f"Recorded {self.input_count} key events and {self.keyframe_count} keyframes to {self.path}, {size // 1024} KiB")
+
+
+class Replay:
+    """A replay read into memory, with the key events and keyframes by tick."""
+
+    def __init__(self, path):
+        with open(path, "rb") as replay_file:
+            data = replay_file.read()
+
+        magic, version, self.seed, self.physics_engine = REPLAY_HEADER.unpack_from(data)
+
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay")
+
+        self.path = path
+        self.inputs = {}
+        self.keyframes = {}
+        self.length = 0
+
+        offset = REPLAY_HEADER.size
+
+        # A replay cut off by a crash ends at its last complete record.
+        while offset + REPLAY_RECORD.size <= len(data):
+            record_type, tick, size = REPLAY_RECORD.unpack_from(data, offset)
+            offset += REPLAY_RECORD.size
+
+            if offset + size > len(data):
+                break
+
+            payload = data[offset:offset + size]
+            offset += size
+
+            if record_type == RECORD_INPUT:
+                self.inputs[tick] = payload
+                self.length = max(self.length, tick + 1)
+            elif record_type == RECORD_KEYFRAME:
+                self.keyframes[tick] = payload
+                self.length = max(self.length, tick)
+            elif record_type == RECORD_END:
+                self.length = tick
+
+    def get_events(self, tick):
+        """The key events to handle before the tick."""
+        events = []
+
+        for key_event in self.inputs.get(tick, b""):
+            event_type = KEYDOWN if key_event & KEY_DOWN_BIT else KEYUP
+            events.append(pygame.event.Event(event_type, key = REPLAY_KEYS[key_event & ~KEY_DOWN_BIT]))
+
+        return events
+
+    def get_keyframe_tick(self, tick):
+        """The tick of the latest keyframe at or before the tick, or None if there is none."""
+        ticks = [keyframe_tick for keyframe_tick in self.keyframes if keyframe_tick <= tick]
+
+        if not ticks:
+            return None
+
+        return max(ticks)
+
+    def get_keyframe(self, tick):
+        return self.keyframes[tick]
+
+    def has_keyframe(self, tick):
+        return tick in self.keyframes
+
+    def matches_keyframe(self, tick, snapshot):
+        return self.keyframes[tick] == snapshot
@@ -0,0 +1,76 @@
+"""
+Random number streams, one per subsystem, all derived from the game's seed.
+
+Each subsystem draws from its own stream, so playing a sound or spawning a
+debug sprite doesn't change what the levels or the asteroid splits draw,
+and a recorded game is replayed exactly from its seed and input.
+"""
+
+import os
+import random
+
+# The streams shared by the game, the level streams are created per level.
+STREAM_SPLIT = "split"
+STREAM_SPAWN = "spawn"
+STREAM_SPRITE = "sprite"
+STREAM_SOUND = "sound"
+
+STREAMS = (STREAM_SPLIT, STREAM_SPAWN, STREAM_SPRITE, STREAM_SOUND)
+
+# The streams the simulation draws from, the sounds aren't played headless
+# so the sound stream isn't part of the game state.
+SIMULATION_STREAMS = (STREAM_SPLIT, STREAM_SPAWN, STREAM_SPRITE)
+
+# Seeds are saved as signed 64 bit integers in the replays and snapshots.
+MIN_SEED = -2**63
+MAX_SEED = 2**63 - 1
+
+def create_seed():
+    return int.from_bytes(os.urandom(4), "little")
+
+class RandomStreams:
+    """The random streams of a game.
+
+        The stream objects are kept when the streams are seeded again, so the
+        modules can hold on to the streams they draw from."""
+
+    def __init__(self, seed = None):
+        self.streams = {name: random.Random() for name in STREAMS}
+        self.seed(seed)
+
+    def seed(self, seed = None):
+        """Seeds every stream from the seed, or from a new random seed if it's None."""
+        if seed is None:
+            seed = create_seed()
+
+        self.master_seed = seed
+
+        for name, stream in self.streams.items():
+            stream.seed(f"{seed}/{name}")
+
+    def get(self, name):
+        return self.streams[name]
+
+    def create_level_random(self, number):
+        """A new stream for building the level, only depending on the seed and the level number,
+            so a level is the same whenever and on whatever thread it's built."""
+        return random.Random(f"{self.master_seed}/level/{number}")
+
+    def get_state(self):
+        """The master seed and the states of the simulation streams, which the level streams are made from."""
+        return (self.master_seed, [self.streams[name].getstate() for name in SIMULATION_STREAMS])
+
+    def set_state(self, state):
+        self.master_seed, stream_states = state
+
+        for name, stream_state in zip(SIMULATION_STREAMS, stream_states):
+            self.streams[name].setstate(stream_state)
+
+
+# The streams shared by the game and its sprites.
+random_streams = RandomStreams()
+
+split_random = random_streams.get(STREAM_SPLIT)
+spawn_random = random_streams.get(STREAM_SPAWN)
+sprite_random = random_streams.get(STREAM_SPRITE)
+sound_random = random_streams.get(STREAM_SOUND)
@@ -0,0 +1,70 @@
+"""
+Shared cache of rotated sprite images and their collision masks.
+"""
+
+from collections import OrderedDict
+import threading
+import pygame
+
+# Angles are rounded to this many degrees before rotating.
+ROTATION_STEP = 1
+ROTATION_CACHE_SIZE = 2048
+
+class RotationCache:
+    """LRU cache of rotated surfaces and masks keyed by (source image, size, quantized angle).
+
+        The cached surfaces and masks are shared between sprites, so they
+        must be treated as read-only. The levels built on the prefetcher's
+        thread rotate their sprites here as well, so the cache is locked."""
+
+    def __init__(self, step = ROTATION_STEP, max_size = ROTATION_CACHE_SIZE):
+        self.step = step
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def quantize(self, angle):
+        return (round(angle / self.step) * self.step) % 360
+
+    def get(self, image, angle):
+        """Returns the rotated image and its mask for the angle."""
+        key = (image, image.get_size(), self.quantize(angle))
+        entries = self.entries
+
+        with self.lock:
+            entry = entries.get(key)
+
+            if entry is not None:
+                self.hits += 1
+                entries.move_to_end(key)
+
+                return entry
+
+            self.misses += 1
+            entry = self.rotate(image, key[2])
+            entries[key] = entry
+
+            # Drops the least recently used rotation.
+            if len(entries) > self.max_size:
+                entries.popitem(last = False)
+
+        return entry
+
+    def rotate(self, image, angle):
+        # Using -angle since rotate is counter clock wise.
+        rotated = pygame.transform.rotate(image, -angle)
+        return (rotated, pygame.mask.from_surface(rotated))
+
+    def prewarm(self, image, angles = None):
+        """Fills the cache ahead of time, by default with every quantized angle."""
+        if angles is None:
+            angles = range(0, 360, self.step)
+
+        for angle in angles:
+            self.get(image, angle)
+
+
+# The cache shared by all sprites.
+rotation_cache = RotationCache()
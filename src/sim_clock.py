@@ -0,0 +1,37 @@
+"""
+Clocks used for timing the game logic, such as bullet lifetimes, spawn delays and respawns.
+"""
+
+from .constants import FPS
+from .functions import get_millis
+
+SIMULATION_STEP_MS = 1000 / FPS
+
+class SimulationClock:
+    """Clock owned by the Game which advances a fixed step every tick.
+
+        Since the time only changes when the Game ticks, the simulation can run
+        faster than real time and every sprite reads the same time during a tick."""
+
+    def __init__(self, step_ms = SIMULATION_STEP_MS, start_ms = 0):
+        self.step_ms = step_ms
+        self.time_ms = start_ms
+        self.now_ms = int(start_ms)
+        self.tick_count = 0
+
+    def tick(self):
+        """Advances the clock by one step."""
+        self.tick_count += 1
+        self.time_ms += self.step_ms
+        self.now_ms = int(self.time_ms)
+
+
+class WallClock:
+    """Clock reading the wall time, used by sprites and levels created without a SimulationClock."""
+
+    @property
+    def now_ms(self):
+        return get_millis()
+
+
+WALL_CLOCK = WallClock()
@@ -0,0 +1,364 @@
+"""
+Binary snapshots of a whole game, for checkpoints, retrying a level and
+the keyframes of a replay.
+
+A snapshot holds the state from Game.get_state packed with struct. The
+sprites are saved as their movement and attributes, a column at a time for
+each sprite class. The images aren't saved but looked up in the asset caches
+from the image paths, sizes and colors when the snapshot is loaded. Every
+field has a fixed type, so a snapshot is safe to load from a file someone
+else wrote.
+"""
+
+import json
+import struct
+from array import array
+from itertools import chain
+from operator import add, attrgetter, itemgetter
+from .rng import SIMULATION_STREAMS
+from .sprites.movable_sprite import MovableSprite, MOVEMENT_ATTRIBUTES, RECT_ATTRIBUTES
+
+SNAPSHOT_MAGIC = b"NSNP"
+SNAPSHOT_VERSION = 2
+
+# magic, version, shared value table size, sprite class count, sprite count
+SNAPSHOT_HEADER = struct.Struct("<4sHIII")
+
+# tick count, clock time, clock tick count, score, lives, level number, player index
+GAME_STRUCT = struct.Struct("<qdqqqqq")
+
+# has level, level spawn time, level sprites spawned
+LEVEL_STRUCT = struct.Struct("<?q?")
+
+# has message, message, x, y, spawn time
+MESSAGE_STRUCT = struct.Struct("<?Iddq")
+
+# allocated, active, peak active, acquired, dropped
+BULLET_POOL_STRUCT = struct.Struct("<5q")
+
+# master seed, then for each stream the version, has gauss next and gauss next,
+# followed by the Mersenne Twister state of 625 words.
+RANDOM_SEED_STRUCT = struct.Struct("<q")
+RANDOM_STREAM_STRUCT = struct.Struct("<B?d")
+RANDOM_STATE_WORDS = 625
+
+# has the level snapshot, level snapshot pending, level snapshot size, followed by the level snapshot.
+# A size of 0 is no level snapshot, it's only missing before the level's first tick.
+LEVEL_SNAPSHOT_STRUCT = struct.Struct("<??I")
+
+# The sprites of a class follow its name and count.
+SPRITE_CLASS_STRUCT = struct.Struct("<II")
+
+MOVEMENT_FORMAT = "9d"
+RECT_FORMAT = "4i"
+RECT_STRUCT = struct.Struct("<" + RECT_FORMAT)
+
+# The types of the sprite attributes in a state_format: an int, a float, a bool,
+# an int or None, an x/y point and a value shared through the value table,
+# such as an image path or a color.
+FIELD_FORMATS = {"i": "q", "f": "d", "?": "?", "n": "q", "p": "dd", "s": "I"}
+NONE_VALUE = -2**63
+
+def get_sprite_classes():
+    """The sprite classes a snapshot can hold, by name."""
+    from .sprites.space_ship import SpaceShip
+    from .sprites.asteroid import Asteroid
+    from .sprites.cluster_asteroid import ClusterAsteroid
+    from .sprites.melting_asteroid import MeltingAsteroid
+    from .sprites.slime_blob import SlimeBlob
+    from .sprites.vortex_hole import VortexHole
+    from .sprites.bullet import Bullet
+    from .sprites.meteroite import Meteorite
+    from .sprites.gas_cloud import GasCloud
+
+    sprite_classes = (SpaceShip, Bullet, Asteroid, ClusterAsteroid, MeltingAsteroid, SlimeBlob, VortexHole, Meteorite, GasCloud)
+
+    return {sprite_class.__name__: sprite_class for sprite_class in sprite_classes}
+
+
+class SpriteFormat:
+    """How the sprites of a class are packed.
+
+        The movement and the number and bool attributes of every sprite are
+        packed as rows, the rects and the other attributes follow as columns.
+        The sprites are read and made again in batches, only the sprites'
+        own set_state and the image lookup run for each sprite when a
+        snapshot is loaded."""
+
+    def __init__(self, sprite_class):
+        # A sprite that couldn't be made again is turned down when the snapshot is saved, not when it's loaded.
+        if sprite_class.get_image is MovableSprite.get_image:
+            raise ValueError(f"{sprite_class.__name__} has no get_image and can't be saved in a snapshot")
+
+        self.sprite_class = sprite_class
+        self.name = sprite_class.__name__
+
+        fields = list(zip(sprite_class.state_attributes, sprite_class.state_format))
+        numeric = [name for name, field in fields if field in "if?"]
+        self.shared = [name for name, field in fields if field == "s"]
+        self.optional = [name for name, field in fields if field == "n"]
+        self.points = [name for name, field in fields if field == "p"]
+
+        self.row_format = MOVEMENT_FORMAT + "".join(FIELD_FORMATS[field] for name, field in fields if field in "if?")
+        self.row_struct = struct.Struct("<" + self.row_format)
+        self.row_getter = attrgetter(*MOVEMENT_ATTRIBUTES, *numeric)
+
+        # A row followed by the rect and the columns is put back in the order set_state takes.
+        order = list(MOVEMENT_ATTRIBUTES) + numeric + list(RECT_ATTRIBUTES) + self.shared + self.optional + self.points
+        state_order = MOVEMENT_ATTRIBUTES + RECT_ATTRIBUTES + sprite_class.state_attributes
+        self.state_getter = itemgetter(*(order.index(name) for name in state_order))
+        self.has_columns = len(self.shared + self.optional + self.points) > 0
+
+        self.image_key = None
+        if sprite_class.image_attributes:
+            self.image_key = attrgetter(*sprite_class.image_attributes)
+
+    def pack(self, sprites, values, chunks):
+        count = len(sprites)
+        chunks.append(SPRITE_CLASS_STRUCT.pack(values.add(self.name), count))
+        chunks.append(struct.pack("<" + self.row_format * count, *chain.from_iterable(map(self.row_getter, sprites))))
+        chunks.append(struct.pack("<" + RECT_FORMAT * count, *chain.from_iterable(map(attrgetter("rect"), sprites))))
+
+        for name in self.shared:
+            column = list(map(attrgetter(name), sprites))
+
+            # Only the values seen for the first time are added to the table one at a time.
+            for value in set(column):
+                values.add(value)
+
+            chunks.append(struct.pack(f"<{count}I", *map(values.indexes.__getitem__, column)))
+
+        for name in self.optional:
+            column = [NONE_VALUE if value is None else value for value in map(attrgetter(name), sprites)]
+            chunks.append(struct.pack(f"<{count}q", *column))
+
+        for name in self.points:
+            chunks.append(struct.pack(f"<{count * 2}d", *chain.from_iterable(map(attrgetter(name), sprites))))
+
+    def unpack(self, data, offset, count, values, clock):
+        """The sprites of the class, made from the data at the offset, and the offset after them."""
+        size = self.row_struct.size * count
+        rows = self.row_struct.iter_unpack(data[offset:offset + size])
+        offset += size
+
+        size = RECT_STRUCT.size * count
+        states = list(map(add, rows, RECT_STRUCT.iter_unpack(data[offset:offset + size])))
+        offset += size
+
+        if self.has_columns:
+            columns = []
+
+            for name in self.shared:
+                column = struct.unpack_from(f"<{count}I", data, offset)
+                columns.append([values[index] for index in column])
+                offset += 4 * count
+
+            for name in self.optional:
+                column = struct.unpack_from(f"<{count}q", data, offset)
+                columns.append([None if value == NONE_VALUE else value for value in column])
+                offset += 8 * count
+
+            for name in self.points:
+                column = iter(struct.unpack_from(f"<{count * 2}d", data, offset))
+                columns.append(list(zip(column, column)))
+                offset += 16 * count
+
+            states = map(add, states, zip(*columns))
+
+        # The sprites that look the same share the images, which are only looked up once per snapshot.
+        from_state = self.sprite_class.from_state
+        image_key = self.image_key
+        images = {} if image_key is not None else None
+        sprites = [from_state(state, clock, images, image_key) for state in map(self.state_getter, states)]
+
+        return sprites, offset
+
+
+class ValueTable:
+    """The strings and tuples shared by the sprites of a snapshot, each is saved once."""
+
+    def __init__(self):
+        self.indexes = {}
+        self.values = []
+
+    def add(self, value):
+        index = self.indexes.get(value)
+
+        if index is None:
+            index = len(self.values)
+            self.indexes[value] = index
+            self.values.append(value)
+
+        return index
+
+    def encode(self):
+        return json.dumps(self.values, separators = (",", ":")).encode()
+
+    @staticmethod
+    def decode(data):
+        # JSON has no tuples, the colors are made tuples again.
+        return [tuple(value) if isinstance(value, list) else value for value in json.loads(data)]
+
+
+# The formats by sprite class, made the first time a class is saved or loaded.
+sprite_formats = {}
+
+def get_sprite_format(sprite_class):
+    sprite_format = sprite_formats.get(sprite_class)
+
+    if sprite_format is None:
+        sprite_format = SpriteFormat(sprite_class)
+        sprite_formats[sprite_class] = sprite_format
+
+    return sprite_format
+
+def encode_snapshot(state):
+    """Packs a state from Game.get_state."""
+    values = ValueTable()
+    chunks = []
+
+    clock_time, clock_ticks = state["clock"]
+    chunks.append(GAME_STRUCT.pack(state["tick_count"], clock_time, clock_ticks, state["score"], state["lives"],
+                                   state["level_number"], state["player_index"]))
+
+    if state["level"] is None:
+        chunks.append(LEVEL_STRUCT.pack(False, 0, False))
+    else:
+        chunks.append(LEVEL_STRUCT.pack(True, *state["level"]))
+
+    if state["message"] is None:
+        chunks.append(MESSAGE_STRUCT.pack(False, 0, 0, 0, 0))
+    else:
+        message, x, y, spawn_time = state["message"]
+        chunks.append(MESSAGE_STRUCT.pack(True, values.add(message), x, y, spawn_time))
+
+    chunks.append(BULLET_POOL_STRUCT.pack(*state["bullet_pool"]))
+
+    seed, stream_states = state["random"]
+    chunks.append(RANDOM_SEED_STRUCT.pack(seed))
+    for version, internal_state, gauss_next in stream_states:
+        chunks.append(RANDOM_STREAM_STRUCT.pack(version, gauss_next is not None, gauss_next or 0))
+        chunks.append(array("I", internal_state).tobytes())
+
+    # The player comes first, then the sprites of each class and the class of every
+    # sprite in the order they are updated.
+    sprites = state["sprites"]
+    sprites_by_class = {}
+    for sprite in sprites:
+        class_sprites = sprites_by_class.get(type(sprite))
+
+        if class_sprites is None:
+            class_sprites = sprites_by_class[type(sprite)] = []
+
+        class_sprites.append(sprite)
+
+    # Saving only needs the classes of the sprites in the game, the others aren't imported until a snapshot is loaded.
+    get_sprite_format(type(state["player"])).pack([state["player"]], values, chunks)
+
+    class_indexes = {}
+    for sprite_class, class_sprites in sprites_by_class.items():
+        class_indexes[sprite_class] = len(class_indexes)
+        get_sprite_format(sprite_class).pack(class_sprites, values, chunks)
+
+    chunks.append(bytes(map(class_indexes.__getitem__, map(type, sprites))))
+
+    if state["level_snapshot"] is None:
+        chunks.append(LEVEL_SNAPSHOT_STRUCT.pack(False, False, 0))
+    else:
+        pending, level_snapshot = state["level_snapshot"]
+        level_snapshot = level_snapshot or b""
+        chunks.append(LEVEL_SNAPSHOT_STRUCT.pack(True, pending, len(level_snapshot)))
+        chunks.append(level_snapshot)
+
+    value_data = values.encode()
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(value_data), len(sprites_by_class), len(sprites))
+
+    return b"".join([header, value_data] + chunks)
+
+def decode_snapshot(data, clock):
+    """Unpacks a snapshot into a state for Game.set_state, the sprites are made with
+        the clock. Raises ValueError if the data isn't a snapshot."""
+    try:
+        magic, version, value_size, class_count, sprite_count = SNAPSHOT_HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("The data is too short for a snapshot")
+
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"The data isn't a version {SNAPSHOT_VERSION} snapshot")
+
+    try:
+        offset = SNAPSHOT_HEADER.size
+        values = ValueTable.decode(data[offset:offset + value_size])
+        offset += value_size
+
+        (tick_count, clock_time, clock_ticks, score, lives, level_number,
+            player_index) = GAME_STRUCT.unpack_from(data, offset)
+        offset += GAME_STRUCT.size
+
+        has_level, level_spawn_time, level_spawned = LEVEL_STRUCT.unpack_from(data, offset)
+        offset += LEVEL_STRUCT.size
+
+        has_message, message, x, y, spawn_time = MESSAGE_STRUCT.unpack_from(data, offset)
+        offset += MESSAGE_STRUCT.size
+
+        bullet_pool = BULLET_POOL_STRUCT.unpack_from(data, offset)
+        offset += BULLET_POOL_STRUCT.size
+
+        seed, = RANDOM_SEED_STRUCT.unpack_from(data, offset)
+        offset += RANDOM_SEED_STRUCT.size
+
+        stream_states = []
+        for name in SIMULATION_STREAMS:
+            stream_version, has_gauss, gauss_next = RANDOM_STREAM_STRUCT.unpack_from(data, offset)
+            offset += RANDOM_STREAM_STRUCT.size
+
+            internal_state = array("I")
+            internal_state.frombytes(data[offset:offset + RANDOM_STATE_WORDS * internal_state.itemsize])
+            offset += RANDOM_STATE_WORDS * internal_state.itemsize
+
+            stream_states.append((stream_version, tuple(internal_state), gauss_next if has_gauss else None))
+
+        sprite_classes = get_sprite_classes()
+        sprite_groups = []
+        for i in range(class_count + 1):
+            name_index, count = SPRITE_CLASS_STRUCT.unpack_from(data, offset)
+            offset += SPRITE_CLASS_STRUCT.size
+
+            class_sprites, offset = get_sprite_format(sprite_classes[values[name_index]]).unpack(data, offset, count, values, clock)
+            sprite_groups.append(iter(class_sprites))
+
+        class_indexes = data[offset:offset + sprite_count]
+        if len(class_indexes) < sprite_count:
+            raise ValueError("The snapshot is cut short")
+
+        player = next(sprite_groups.pop(0))
+        sprites = [next(sprite_groups[class_index]) for class_index in class_indexes]
+        offset += sprite_count
+
+        has_level_snapshot, level_snapshot_pending, size = LEVEL_SNAPSHOT_STRUCT.unpack_from(data, offset)
+        offset += LEVEL_SNAPSHOT_STRUCT.size
+
+        level_snapshot = None
+        if has_level_snapshot:
+            if offset + size > len(data):
+                raise ValueError("The snapshot is cut short")
+
+            level_snapshot = (level_snapshot_pending, bytes(data[offset:offset + size]) if size > 0 else None)
+    except (struct.error, IndexError, KeyError, TypeError, StopIteration) as error:
+        raise ValueError(f"The snapshot is damaged: {error!r}")
+
+    return {
+        "tick_count": tick_count,
+        "clock": (clock_time, clock_ticks),
+        "score": score,
+        "lives": lives,
+        "level_number": level_number,
+        "level": (level_spawn_time, level_spawned) if has_level else None,
+        "message": (values[message], x, y, spawn_time) if has_message else None,
+        "random": (seed, stream_states),
+        "bullet_pool": bullet_pool,
+        "player": player,
+        "player_index": player_index,
+        "sprites": sprites,
+        "level_snapshot": level_snapshot,
+    }
@@ -6,64 +6,197 @@ Utillity class
 
 
 # Imports
-import sys
-import time
-import random
-import math
 import pygame
 import pygame.sprite
 import pygame.mixer
 import os
-import glob
-from pygame.locals import *
-from .constants import *
-from .functions import *
+from .functions import IMAGE_BASE_PATH
+from .asset_loader import asset_loader
+from .rng import sound_random
 
-SOUND_BASE_PATH = "src/data/sound/";
+SOUND_BASE_PATH = IMAGE_BASE_PATH + "sound/"
+
+SOUND_CHANNELS = 8
+
+# name: (priority, max voices) of the sound categories. When every channel is busy
+# a sound steals the oldest voice with the lowest priority, unless that is higher than its own.
+SOUND_CATEGORIES = {
+    "ship_thrust": (3, 1),
+    "ship_respawn": (3, 1),
+    "ship_kill": (3, 1),
+    "laser_shoot": (2, 2),
+    "slime_kill": (1, 2),
+    "asteroid_split": (0, 3),
+}
+DEFAULT_SOUND_CATEGORY = (0, 2)
+
+# Sounds played as loops, each on a channel of its own.
+LOOP_SOUNDS = ("ship_thrust",)
+LOOP_FADEOUT_MS = 100
+
+def get_sound_category(sound_file):
+    """The category is the file name without its number, e.g. asteroid_split_3.wav is asteroid_split."""
+    name = os.path.splitext(os.path.basename(sound_file))[0]
+    base, separator, suffix = name.rpartition("_")
+
+    if separator and suffix.isdigit():
+        return base
+
+    return name
+
+class Voice:
+    """A mixer channel and the sound category playing on it."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.category = None
+        self.priority = 0
+        self.started = 0
+
+    def is_playing(self):
+        return self.category is not None and self.channel.get_busy()
 
 class SoundBox:
-    """Class used for playing sound effects"""
+    """Class used for playing sound effects.
+
+        Sounds played during a frame are queued and played by flush(), so
+        the same sound played several times in one frame is only heard once."""
     
-    def __init__(self):
-        self.sound_effects = []
-        self.py_sounds = {}
-        self.channel_number = 0
+    def __init__(self, channel_count = SOUND_CHANNELS):
+        self.sounds = {}
+        self.loading_sounds = []
+        self.pending = {}
+        self.looping = {}
+        self.play_count = 0
+
+        # Counters of merged, stolen and dropped sounds.
+        self.coalesced = 0
+        self.stolen = 0
+        self.dropped = 0
         
         self.load_sounds()
+
+        # The loops get the first channels and the effects share the rest.
+        pygame.mixer.set_num_channels(channel_count)
+        self.loop_channels = {}
+        for number, name in enumerate(LOOP_SOUNDS):
+            self.loop_channels[name] = pygame.mixer.Channel(number)
+
+        self.voices = [Voice(pygame.mixer.Channel(number)) for number in range(len(LOOP_SOUNDS), channel_count)]
     
     def load_sounds(self):
-        """Loads all the sound effects"""
-        
-        # Loads all the sounds in the base_directory.
-        current_dir = os.getcwd()
-        
-        for sound_file in glob.glob(SOUND_BASE_PATH + "*.wav"):
-            #sound_file = sound_file.replace(SOUND_BASE_PATH, '')
-            self.sound_effects.append(sound_file)
-
-        # Load the sound effects
-        for effect in self.sound_effects:
-            self.py_sounds[effect] = pygame.mixer.Sound(effect)
-            
-        os.chdir(current_dir)
+        """Queues all the sound effects for loading, they are decoded in the
+            background and can be played as soon as they are ready."""
+        self.loading_sounds = asset_loader.submit_directory(SOUND_BASE_PATH, ".wav", "sound")
+
+    def update_sounds(self):
+        """Indexes the sounds that finished loading by their category."""
+        if not self.loading_sounds:
+            return
+
+        still_loading = []
+
+        for sound_file in self.loading_sounds:
+            if not asset_loader.is_ready(sound_file):
+                still_loading.append(sound_file)
+                continue
+
+            category = get_sound_category(sound_file)
+
+            if category not in self.sounds:
+                self.sounds[category] = []
+
+            self.sounds[category].append(asset_loader.get_sound(sound_file))
+
+        self.loading_sounds = still_loading
         
     def play(self, sound_name):
-        
-        matching_sounds = []
+        """Queues the sound to be played when the frame is flushed."""
+        if sound_name in self.pending:
+            self.coalesced += 1
+            return
+
+        self.pending[sound_name] = None
+
+    def flush(self):
+        """Plays the sounds queued during the frame."""
+        self.update_sounds()
+
+        for sound_name in self.pending:
+            # Sounds that haven't finished loading are skipped.
+            if sound_name in self.sounds:
+                self.play_effect(sound_name)
+
+        self.pending.clear()
 
-        for sound_eff in self.sound_effects:
-            if sound_name in sound_eff:
-                matching_sounds.append(sound_eff)
+    def play_effect(self, sound_name):
+        priority, max_voices = SOUND_CATEGORIES.get(sound_name, DEFAULT_SOUND_CATEGORY)
+        voice = self.get_voice(sound_name, priority, max_voices)
 
-        if len(matching_sounds) == 0:
+        if voice is None:
+            self.dropped += 1
             return
-        
-        choosen_effect = random.choice(matching_sounds)
 
-        self.play_effect(choosen_effect)
+        voice.channel.play(sound_random.choice(self.sounds[sound_name]))
+
+        self.play_count += 1
+        voice.category = sound_name
+        voice.priority = priority
+        voice.started = self.play_count
+
+    def get_voice(self, sound_name, priority, max_voices):
+        """Returns the voice to play the sound on, or None if it shouldn't be played."""
+        playing = [voice for voice in self.voices if voice.is_playing()]
+
+        # A category at its voice limit restarts its own oldest voice.
+        same_category = [voice for voice in playing if voice.category == sound_name]
+        if len(same_category) >= max_voices:
+            self.stolen += 1
+            return min(same_category, key = lambda voice: voice.started)
+
+        for voice in self.voices:
+            if not voice.is_playing():
+                return voice
+
+        # Every channel is busy, so a less important sound is cut off.
+        victim = min(playing, key = lambda voice: (voice.priority, voice.started))
+        if victim.priority > priority:
+            return None
+
+        self.stolen += 1
+        return victim
+
+    def set_loop(self, sound_name, loop_on):
+        """Starts or stops a looping sound, calling it every frame only changes anything when the state changes."""
+        self.update_sounds()
+        channel = self.loop_channels.get(sound_name)
+
+        if channel is None or sound_name not in self.sounds:
+            return
+
+        if loop_on:
+            if not self.looping.get(sound_name) or not channel.get_busy():
+                channel.play(self.sounds[sound_name][0], loops = -1)
+                self.looping[sound_name] = True
+        elif self.looping.get(sound_name):
+            channel.fadeout(LOOP_FADEOUT_MS)
+            self.looping[sound_name] = False
+
+
+class SilentSoundBox(SoundBox):
+    """SoundBox used by headless games, it never loads or plays anything."""
+
+    def __init__(self):
+        self.sounds = {}
+        self.loading_sounds = []
+        self.pending = {}
+        self.looping = {}
+
+    def play(self, sound_name):
+        pass
 
-    def play_effect(self, sound_effect):
-        py_sound = self.py_sounds[sound_effect]
+    def flush(self):
+        pass
 
-        pygame.mixer.Channel(self.channel_number).play(py_sound)
-        self.channel_number = (self.channel_number+1) % 8
+    def set_loop(self, sound_name, loop_on):
+        pass
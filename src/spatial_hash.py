@@ -0,0 +1,115 @@
+"""
+Uniform grid used as a broadphase for the collision detection, this way a sprite only
+has to be tested against the sprites in the cells it overlaps instead of every sprite.
+"""
+
+from .constants import *
+
+COLLISION_CELL_SIZE = 100
+
+class SpatialHash:
+    """Grid index of sprites based on their bounding rects.
+
+        Cell coordinates wrap around the edges of the screen, just like the
+        sprites do, so a sprite drifting out on one side ends up in the same
+        cells as the sprites entering on the opposite side."""
+
+    def __init__(self, width = WINDOWWIDTH, height = WINDOWHEIGHT, cell_size = COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.columns = max(1, -(-width // cell_size))
+        self.rows = max(1, -(-height // cell_size))
+        self.cells = {}
+
+        # Counters used for tuning the cell size, the frame counters
+        # are reset every time the grid is rebuilt.
+        self.candidate_pairs = 0
+        self.rejected_pairs = 0
+        self.total_candidate_pairs = 0
+        self.total_rejected_pairs = 0
+
+    def clear(self):
+        self.cells = {}
+        self.candidate_pairs = 0
+        self.rejected_pairs = 0
+
+    def rebuild(self, sprites):
+        """Clears the grid and inserts all the sprites again with their current rects."""
+        self.clear()
+
+        for sprite in sprites:
+            self.insert(sprite)
+
+    def get_cell_keys(self, rect):
+        """Returns the keys of the cells covered by the rect."""
+        cell_size = self.cell_size
+        columns = self.columns
+        rows = self.rows
+
+        first_col = rect.left // cell_size
+        first_row = rect.top // cell_size
+
+        # A rect never needs to cover more than the whole grid.
+        col_count = min(((rect.right - 1) // cell_size) - first_col + 1, columns)
+        row_count = min(((rect.bottom - 1) // cell_size) - first_row + 1, rows)
+
+        keys = []
+
+        for row in range(first_row, first_row + row_count):
+            row_offset = (row % rows) * columns
+
+            for col in range(first_col, first_col + col_count):
+                keys.append(row_offset + (col % columns))
+
+        return keys
+
+    def insert(self, sprite):
+        cells = self.cells
+
+        for key in self.get_cell_keys(sprite.rect):
+            if key in cells:
+                cells[key].append(sprite)
+            else:
+                cells[key] = [sprite]
+
+    def query(self, sprite):
+        """Returns the sprites sharing at least one cell with the sprite, excluding itself."""
+        return self.query_rect(sprite.rect, sprite)
+
+    def query_rect(self, rect, exclude = None):
+        """Returns the sprites in the cells covered by the rect."""
+        cells = self.cells
+        candidates = {}
+
+        for key in self.get_cell_keys(rect):
+            if key not in cells:
+                continue
+
+            for candidate in cells[key]:
+                candidates[candidate] = None
+
+        candidates.pop(exclude, None)
+
+        # Sprites killed after the grid was built are skipped.
+        return [candidate for candidate in candidates if candidate.alive()]
+
+    def get_first_colliding(self, sprite, collided):
+        """Returns the first nearby sprite colliding with the sprite, or None.
+            The remaining candidates aren't tested once a collision is found."""
+        tested = 0
+
+        for candidate in self.query(sprite):
+            tested += 1
+
+            if collided(sprite, candidate):
+                self.count_pairs(tested, tested - 1)
+                return candidate
+
+        self.count_pairs(tested, tested)
+
+        return None
+
+    def count_pairs(self, candidates, rejected):
+        self.candidate_pairs += candidates
+        self.rejected_pairs += rejected
+        self.total_candidate_pairs += candidates
+        self.total_rejected_pairs += rejected
@@ -1,9 +1,9 @@
-import random
 import pygame
-from ..constants import *
-from ..functions import generate_angle, load_image
+from pygame.locals import Rect
+from ..functions import generate_angle
+from ..rng import split_random, sprite_random
+from ..asset_cache import asset_cache
 from .movable_sprite import MovableSprite
-from .vortex_hole import VortexHole
 from .slime_blob import SlimeBlob
 
 # Asteroid
@@ -20,34 +20,44 @@ class Asteroid(MovableSprite):
     """Class representing Asteroids that can
         shatter into smaller asteroids on being hit"""
 
-    def __init__(self, x, y, radius = ASTEROID_RADIUS, sprite_image = "asteroid.png"):
+    __slots__ = ("radius", "sprite_image", "shatter_level", "max_shatter_level", "hp")
+
+    shatter_factor = ASTEROID_SHATTER_FACTOR
+    should_split = True
+    color = ASTEROID_COLOR
+    score = ASTEROID_SCORE
+    enable_slime_spawning = True
+    hit_sound = "asteroid_split"
+    state_attributes = ("radius", "sprite_image", "shatter_level", "max_shatter_level", "hp")
+    state_format = "isiii"
+    image_attributes = ("sprite_image", "radius")
+
+    def __init__(self, x, y, radius = ASTEROID_RADIUS, sprite_image = "asteroid.png", angle = None):
+        diameter = radius*2
+        rect = Rect(0, 0, diameter, diameter)
+        rect.center = (x, y)
+
+        # The scaled image is shared by all asteroids with the same image and size.
+        image = asset_cache.get_scaled(sprite_image, diameter)
+        
+        # Calls parent constructor
+        MovableSprite.__init__(self, rect, image)
+
         self.radius = radius
         self.sprite_image = sprite_image
         self.shatter_level = 1
         self.max_shatter_level = ASTEROID_SHATTER_LEVEL
-        self.shatter_factor = ASTEROID_SHATTER_FACTOR
-        self.should_split = True
-        self.color = ASTEROID_COLOR
-        self.score = ASTEROID_SCORE
         self.hp = ASTEROID_HP
-        self.enable_slime_spawning = True
-        
-        diameter = self.radius*2
-        self.rect = Rect(0, 0, diameter, diameter)
-        self.rect.center = (x, y)
-
-        #self.image = pygame.image.load(sprite_image).convert()
-        self.image = load_image(sprite_image)
-        self.image = pygame.transform.scale(self.image, (diameter, diameter))
-        self.image.set_colorkey(BACKGROUND_COLOR)
-        
-        # Calls parent constructor
-        MovableSprite.__init__(self, self.rect, self.image)
         
         #self.image = pygame.Surface([diameter, diameter])
-        angle = random.randint(0, 360)
+        if angle is None:
+            angle = sprite_random.randint(0, 360)
+
         self.set_angle(angle)
 
+    def get_image(self):
+        return asset_cache.get_scaled(self.sprite_image, self.radius * 2)
+
     def hit(self):
         self.hp -= 1
 
@@ -73,13 +83,13 @@ class Asteroid(MovableSprite):
         sub_objects = []
 
         # Randomly spawns a slime blob.
-        if self.enable_slime_spawning and random.randint(1, 100) <= ASTEROID_SPAWN_SLIME_CHANCE:
+        if self.enable_slime_spawning and split_random.randint(1, 100) <= ASTEROID_SPAWN_SLIME_CHANCE:
             sub_objects.append(self.spawn_slime())
 
         sub_ast_num = self.shatter_factor
 
         # Randomly creates twice as many sub asteroids.
-        if random.randint(1, 100) <= ASTEROID_SPLIT_DOUBLE_CHANCE:
+        if split_random.randint(1, 100) <= ASTEROID_SPLIT_DOUBLE_CHANCE:
             sub_ast_num *= 2
         
         for n in range(sub_ast_num):
@@ -107,13 +117,12 @@ class Asteroid(MovableSprite):
 
         ast_radius = self.get_split_asteroid_radius()
         
-        asteroid = Asteroid(ast_x, ast_y, ast_radius, image)
+        ast_angle = generate_angle(occupied_angles, split_random)
+
+        asteroid = Asteroid(ast_x, ast_y, ast_radius, image, ast_angle)
         asteroid.shatter_level = self.shatter_level + 1
         asteroid.max_shatter_level = self.max_shatter_level
         asteroid.velocity = self.velocity
-
-        ast_angle = generate_angle(occupied_angles)
-        asteroid.set_angle(ast_angle)
         
         return asteroid
 
@@ -126,6 +135,8 @@ class Asteroid(MovableSprite):
         return slime_blob
 
     def spawn_vortex_hole(self):
+        from .vortex_hole import VortexHole
+
         ast_x = self.rect.centerx
         ast_y = self.rect.centery
 
@@ -1,11 +1,13 @@
 import math
+import weakref
 import pygame
 import pygame.sprite
 from pygame.locals import *
 
-from .. functions import get_millis
+from ..sim_clock import WALL_CLOCK
 from ..constants import *
 from .movable_sprite import MovableSprite
+from ..collision_layers import LAYER_PLAYER_PROJECTILE
 
 # Constants
 BULLET_RADIUS = 4
@@ -13,39 +15,112 @@ BULLET_VELOCITY = 12
 BULLET_DURATION_MS = 500
 BULLET_COLOR = RED
 
+def get_bullet_image(radius, color, bullet_images = {}):
+    """Draws the bullet image, cached so that every bullet shares
+        the same image and the same rotations in the rotation cache."""
+    key = (radius, color)
+
+    if key not in bullet_images:
+        diameter = radius * 2
+        image = pygame.Surface([diameter, diameter])
+        image.set_colorkey(BACKGROUND_COLOR)
+        pygame.draw.circle(image, color, (radius, radius), radius)
+        bullet_images[key] = image
+
+    return bullet_images[key]
+
 class Bullet(MovableSprite):
     """Class representing bullet fired."""
+
+    __slots__ = ("clock", "radius", "color", "shot_time", "parent_ref", "pool")
+
+    physics_controlled = True
+    collision_layer = LAYER_PLAYER_PROJECTILE
+    shot_duration = BULLET_DURATION_MS
+    temporary = True
+    friendly = True
+    state_attributes = ("radius", "color", "shot_time")
+    state_format = "isn"
+    image_attributes = ("radius", "color")
     
-    def __init__(self, left = 0, top = 0, radius = BULLET_RADIUS, bullet_color = BULLET_COLOR):
-        self.radius = radius
-        diameter = self.radius * 2
-        self.color = bullet_color
-        self.rect = Rect(left, top, diameter, diameter)
+    def __init__(self, left = 0, top = 0, radius = BULLET_RADIUS, bullet_color = BULLET_COLOR, clock = None):
+        if clock is None:
+            clock = WALL_CLOCK
 
-        self.image = pygame.Surface([diameter, diameter])
-        self.image.set_colorkey(BACKGROUND_COLOR)                
-        pygame.draw.circle(self.image, self.color, (self.radius, self.radius), self.radius)
+        diameter = radius * 2
+        rect = Rect(left, top, diameter, diameter)
+        image = get_bullet_image(radius, bullet_color)
                 
         # Calls parent constructor
-        MovableSprite.__init__(self, self.rect, self.image)
-
-        self.mask = pygame.mask.from_surface(self.image)
+        MovableSprite.__init__(self, rect, image)
         
-        self.shot_time = 0
-        self.shot_duration = BULLET_DURATION_MS
-        self.parent = None
-        self.temporary = True
-        self.friendly = True
+        self.clock = clock
+        self.radius = radius
+        self.color = bullet_color
+        self.shot_time = None
+
+        # The ship firing the bullet is only weakly referenced so that
+        # bullets in flight, or in the pool, don't keep a killed ship alive.
+        self.parent_ref = None
+
+        # Set when the bullet belongs to a BulletPool.
+        self.pool = None
+
+    @property
+    def parent(self):
+        if self.parent_ref is None:
+            return None
+
+        return self.parent_ref()
+
+    @parent.setter
+    def parent(self, parent):
+        if parent is None:
+            self.parent_ref = None
+        else:
+            self.parent_ref = weakref.ref(parent)
+
+    def set_state(self, state, clock):
+        self.clock = clock
+        self.parent_ref = None
+        self.pool = None
+        MovableSprite.set_state(self, state, clock)
+
+    def get_image(self):
+        return get_bullet_image(self.radius, self.color)
+
+    def reset(self, x, y, parent):
+        """Readies the bullet for a new shot, pooled bullets are reused for many shots."""
+        self.vx = 0
+        self.vy = 0
+        self.reset_acc()
+        self.shot_time = None
+        self.parent = parent
+        self.set_pos(x, y)
         
     def fire(self, angle, velocity = BULLET_VELOCITY):
         self.set_angle(angle)
-        self.velocity = BULLET_VELOCITY
-        self.shot_time = get_millis()
+        self.velocity = velocity
+        self.shot_time = self.clock.now_ms
 
     def update(self):
-        if self.shot_time > 0 and (get_millis() - self.shot_time) >= self.shot_duration:
+        if self.shot_time is not None and (self.clock.now_ms - self.shot_time) >= self.shot_duration:
             self.kill()
             return
         
         # Call parent function
         MovableSprite.update(self)
+
+    def hit(self):
+        # A bullet is used up by hitting something.
+        self.kill()
+
+    def kill(self):
+        if not self.alive():
+            return
+
+        MovableSprite.kill(self)
+
+        # Hands the bullet back so that it can be fired again.
+        if self.pool is not None:
+            self.pool.release(self)
@@ -13,16 +13,18 @@ class ClusterAsteroid(Asteroid):
     """Class representing Asteroids that can
         shatter into smaller asteroids on being hit"""
 
-    def __init__(self, x, y, radius = CLUSTER_ASTEROID_RADIUS, sprite_image = "sprites/asteroid_cluster.png"):
+    __slots__ = ()
+
+    shatter_factor = CLUSTER_ASTEROID_SHATTER_FACTOR
+    score = CLUSTER_ASTEROID_SCORE
+    enable_slime_spawning = False
+
+    def __init__(self, x, y, radius = CLUSTER_ASTEROID_RADIUS, sprite_image = "sprites/asteroid_cluster.png", angle = None):
         
-        Asteroid.__init__(self, x, y, radius, sprite_image)
+        Asteroid.__init__(self, x, y, radius, sprite_image, angle)
         
         self.max_shatter_level = CLUSTER_ASTEROID_SHATTER_LEVEL
-        self.shatter_factor = CLUSTER_ASTEROID_SHATTER_FACTOR
         self.hp = CLUSTER_ASTEROID_HP
-        self.score = CLUSTER_ASTEROID_SCORE
-        self.split_velocity = self.velocity * 2
-        self.enable_slime_spawning = False
         
     def get_split_asteroid_radius(self):
         return self.radius//4
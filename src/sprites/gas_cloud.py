@@ -1,29 +1,42 @@
 import pygame
 from ..constants import *
 from .movable_sprite import MovableSprite
+from ..collision_layers import LAYER_TOXIC
 
 GAS_CLOUD_COLOR = (150, 150, 150)
 GAS_CLOUD_ALPHA = 150
 
+def get_gas_cloud_image(width, height, color, gas_cloud_images = {}):
+    """Draws the gas cloud image, cached so that every gas cloud of the same size shares it."""
+    key = (width, height, color)
+
+    if key not in gas_cloud_images:
+        image = pygame.Surface([width, height])
+        image.set_colorkey(BACKGROUND_COLOR)
+        image.fill(color)
+        image.set_alpha(GAS_CLOUD_ALPHA)
+        gas_cloud_images[key] = image
+
+    return gas_cloud_images[key]
+
 class GasCloud(MovableSprite):
 
+    attractable = False
+    temporary = True
+    transparent = True
+    toxic = True   # Means that the player will be killed upon touching this but other objects can pass it
+    collision_layer = LAYER_TOXIC
+    color = GAS_CLOUD_COLOR
+
     def __init__(self, x, y, width, height):
 
-        self.attractable = False
-        self.temporary = True
-        self.transparent = True
-        self.toxic = True   # Means that the player will be killed upon touching this but other objects can pass it
+        rect = Rect(x, y, width, height)
         
-        self.color = GAS_CLOUD_COLOR
-        self.rect = Rect(x, y, width, height)
-        self.image = pygame.Surface([width, height])
-        self.image.set_colorkey(constants.BACKGROUND_COLOR)
-
-        pygame.draw.rect(self.image, self.color, self.rect)
+        MovableSprite.__init__(self, rect, get_gas_cloud_image(width, height, self.color))
 
-        self.image.set_alpha(GAS_CLOUD_ALPHA)
-        
-        MovableSprite.__init__(self, self.rect, self.image)
+    def get_image(self):
+        # The cloud's size is its rect's, which a snapshot restores before the image.
+        return get_gas_cloud_image(self.rect.width, self.rect.height, self.color)
 
     def hit(self):
         return 0
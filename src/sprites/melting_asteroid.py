@@ -1,7 +1,10 @@
 import pygame
 from ..constants import *
 from .movable_sprite import MovableSprite
+from ..asset_cache import asset_cache
+from ..rotation_cache import rotation_cache
 
+MELTING_ASTEROID_RADIUS = 70
 MELTING_ASTEROID_HP = 5
 MELTING_ASTEROID_SCORE = 20
 MELTING_ASTEROID_MELT_FACTOR = 1
@@ -9,27 +12,36 @@ MELTING_ASTEROID_MELT_FACTOR = 1
 class MeltingAsteroid(MovableSprite):
 
     """This reprents an asteroid that will melt or shrink instead of shattering into smaller pieces"""
-    def __init__(self, x, y, radius, sprite_image = "melting_asteroid.png"):
-    
-        #self.image = pygame.image.load(sprite_image).convert()
 
-        diameter = radius * 2;
-        self.radius = radius
+    __slots__ = ("radius", "sprite_image", "hp")
 
-        self.rect = Rect(0, 0, diameter, diameter)
-        self.rect.center = (x, y)
+    score = MELTING_ASTEROID_SCORE
+    melt_factor = MELTING_ASTEROID_MELT_FACTOR
+    state_attributes = ("radius", "sprite_image", "hp")
+    state_format = "fsi"
+    image_attributes = ("sprite_image", "radius")
 
-        self.org_image = load_image(sprite_image)
-        self.image = pygame.transform.scale(self.org_image, (diameter, diameter))
-        self.image.set_colorkey(constants.BACKGROUND_COLOR)
+    def __init__(self, x, y, radius = MELTING_ASTEROID_RADIUS, sprite_image = "sprites/melting_asteroid_a.png"):
+    
+        diameter = radius * 2;
+        rect = Rect(0, 0, diameter, diameter)
+        rect.center = (x, y)
 
-        self.redrawImage()
+        MovableSprite.__init__(self, rect, asset_cache.get_scaled(sprite_image, diameter))
 
-        MovableSprite.__init__(self, self.rect, self.image)
-            
+        self.radius = radius
+        self.sprite_image = sprite_image
         self.hp = MELTING_ASTEROID_HP
-        self.score = MELTING_ASTEROID_SCORE
-        self.melt_factor = MELTING_ASTEROID_MELT_FACTOR
+
+        # Scales the image to every size the asteroid will melt down to ahead of time.
+        asset_cache.prewarm_sizes(sprite_image, self.get_melt_diameters())
+
+    def get_melt_diameters(self):
+        """The diameters the asteroid will have after each hit."""
+        return [(self.radius - (hit * self.melt_factor)) * 2 for hit in range(self.hp)]
+
+    def get_image(self):
+        return asset_cache.get_scaled(self.sprite_image, self.radius * 2)
 
     def hit(self):
         self.hp -= 1
@@ -44,13 +56,12 @@ class MeltingAsteroid(MovableSprite):
 
     def redrawImage(self):
         diameter = self.radius * 2
-        oldCenterX, oldCenterY = self.rect.center
 
-        # We must recreate the rectangle/surface object as this asteroid might have melted
-        self.rect = Rect(0, 0, diameter, diameter)
-        self.rect.center = (oldCenterX, oldCenterY)
-        
-        self.image = pygame.transform.scale(self.image, (diameter, diameter))
-        self.image.set_colorkey(constants.BACKGROUND_COLOR)
+        # Uses the precomputed size instead of rescaling the current image.
+        self.org_image = asset_cache.get_scaled(self.sprite_image, diameter)
+        self.image, self.mask = rotation_cache.get(self.org_image, self.angle)
 
-        self.mask = pygame.mask.from_surface(self.image)
+        # We must recreate the rectangle as this asteroid has melted
+        old_center = self.rect.center
+        self.rect = self.image.get_rect()
+        self.rect.center = old_center
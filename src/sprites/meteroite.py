@@ -1,35 +1,50 @@
-
-from .. import constants
 import pygame
-import .movable_sprite
+from pygame.locals import *
+from .. import constants
+from .movable_sprite import MovableSprite
 
 # Constants
 METEROITE_COLOR = (222,184,135)
 METEROITE_SCORE = 10
 METEROITE_HP = 1
 
+def get_meteorite_image(radius, color, meteorite_images = {}):
+    """Draws the meteorite image, cached so that every meteorite of the same size shares it."""
+    key = (radius, color)
+
+    if key not in meteorite_images:
+        diameter = radius * 2
+        image = pygame.Surface([diameter, diameter])
+        image.set_colorkey(constants.BACKGROUND_COLOR)
+        pygame.draw.circle(image, color, (radius, radius), radius)
+        meteorite_images[key] = image
+
+    return meteorite_images[key]
+
 class Meteorite(MovableSprite):
     """Class representing a meteroite which may collide with the player but unlike the asteroid the meteroite will not shatter into smaller pieces or spawn slimes"""
     
+    __slots__ = ("radius", "hp")
+
+    color = METEROITE_COLOR
+    score = METEROITE_SCORE
+    state_attributes = ("radius", "hp")
+    state_format = "ii"
+    image_attributes = ("radius", "color")
+    
     def __init__(self, x, y, radius):
         diameter = radius*2
-        self.radius = radius
-        self.color = METEROITE_COLOR
-        
-        
-        self.rect = Rect(0, 0, diameter, diameter)
-        self.rect.center = (x, y)
+        rect = Rect(0, 0, diameter, diameter)
+        rect.center = (x, y)
 
-        self.image = pygame.Surface([diameter, diameter])
-        self.image.set_colorkey(constants.BACKGROUND_COLOR)                
-        pygame.draw.circle(self.image, self.color, (radius, radius), radius)
-        
         # Calls parent constructor
-        MovableSprite.__init__(self, self.rect, self.image)
+        MovableSprite.__init__(self, rect, get_meteorite_image(radius, self.color))
         
-        self.mask = pygame.mask.from_surface(self.image)
+        self.radius = radius
         self.hp = METEROITE_HP
-        self.score = METEROITE_SCORE
+
+    def get_image(self):
+        return get_meteorite_image(self.radius, self.color)
 
     def hit(self):
         self.hp -= 1
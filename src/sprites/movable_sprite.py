@@ -2,10 +2,54 @@
 import math
 import pygame
 import pygame.sprite
-from ..functions import add_vectors
+from ..functions import sin_cos
+from ..rotation_cache import rotation_cache
+from ..collision_layers import LAYER_HOSTILE
+
+# The movement saved in a snapshot, followed by the rect and the attributes of each sprite class.
+MOVEMENT_ATTRIBUTES = ("x", "y", "angle", "acc", "vx", "vy", "a_ax", "a_ay", "heading")
+RECT_ATTRIBUTES = ("left", "top", "width", "height")
 
 class MovableSprite(pygame.sprite.Sprite):
-    """Base class for the sprites or objects in the game."""
+    """Base class for the sprites or objects in the game.
+
+        The velocity is kept as x/y components, velocity and mov_angle
+        are computed from them when needed."""
+
+    # The per sprite state is kept in slots, pygame's Sprite still
+    # gives each sprite a small __dict__ for the groups it's in.
+    __slots__ = (
+        "rect", "image", "org_image", "mask",
+        "x", "y", "angle", "acc",
+        # Velocity and added acceleration as x/y components, and the
+        # movement angle to use when the sprite is standing still.
+        "vx", "vy", "a_ax", "a_ay", "heading",
+        # Set when the sprite is attached to a PhysicsEngine.
+        "physics", "physics_slot",
+    )
+
+    # Defaults shared by every sprite, subclasses override them as class attributes.
+    should_split = False
+    temporary = False
+    transparent = False
+    remove_off_scren = False
+    friendly = False
+    toxic = False
+    attractable = True
+    targets_player = False
+    max_velocity = -1
+    physics_controlled = False
+    collision_layer = LAYER_HOSTILE
+    hit_sound = None
+
+    # The attributes saved in a snapshot besides the movement, subclasses list their own
+    # along with their types, one character each, see snapshot.py.
+    state_attributes = ()
+    state_format = ""
+
+    # The attributes the unrotated image is made from, the sprites of a snapshot
+    # with the same values and image angle share one image lookup when it's loaded.
+    image_attributes = ()
     
     def __init__(self, rect, image):
         # Calls parent constructor
@@ -15,47 +59,25 @@ class MovableSprite(pygame.sprite.Sprite):
 
         # Using an additional image field "org_image"
         # so a transformed or rotated copy can be used.
-        if not hasattr(self, 'org_image'):
-            self.org_image = image
-        
+        self.org_image = image
         self.image = image
 
-        # Sets the default attributes unless they are allready set.
-        if not hasattr(self, 'velocity'):
-            self.velocity = 0
-        if not hasattr(self, 'acc'):
-            self.acc = 0
-        if not hasattr(self, 'angle'):
-            self.angle = 0
-        if not hasattr(self, 'mov_angle'):
-            self.mov_angle = 0
-        if not hasattr(self, 'should_split'):
-            self.should_split = False
-        if not hasattr(self, 'temporary'):
-            self.temporary = False
-        if not hasattr(self, 'transparent'):
-            self.transparent = False
-        if not hasattr(self, 'remove_off_scren'):
-            self.remove_off_scren = False
-        if not hasattr(self, 'friendly'):
-            self.friendly = False
-        if not hasattr(self, 'toxic'):
-            self.toxic = False
-        if not hasattr(self, 'attractable'):
-            self.attractable = True
-        if not hasattr(self, 'max_velocity'):
-            self.max_velocity = -1
-        if not hasattr(self, 'x'):
-            self.x = rect.centerx
-        if not hasattr(self, 'y'):
-            self.y = rect.centery
-        if not hasattr(self, 'a_acc_angle'):
-            self.a_acc_angle = 0
-        if not hasattr(self, 'a_acc'):
-            self.a_acc = 0
+        self.x = rect.centerx
+        self.y = rect.centery
+        self.angle = 0
+        self.acc = 0
+        self.vx = 0
+        self.vy = 0
+        self.a_ax = 0
+        self.a_ay = 0
+        self.heading = 0
+
+        self.physics = None
+        self.physics_slot = -1
         
-        # Sets the collision mask.
-        self.update_mask()
+        # Sets the collision mask, the unrotated image
+        # shares its mask through the rotation cache.
+        self.image, self.mask = rotation_cache.get(self.org_image, self.angle)
         
         
     def set_angle(self, angle, set_mov_angle = True):
@@ -63,7 +85,7 @@ class MovableSprite(pygame.sprite.Sprite):
             this will also updates the mask."""
         
         # No need to do anything else if the angle hasn't been changed.
-        if hasattr(self, "angle") and self.angle == angle:
+        if self.angle == angle:
             return
         
         self.angle = angle
@@ -74,8 +96,8 @@ class MovableSprite(pygame.sprite.Sprite):
         if set_mov_angle:
             self.mov_angle = angle
         
-        # Using -self.angle since rotate is counter clock wise.
-        self.image = pygame.transform.rotate(self.org_image, -self.angle)
+        # The rotated image and its mask are shared through the rotation cache.
+        self.image, self.mask = rotation_cache.get(self.org_image, self.angle)
 
         # Recreates the bounding rect with the same
         # center as before to accomodate the rotated image.
@@ -86,18 +108,73 @@ class MovableSprite(pygame.sprite.Sprite):
         
         self.set_pos(self.x, self.y)
 
-        # Updates the mask used for collission detection.
-        self.update_mask()
-
     def add_acc(self, a_acc, a_angle):
         """Add acceleration with the specified angle."""
 
-        newVector = add_vectors(self.a_acc, self.a_acc_angle, a_acc, a_angle)
+        # Passive sprites are moved by the physics engine which keeps their acceleration.
+        if self.physics is not None and not self.physics_controlled:
+            self.physics.add_acc(self, a_acc, a_angle)
+            return
+
+        sin_a, cos_a = sin_cos(a_angle)
+        self.a_ax += a_acc * cos_a
+        self.a_ay += a_acc * sin_a
 
-        #print("add_acc newVector: (" + str(newVector[0]) + ", "+ str(newVector[1]) +")")
-        
-        self.a_acc = newVector[0]
-        self.a_acc_angle = newVector[1]
+    def add_acc_xy(self, a_ax, a_ay):
+        """Add acceleration given as x/y components."""
+        if self.physics is not None and not self.physics_controlled:
+            self.physics.add_acc_xy(self, a_ax, a_ay)
+            return
+
+        self.a_ax += a_ax
+        self.a_ay += a_ay
+
+    def reset_acc(self):
+        """Clears the added acceleration once it has been applied."""
+        self.a_ax = 0
+        self.a_ay = 0
+
+    @property
+    def velocity(self):
+        return math.hypot(self.vx, self.vy)
+
+    @velocity.setter
+    def velocity(self, velocity):
+        speed = math.hypot(self.vx, self.vy)
+
+        # Keeps the current direction, or the movement angle if standing still.
+        if speed != 0:
+            factor = velocity / speed
+            self.vx *= factor
+            self.vy *= factor
+        else:
+            sin_a, cos_a = sin_cos(self.heading)
+            self.vx = velocity * cos_a
+            self.vy = velocity * sin_a
+
+    @property
+    def mov_angle(self):
+        if self.vx == 0 and self.vy == 0:
+            return self.heading
+
+        return math.degrees(math.atan2(self.vy, self.vx))
+
+    @mov_angle.setter
+    def mov_angle(self, mov_angle):
+        self.heading = mov_angle
+
+        speed = math.hypot(self.vx, self.vy)
+        sin_a, cos_a = sin_cos(mov_angle)
+        self.vx = speed * cos_a
+        self.vy = speed * sin_a
+
+    @property
+    def a_acc(self):
+        return math.hypot(self.a_ax, self.a_ay)
+
+    @property
+    def a_acc_angle(self):
+        return math.degrees(math.atan2(self.a_ay, self.a_ax))
         
     def set_pos(self, x, y):
         # TODO this function is weird...
@@ -113,12 +190,7 @@ class MovableSprite(pygame.sprite.Sprite):
         
         self.move()
 
-        self.a_acc = 0
-        self.a_acc_angle = 0        
-
-    def update_mask(self):
-        """Updates the mask used for pixel perfect collision detection."""
-        self.mask = pygame.mask.from_surface(self.image)
+        self.reset_acc()
 
     def hit(self):
         return 0
@@ -130,24 +202,30 @@ class MovableSprite(pygame.sprite.Sprite):
     def move_deacc(self):
         """ This function deaccelerates the body,
             but will not change the movement angle."""
-        
+        vx = self.vx
+        vy = self.vy
+        speed = math.hypot(vx, vy)
+
         # Deaccelerates velocity based on the acceleration of the object.                
-        self.velocity -= abs(self.acc)
+        new_speed = speed - abs(self.acc)
 
-        # The body/object isn't allowed to go backwards.
-        if self.velocity < 0:
-            self.velocity = 0
-        
-        mov_angle = self.mov_angle
-        mov_radians = math.radians(self.mov_angle)
+        # The body/object isn't allowed to go backwards, but
+        # remembers its movement angle when it stops.
+        if new_speed <= 0:
+            if speed != 0:
+                self.heading = math.degrees(math.atan2(vy, vx))
 
-        x_speed = self.velocity * math.cos(mov_radians)
-        y_speed = self.velocity * math.sin(mov_radians)
+            vx = 0
+            vy = 0
+        else:
+            factor = new_speed / speed
+            vx *= factor
+            vy *= factor
 
-        x_pos = self.x+x_speed
-        y_pos = self.y+y_speed
+        self.vx = vx
+        self.vy = vy
 
-        self.set_pos(x_pos, y_pos)
+        self.set_pos(self.x+vx, self.y+vy)
         
 
     def move(self):
@@ -159,66 +237,101 @@ class MovableSprite(pygame.sprite.Sprite):
             self.move_deacc()
             return
 
-        avector = add_vectors(self.acc, self.angle, self.a_acc, self.a_acc_angle)
-        acc = avector[0]
-        angle = avector[1]
-        
-        # Figuring out what acceleration to add based on the angle the object is facing
-        # Converting to radians since that is what the math library supports.
-        radians = math.radians(angle)
-        x_acc = acc * math.cos(radians)
-        y_acc = acc * math.sin(radians)
-        
-        
-        # Calculates the old x/y speed.
-        old_mov_radians = math.radians(self.mov_angle)
-        old_x_speed = self.velocity * math.cos(old_mov_radians)
-        old_y_speed = self.velocity * math.sin(old_mov_radians)
-                
-        # Changes x/y dir and movement angle based on
-        # acceleration and angle objects facing.
-        x_speed = old_x_speed + x_acc
-        y_speed = old_y_speed + y_acc
-        self.velocity = ((x_speed**2)+(y_speed**2))**0.5
+        # Adds the acceleration along the angle the object is facing
+        # and the acceleration added by other objects.
+        x_speed = self.vx + self.a_ax
+        y_speed = self.vy + self.a_ay
+
+        acc = self.acc
+        if acc != 0:
+            sin_a, cos_a = sin_cos(self.angle)
+            x_speed += acc * cos_a
+            y_speed += acc * sin_a
 
-        
-        if self.velocity != 0:
-            # We know the x_speed, y_speed, velocity, now setting angle.
-            mov_radians = math.asin(y_speed / self.velocity)
-            self.mov_angle = math.degrees(mov_radians)
-
-            # Flips the angle in case the x_speed is negative.
-            if x_speed < 0:
-                old_mov_angle = self.mov_angle
-                self.mov_angle = 180 - self.mov_angle
-                mov_radians = math.radians(self.mov_angle)
-        
         # If the max velocity is set and the velocity
-        # exceeds max velocity then nerf it and change x/y dir.
-        if self.max_velocity > 0 and self.velocity > self.max_velocity:
-            self.velocity = self.max_velocity
-            x_speed = math.cos(mov_radians) * self.velocity
-            y_speed = math.sin(mov_radians) * self.velocity
-        
-            
-        
-        # Sets the new x and y position.
-        x = self.x
-        y = self.y
-        
-        x_pos = x+x_speed
-        y_pos = y+y_speed
+        # exceeds max velocity then nerf it.
+        max_velocity = self.max_velocity
+        if max_velocity > 0:
+            speed = math.hypot(x_speed, y_speed)
+
+            if speed > max_velocity:
+                factor = max_velocity / speed
+                x_speed *= factor
+                y_speed *= factor
+
+        self.vx = x_speed
+        self.vy = y_speed
         
         # Adds x/y velocity to x/y coordinates
-        self.set_pos(x_pos, y_pos)
+        self.set_pos(self.x+x_speed, self.y+y_speed)
     
+    def set_state(self, state, clock):
+        """Restores the movement, the rect and the state attributes, in that order.
+            The images aren't saved but taken from the caches by restore_image."""
+        (self.x, self.y, self.angle, self.acc, self.vx, self.vy, self.a_ax, self.a_ay, self.heading,
+            left, top, width, height) = state[:13]
+        self.rect = pygame.Rect(left, top, width, height)
+
+        for name, value in zip(self.state_attributes, state[13:]):
+            setattr(self, name, value)
+
+        self.physics = None
+        self.physics_slot = -1
+
+    def restore_image(self, images = None, image_key = None):
+        """Takes the images for the restored attributes from the caches like those of a new sprite.
+            Given a dict and a getter of the image attributes, the images are kept in the dict
+            for the sprites restored after this one that look the same."""
+        angle = self.get_image_angle()
+
+        if images is None:
+            self.org_image = self.get_image()
+            self.image, self.mask = rotation_cache.get(self.org_image, angle)
+            return
+
+        key = (image_key(self), angle)
+        cached = images.get(key)
+
+        if cached is None:
+            org_image = self.get_image()
+            cached = images[key] = (org_image,) + rotation_cache.get(org_image, angle)
+
+        self.org_image, self.image, self.mask = cached
+
+    @classmethod
+    def from_state(cls, state, clock, images = None, image_key = None):
+        """Creates a sprite from a saved state without running the constructor."""
+        sprite = cls.__new__(cls)
+        pygame.sprite.Sprite.__init__(sprite)
+        sprite.set_state(state, clock)
+        sprite.restore_image(images, image_key)
+
+        return sprite
+
+    def get_image(self):
+        """The unrotated image for the sprite's attributes, used when the sprite is restored."""
+        raise NotImplementedError(f"{type(self).__name__} can't be restored")
+
+    def get_image_angle(self):
+        """The angle the image is rotated to, which is the sprite's angle unless the sprite rotates itself."""
+        return self.angle
+
+    def get_blit(self):
+        """Returns the image and rect to draw this frame, or None if nothing should be drawn."""
+        return (self.image, self.rect)
+
+    def kill(self):
+        if self.physics is not None:
+            self.physics.remove(self)
+
+        pygame.sprite.Sprite.kill(self)
+
     def draw(self, surface):
         """Draws the image."""
-        surface.blit(self.image, self.rect)
+        blit = self.get_blit()
+
+        if blit is not None:
+            surface.blit(*blit)
 
     def canAttractSprites(self):
         return False
-
-    def attractSprite(self, sprite):
-        """Function allowing the sprite to attract or repel other sprites, most implementations won't use this"""
-        pass
@@ -1,10 +1,10 @@
 import pygame
 import pygame.sprite
-from pygame.locals import *
+from pygame.locals import Rect
 import math
-from ..constants import *
-from ..functions import *
+from ..constants import GREEN
 from .movable_sprite import MovableSprite
+from ..asset_cache import asset_cache
 
 
 # Slimes
@@ -17,37 +17,46 @@ SLIME_ACC = 0.2
 
 class SlimeBlob(MovableSprite):
     """An alien blob that will follow the player"""
+
+    __slots__ = ("radius", "color", "sprite_image", "hp", "target_pos")
+
+    hit_sound = "slime_kill"
+    score = SLIME_SCORE
+    max_velocity = SLIME_MAX_VELOCITY
+    physics_controlled = True
+    targets_player = True
+    state_attributes = ("radius", "color", "sprite_image", "hp", "target_pos")
+    state_format = "issip"
+    image_attributes = ("sprite_image", "radius")
     
     def __init__(self, x, y, radius = SLIME_RADIUS, color = SLIME_COLOR, sprite_image = "sprites/slime_blob_1.png"):
+        diameter = radius*2
+        rect = Rect(0, 0, diameter, diameter)
+        rect.center = (x, y)
+
+        # The slime's image is shared by all slimes of the same size.
+        image = asset_cache.get_scaled(sprite_image, diameter)
+        
+        # Calls parent constructor
+        MovableSprite.__init__(self, rect, image)
+
         self.radius = radius
         self.color = color
-        self.score = SLIME_SCORE
+        self.sprite_image = sprite_image
         self.hp = SLIME_HP
         self.target_pos = (0, 0)
-        self.max_velocity = SLIME_MAX_VELOCITY
         self.acc = SLIME_ACC
 
-                
-        diameter = self.radius*2
-        self.rect = Rect(0, 0, diameter, diameter)
-        self.rect.center = (x, y)
-
-        # Creates the slime's image.        
-        self.image = pygame.Surface([diameter, diameter])
-        self.image.set_colorkey(BACKGROUND_COLOR)                
-
-        self.image = load_image(sprite_image)  
-        self.image = pygame.transform.scale(self.image, (diameter, diameter))
-        self.image.set_colorkey(BACKGROUND_COLOR)
-        
-        # Calls parent constructor
-        MovableSprite.__init__(self, self.rect, self.image)
-        
-        self.mask = pygame.mask.from_surface(self.image)
-
     def set_target(self, target_x, target_y):
         self.target_pos = (target_x, target_y)
 
+    def get_image(self):
+        return asset_cache.get_scaled(self.sprite_image, self.radius * 2)
+
+    def get_image_angle(self):
+        # Rotating only steers the slime, its image is never rotated.
+        return 0
+
     def rotate(self):
         # Sets angle based on the target position.
         target_x, target_y = self.target_pos
@@ -58,17 +67,10 @@ class SlimeBlob(MovableSprite):
         diff_x = target_x - slime_x 
         diff_y = target_y - slime_y
 
-        distance = math.sqrt((diff_x**2)+(diff_y**2))
-
-        if distance == 0:
+        if diff_x == 0 and diff_y == 0:
             return # No need to change angle.
         
-        angle = math.degrees(math.asin(diff_y/distance))
-
-        if diff_x < 0:
-           angle = 180 - angle 
-
-        self.angle = angle
+        self.angle = math.degrees(math.atan2(diff_y, diff_x))
 
     def hit(self):
         self.hp -= 1
@@ -3,6 +3,8 @@ from ..constants import *
 from ..functions import *
 from .movable_sprite import MovableSprite
 from .bullet import Bullet
+from ..collision_layers import LAYER_PLAYER
+from ..sim_clock import WALL_CLOCK
 
 # Constants
 PLAYER_ROTATE_SPEED = 5
@@ -18,52 +20,105 @@ ROTATE_CLOCKWISE = 1
 ROTATE_NONE = 0
 ROTATE_COUNTER_CLOCKWISE = -1
 
+class WeaponMode:
+    """How many bullets a shot fires, fanned out over the spread angle.
+
+        With an interval the weapon keeps firing every interval_ms while
+        the trigger is held, otherwise it fires once per trigger press."""
+
+    def __init__(self, name, bullet_count = 1, spread = 0, interval_ms = None):
+        self.name = name
+        self.bullet_count = bullet_count
+        self.spread = spread
+        self.interval_ms = interval_ms
+
+        # The angles of the bullets relative to the ship, a full circle
+        # spreads them evenly without firing two bullets the same way.
+        if bullet_count == 1:
+            self.angles = (0,)
+        elif spread >= 360:
+            self.angles = tuple(i * 360 // bullet_count for i in range(bullet_count))
+        else:
+            self.angles = tuple((-spread // 2) + (i * spread // (bullet_count - 1)) for i in range(bullet_count))
+
+WEAPON_MODES = (
+    WeaponMode("Single shot"),
+    WeaponMode("Rapid fire", 1, 0, 50),
+    WeaponMode("Spread shot", 5, 40, 150),
+    WeaponMode("Nova", 36, 360, 100),
+)
+
+def get_ship_image(diameter, color, ship_images = {}):
+    """Draws the ship image, cached so that respawned ships share
+        the same image and rotations in the rotation cache."""
+    key = (diameter, color)
+
+    if key not in ship_images:
+        image = pygame.Surface([diameter, diameter])
+        image.set_colorkey(BACKGROUND_COLOR)
+
+        # For now this spaceship is just a triangle but looks cool nonetheless
+        pygame.draw.polygon(image, color, ((0, 0), (diameter, diameter/2), (0, diameter)))
+        ship_images[key] = image
+
+    return ship_images[key]
+
 class SpaceShip(MovableSprite):
     """Class representing a spaceship, should perhaps inherit from MovableSprite."""
+
+    color = PLAYER_COLOR
+    physics_controlled = True
+    collision_layer = LAYER_PLAYER
+    hit_sound = "ship_kill"
+    rotate_speed = PLAYER_ROTATE_SPEED
+    thrust_acc = PLAYER_ACC
+    break_deacc = PLAYER_BREAK_DEACC
+    max_velocity = PLAYER_MAX_SPEED
+    score = 0
+    friendly = True
+    state_attributes = ("diameter", "rotate_dir", "hp", "thrust_on", "trigger_on", "weapon_mode_index",
+                        "last_shot_ms", "kill_time_ms", "spawn_time_ms", "transparent")
+    state_format = "iii??inii?"
+    image_attributes = ("diameter", "color")
     
-    def __init__(self, left, top, diameter):
-        self.color = PLAYER_COLOR
-        self.rect = Rect(left, top, diameter, diameter)
+    def __init__(self, left, top, diameter, clock = None):
+        if clock is None:
+            clock = WALL_CLOCK
 
-        # Creates the image
-        self.org_image = pygame.Surface([diameter, diameter])
-        self.org_image.set_colorkey(BACKGROUND_COLOR)
+        rect = Rect(left, top, diameter, diameter)
 
-        # For now this spaceship is just a triangle but looks cool nonetheless
-        pygame.draw.polygon(self.org_image, self.color, ((0, 0), (diameter, diameter/2), (0, diameter)))        
-        self.image = self.org_image.copy()
+        # Creates the image
+        image = get_ship_image(diameter, self.color)
 
         # Calls parent constructor
-        MovableSprite.__init__(self, self.rect, self.image)
+        MovableSprite.__init__(self, rect, image)
         
-        self.rotate_speed = PLAYER_ROTATE_SPEED
+        self.clock = clock
+        self.diameter = diameter
         self.rotate_dir = ROTATE_NONE
-        self.set_angle(0)
-        self.acc = 0
-        self.thrust_acc = PLAYER_ACC
-        self.break_deacc = PLAYER_BREAK_DEACC
-        self.max_velocity = PLAYER_MAX_SPEED
-        self.velocity = 0
-        self.speed = 0
-        self.acc = 0
-        self.score = 0
         self.hp = 1
-        self.temporary = False
-        self.friendly = True
         self.thrust_on = False
-        self.bullets = []
+        self.trigger_on = False
+        self.weapon_mode_index = 0
+        self.last_shot_ms = None
         self.kill_time_ms = 0
-        self.spawn_time_ms = get_millis()
+        self.spawn_time_ms = clock.now_ms
         
         # Transparent/Invulnarable when spawning
         self.transparent = True
-        self.update_mask()
         
+    def set_state(self, state, clock):
+        self.clock = clock
+        MovableSprite.set_state(self, state, clock)
+
+    def get_image(self):
+        return get_ship_image(self.diameter, self.color)
+
     def kill(self):
         if not self.alive():
             return
         
-        self.kill_time_ms = get_millis()
+        self.kill_time_ms = self.clock.now_ms
         MovableSprite.kill(self)
 
     def set_thrust_on(self, thrust_on):
@@ -107,11 +162,10 @@ class SpaceShip(MovableSprite):
         self.move()
         
         # Toggles transparency if the ship respawned
-        if self.transparent and (get_millis() - self.spawn_time_ms)> PLAYER_SPAWN_SAFE_TIME_MS:
+        if self.transparent and (self.clock.now_ms - self.spawn_time_ms)> PLAYER_SPAWN_SAFE_TIME_MS:
             self.transparent = False
 
-        self.a_acc = 0
-        self.a_acc_angle = 0
+        self.reset_acc()
         
     def rotate(self):
         """Rotates the spaceship."""
@@ -129,23 +183,56 @@ class SpaceShip(MovableSprite):
 
         self.set_angle(new_angle, False)       
         
-    def fire_bullet(self):        
-        bullet = Bullet()
+    def get_weapon_mode(self):
+        return WEAPON_MODES[self.weapon_mode_index]
 
-        bullet_x = self.rect.centerx - bullet.radius
-        bullet_y = self.rect.centery - bullet.radius
-        
-        bullet.set_pos(bullet_x, bullet_y)
-        bullet.parent = self
-        bullet.fire(self.angle)
-        return bullet
+    def cycle_weapon_mode(self):
+        self.weapon_mode_index = (self.weapon_mode_index + 1) % len(WEAPON_MODES)
+        return self.get_weapon_mode()
+
+    def set_trigger(self, trigger_on):
+        self.trigger_on = trigger_on
+
+    def should_fire(self):
+        """Evaluates if a held trigger should fire another shot this frame."""
+        interval_ms = self.get_weapon_mode().interval_ms
+
+        if not self.trigger_on or interval_ms is None:
+            return False
+
+        return self.last_shot_ms is None or (self.clock.now_ms - self.last_shot_ms) >= interval_ms
+
+    def fire_bullets(self, bullet_pool = None):
+        """Fires a shot of the current weapon mode, the bullets are taken
+            from the pool if one is given. Returns the fired bullets."""
+        self.last_shot_ms = self.clock.now_ms
+        bullets = []
+
+        for angle in self.get_weapon_mode().angles:
+            if bullet_pool is None:
+                bullet = Bullet(clock = self.clock)
+            else:
+                bullet = bullet_pool.acquire()
+
+                # Nothing more can be fired until some bullets are back in the pool.
+                if bullet is None:
+                    break
+
+            bullet_x = self.rect.centerx - bullet.radius
+            bullet_y = self.rect.centery - bullet.radius
+
+            bullet.reset(bullet_x, bullet_y, self)
+            bullet.fire((self.angle + angle) % 360)
+            bullets.append(bullet)
+
+        return bullets
     
-    def draw(self, surface):
+    def get_blit(self):
         # Blinks the ship if it's transparent.
-        if self.transparent and (get_millis() % 200) < 100:
-            return
+        if self.transparent and (self.clock.now_ms % 200) < 100:
+            return None
 
-        surface.blit(self.image, self.rect)
+        return (self.image, self.rect)
         
         
     def hit(self):
@@ -1,4 +1,3 @@
-import math
 import pygame
 from ..constants import *
 from .movable_sprite import MovableSprite
@@ -12,35 +11,46 @@ VORTEX_HOLE_ATTRACT_RADIUS = 300
 VORTEX_HOLE_ATTRACT_ACC = -4
 VORTEX_HOLE_COLOR = SNOT_GREEN
 
+def get_vortex_hole_image(radius, color, vortex_hole_images = {}):
+    """Draws the vortex hole image, cached so that every vortex hole shares it."""
+    key = (radius, color)
+
+    if key not in vortex_hole_images:
+        diameter = radius * 2
+        image = pygame.Surface([diameter, diameter])
+        image.set_colorkey(BACKGROUND_COLOR)
+        pygame.draw.circle(image, color, (radius, radius), radius)
+        vortex_hole_images[key] = image
+
+    return vortex_hole_images[key]
+
 class VortexHole(MovableSprite):
     """Class representing VortexHole which can attract other items to it"""
 
-    def __init__(self, x, y, radius = VORTEX_HOLE_RADIUS):
-        self.radius = radius
-        self.score = VORTEX_HOLE_SCORE
-        self.hp = VORTEX_HOLE_HP
-        self.color = VORTEX_HOLE_COLOR
-        self.angle = 0
+    score = VORTEX_HOLE_SCORE
+    color = VORTEX_HOLE_COLOR
+    can_attract_objects = True
+    attract_radius = VORTEX_HOLE_ATTRACT_RADIUS
+    attract_acc = VORTEX_HOLE_ATTRACT_ACC
+    attractable = False
+    state_attributes = ("radius", "hp")
+    state_format = "ii"
+    image_attributes = ("radius", "color")
 
-        diameter = self.radius*2
-        self.rect = Rect(0, 0, diameter, diameter)
-        self.rect.center = (x, y)
+    def __init__(self, x, y, radius = VORTEX_HOLE_RADIUS):
+        diameter = radius*2
+        rect = Rect(0, 0, diameter, diameter)
+        rect.center = (x, y)
         
-        self.image = pygame.Surface([diameter, diameter])
-        self.image.set_colorkey(BACKGROUND_COLOR)                
-        pygame.draw.circle(self.image, self.color, (self.radius, self.radius), self.radius)
+        # Calls parent constructor
+        MovableSprite.__init__(self, rect, get_vortex_hole_image(radius, self.color))
 
+        self.radius = radius
+        self.hp = VORTEX_HOLE_HP
         
-        self.set_angle(self.angle)
+    def get_image(self):
+        return get_vortex_hole_image(self.radius, self.color)
 
-        self.can_attract_objects = True
-        self.attract_radius = VORTEX_HOLE_ATTRACT_RADIUS
-        self.attract_acc = VORTEX_HOLE_ATTRACT_ACC
-        self.attractable = False
-        
-        # Calls parent constructor
-        MovableSprite.__init__(self, self.rect, self.image)
-        
     def hit(self):
         self.hp -= 1
 
@@ -51,39 +61,3 @@ class VortexHole(MovableSprite):
 
     def canAttractSprites(self):
         return self.can_attract_objects
-
-    def attractSprite(self, sprite):
-        # Start by checking if we can attract this object
-        if(sprite is self):
-            return None
-
-        # Transparent objects can not be attracted
-        if(sprite.transparent or not sprite.attractable):
-            return None
-        
-        center_x = self.rect.centerx
-        center_y = self.rect.centery
-
-        b_side = sprite.x - center_x
-        a_side = sprite.y - center_y
-        
-        distance = ((b_side**2) + (a_side**2))**0.5
-
-        if(distance > self.attract_radius):
-            return None
-
-        if b_side == 0:
-            attract_angle = 90
-        else:
-            attract_radians = math.atan(a_side/b_side)
-            attract_angle = math.degrees(attract_radians)
-
-        if b_side < 0:
-            attract_angle = 180 + attract_angle
-
-        if distance < 10:
-            distance = 10
-
-        g_acc = self.attract_acc / ((distance/10)**2)
-        
-        return (g_acc, attract_angle)
@@ -0,0 +1,175 @@
+"""
+Startup profile printed with --startup-profile, times the import of every
+module and each phase of starting the game up to the first frame.
+
+Nothing is timed unless the profile has been started, and it must be started
+before the game modules are imported for their imports to be included.
+"""
+
+import sys
+import time
+from contextlib import nullcontext
+
+# Imports faster than this are left out of the report, and so are the modules
+# imported deeper down than this by other packages. The game's own modules
+# are always listed.
+STARTUP_PROFILE_MIN_MS = 1.0
+STARTUP_PROFILE_MAX_DEPTH = 2
+
+GAME_PACKAGE = __name__.partition(".")[0]
+
+class ModuleImport:
+    """When a module was imported and how long its own code took to run."""
+
+    def __init__(self, name, depth, started):
+        self.name = name
+        self.depth = depth
+        self.started = started
+        self.total_time = 0
+        self.child_time = 0
+
+    def get_self_time(self):
+        return self.total_time - self.child_time
+
+
+class TimedLoader:
+    """Runs the module through the original loader and times it."""
+
+    def __init__(self, loader, profile):
+        self.loader = loader
+        self.profile = profile
+
+    def __getattr__(self, name):
+        # Resource lookups and such go straight to the original loader.
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.profile.exec_module(self.loader, module)
+
+
+class ImportTimer:
+    """Meta path finder wrapping the loader of every module found by the other finders."""
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, name, path, target = None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec = finder.find_spec(name, path, target)
+
+            if spec is None:
+                continue
+
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = TimedLoader(spec.loader, self.profile)
+
+            return spec
+
+        return None
+
+
+class StartupProfile:
+    """Timeline of the imports and the startup phases."""
+
+    def __init__(self):
+        self.enabled = False
+        self.start_time = None
+        self.import_timer = None
+        self.imports = []
+        self.import_stack = []
+        self.phases = []
+
+    def start(self):
+        """Starts timing the imports and the phases."""
+        self.enabled = True
+        self.start_time = time.perf_counter()
+        self.import_timer = ImportTimer(self)
+        sys.meta_path.insert(0, self.import_timer)
+
+    def stop(self):
+        self.enabled = False
+
+        if self.import_timer in sys.meta_path:
+            sys.meta_path.remove(self.import_timer)
+
+    def exec_module(self, loader, module):
+        module_import = ModuleImport(module.__name__, len(self.import_stack), time.perf_counter())
+        self.imports.append(module_import)
+        self.import_stack.append(module_import)
+
+        try:
+            loader.exec_module(module)
+        finally:
+            self.import_stack.pop()
+            module_import.total_time = time.perf_counter() - module_import.started
+
+            if self.import_stack:
+                self.import_stack[-1].child_time += module_import.total_time
+
+    def phase(self, name):
+        """Context manager timing a phase, does nothing unless the profile is running."""
+        if not self.enabled:
+            return nullcontext()
+
+        return StartupPhase(self, name)
+
+    def finish(self):
+        """Stops the profile and prints it, called once the first frame is done."""
+        if not self.enabled:
+            return
+
+        self.stop()
+        self.print_report()
+
+    def is_reported(self, module_import):
+        if module_import.name.partition(".")[0] == GAME_PACKAGE:
+            return True
+
+        return module_import.depth <= STARTUP_PROFILE_MAX_DEPTH and module_import.total_time * 1000 >= STARTUP_PROFILE_MIN_MS
+
+    def print_report(self):
+        total_ms = (time.perf_counter() - self.start_time) * 1000
+        import_ms = sum(module_import.total_time for module_import in self.imports if module_import.depth == 0) * 1000
+
+        print(f"{'import':45} {'start ms':>9} {'self ms':>8} {'total ms':>9}")
+
+        for module_import in self.imports:
+            if not self.is_reported(module_import):
+                continue
+
+            name = "  " * module_import.depth + module_import.name
+            start_ms = (module_import.started - self.start_time) * 1000
+            print(f"{name:45} {start_ms:9.1f} {module_import.get_self_time() * 1000:8.1f} {module_import.total_time * 1000:9.1f}")
+
+        print(f"{len(self.imports)} modules imported in {import_ms:.1f} ms")
+        print(f"{'phase':45} {'start ms':>9} {'ms':>8}")
+
+        for name, started, elapsed in self.phases:
+            print(f"{name:45} {(started - self.start_time) * 1000:9.1f} {elapsed * 1000:8.1f}")
+
+        print(f"First frame {total_ms:.1f} ms after the profile started")
+
+
+class StartupPhase:
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.phases.append((self.name, self.started, time.perf_counter() - self.started))
+
+
+# The profile shared by main.py and the startup code.
+startup_profile = StartupProfile()
@@ -0,0 +1,84 @@
+"""
+Caches for rendered text so that the HUD and messages aren't rendered with font.render every frame.
+"""
+
+from collections import OrderedDict
+import pygame
+from .constants import *
+
+TEXT_CACHE_SIZE = 64
+
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces keyed by text, font and color."""
+
+    def __init__(self, max_size = TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color = TEXT_COLOR):
+        key = (text, font, color)
+        surfaces = self.surfaces
+
+        if key in surfaces:
+            self.hits += 1
+            surfaces.move_to_end(key)
+            return surfaces[key]
+
+        self.misses += 1
+        surface = font.render(text, 1, color)
+        surfaces[key] = surface
+
+        # Drops the least recently used text.
+        if len(surfaces) > self.max_size:
+            surfaces.popitem(last = False)
+
+        return surface
+
+
+class Hud:
+    """The level, lives and score info drawn in the corner of the screen.
+
+        The lines are drawn onto one surface which is only rebuilt
+        when one of the values changes."""
+
+    def __init__(self, font, text_cache, x, y, line_height):
+        self.font = font
+        self.text_cache = text_cache
+        self.x = x
+        self.y = y
+        self.line_height = line_height
+        self.values = None
+        self.image = None
+        self.rect = None
+        self.rebuild_count = 0
+
+    def get_blit(self, level_number, lives, score):
+        values = (level_number, lives, score)
+
+        if values != self.values:
+            self.rebuild(values)
+
+        return (self.image, self.rect)
+
+    def rebuild(self, values):
+        level_number, lives, score = values
+
+        level_nr = ""
+        if level_number > 0:
+            level_nr = level_number
+
+        lines = [f"Level: {level_nr}", f"Lives: {lives}", f"Score: {score}"]
+        line_surfaces = [self.text_cache.render(self.font, line) for line in lines]
+
+        width = max(line.get_width() for line in line_surfaces)
+        height = self.line_height * (len(lines) - 1) + line_surfaces[-1].get_height()
+
+        self.image = pygame.Surface((width, height), SRCALPHA)
+        for i, line in enumerate(line_surfaces):
+            self.image.blit(line, (0, i * self.line_height))
+
+        self.rect = self.image.get_rect(topleft = (self.x, self.y))
+        self.values = values
+        self.rebuild_count += 1
@@ -1,18 +1,22 @@
 """Class representing a text message to be displayed on the screen"""
 
-from .functions import get_millis
+from .sim_clock import WALL_CLOCK
 
 TEXT_DISPLAY_TIME_MS = 3 * 1000
 TEXT_COLOR = (0, 0, 0)
 
 class TextMessage:
     
-    def __init__(self, message, x, y):
+    def __init__(self, message, x, y, clock = None):
+        if clock is None:
+            clock = WALL_CLOCK
+
         self.message = message
         self.color = TEXT_COLOR
-        self.spawn_time = get_millis()
+        self.clock = clock
+        self.spawn_time = clock.now_ms
         self.x = x
         self.y = y
         
     def is_active(self):
-        return self.spawn_time > (get_millis() - TEXT_DISPLAY_TIME_MS)
+        return self.spawn_time > (self.clock.now_ms - TEXT_DISPLAY_TIME_MS)
@@ -0,0 +1,86 @@
+"""
+Scheduler spreading deferrable work, such as asteroid fragments and level
+spawns, over the following ticks so a chain reaction doesn't land in one frame.
+"""
+
+import time
+from collections import deque
+
+# Sprites that may enter the game each tick, creating a sprite is the bulk of the
+# deferrable work and takes about 15-40 us depending on the rotation cache.
+WORK_BUDGET_PER_TICK = 64
+
+# Idle work only runs until this share of the frame has passed.
+IDLE_FRAME_SHARE = 0.5
+
+class WorkScheduler:
+    """Runs work items in the order they are submitted within a budget per tick.
+
+        The budget is counted in work units instead of time, each item returns the
+        units it used, so the same items run in the same ticks on every machine and
+        the simulation stays deterministic. Idle work that doesn't change the game,
+        such as warming caches, runs in the time left over in a frame instead."""
+
+    def __init__(self, budget = WORK_BUDGET_PER_TICK):
+        self.budget = budget
+        self.used = 0
+        self.queue = deque()
+        self.idle_queue = deque()
+
+        # How much of the work had to wait for a later tick.
+        self.completed = 0
+        self.deferred = 0
+        self.peak_queued = 0
+
+    def submit(self, work, *args):
+        """Runs the work right away if there is budget left this tick, otherwise in a later tick.
+            The work returns the units it used, or None for one unit."""
+        if not self.queue and self.used < self.budget:
+            self.run(work, args)
+            return
+
+        self.queue.append((work, args))
+        self.deferred += 1
+
+        if len(self.queue) > self.peak_queued:
+            self.peak_queued = len(self.queue)
+
+    def run(self, work, args):
+        used = work(*args)
+        self.used += 1 if used is None else used
+        self.completed += 1
+
+    def start_tick(self):
+        """Resets the budget and runs the work left over from the previous ticks."""
+        self.used = 0
+        queue = self.queue
+
+        while queue and self.used < self.budget:
+            work, args = queue.popleft()
+            self.run(work, args)
+
+    def has_work(self):
+        return len(self.queue) > 0
+
+    def submit_idle(self, steps):
+        """Queues an iterator whose steps are run one at a time when there is time left in a frame."""
+        self.idle_queue.append(steps)
+
+    def run_idle(self, deadline):
+        """Runs idle steps until the deadline, a time from time.perf_counter()."""
+        idle_queue = self.idle_queue
+
+        while idle_queue and time.perf_counter() < deadline:
+            try:
+                next(idle_queue[0])
+            except StopIteration:
+                idle_queue.popleft()
+
+    def get_stats(self):
+        return {
+            "completed": self.completed,
+            "deferred": self.deferred,
+            "queued": len(self.queue),
+            "peak_queued": self.peak_queued,
+            "idle_queued": len(self.idle_queue),
+        }